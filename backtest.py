@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import os
+
+from my_module.backtest import BacktestConfig, Backtester
+from my_module.bar_cache import backfill
+from my_module.connect import connect_ib, create_ib, disconnect_ib
+from my_module.contract_cache import ContractCache
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+parser = argparse.ArgumentParser(description="Backtest the reversal signal")
+parser.add_argument("--symbols", nargs="+", required=True, help="Stock symbols")
+parser.add_argument("--start", type=str, help="First day (YYYYMMDD)")
+parser.add_argument("--end", type=str, help="Last day (YYYYMMDD)")
+parser.add_argument("--bar-size", type=str, default=BacktestConfig.BAR_SIZE)
+parser.add_argument(
+    "--backfill", type=int, default=0, help="Trading days to fetch into the cache first"
+)
+
+
+async def fetch_history(symbols, bar_size, days):
+    ib = create_ib()
+    if not await connect_ib(ib):
+        return
+    try:
+        for contract in await ContractCache.shared().stocks(ib, symbols):
+            await backfill(ib, contract, bar_size, days)
+    finally:
+        disconnect_ib(ib)
+
+
+def main():
+    args = parser.parse_args()
+    symbols = [symbol.upper() for symbol in args.symbols]
+
+    if args.backfill:
+        asyncio.run(fetch_history(symbols, args.bar_size, args.backfill))
+
+    backtester = Backtester(BacktestConfig(BAR_SIZE=args.bar_size))
+    result = backtester.run(symbols, args.start, args.end)
+
+    if result.signals.empty:
+        logger.info("No signals found.")
+        return
+
+    os.makedirs("dist", exist_ok=True)
+    output_file = os.path.join("dist", "backtest_signals.csv")
+    result.signals.to_csv(output_file, index=False)
+    logger.info(f"{len(result.signals)} signals saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
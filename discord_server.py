@@ -8,12 +8,13 @@ import nest_asyncio
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
-from ib_insync import IB, Stock
 from pydantic import BaseModel
 
-from my_module.connect import connect_ib, disconnect_ib
+from my_module.connect import create_ib, disconnect_ib
+from my_module.contract_cache import ContractCache
 from my_module.logger import Logger
 from my_module.order import place_bracket_order
+from my_module.supervisor import ConnectionSupervisor
 from my_module.trading_app import TradingApp
 
 nest_asyncio.apply()
@@ -31,7 +32,8 @@ intents = discord.Intents.default()
 intents.message_content = True
 bot = discord.Client(intents=intents)
 trading_app = TradingApp()
-ib = IB()
+ib = create_ib()
+supervisor = ConnectionSupervisor(ib)
 
 # Store bot instance
 # bot_instance: Optional[discord.Client] = None
@@ -116,7 +118,8 @@ async def on_order_status(trade):
 
 # Command Handlers
 async def handle_start_command(message, match=None):
-    await connect_ib(ib)
+    if not ib.isConnected():
+        await supervisor.start()
     asyncio.create_task(trading_app.run())
     ib.orderStatusEvent += lambda trade: asyncio.create_task(on_order_status(trade))
     await message.channel.send("Trading application started! 🚀")
@@ -158,7 +161,10 @@ async def handle_trade_command(message, match):
 
         if confirmation.content.lower() == "yes":
             await message.channel.send("Trade confirmed!🚀\nExecuting... ")
-            contract = Stock(symbol, "SMART", "USD")
+            contract = await ContractCache.shared().stock(ib, symbol)
+            if contract is None:
+                await message.channel.send(f"Unknown symbol {symbol} ❌")
+                return
             place_bracket_order(
                 ib,
                 contract,
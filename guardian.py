@@ -2,15 +2,17 @@ import asyncio
 import json
 from dataclasses import dataclass
 from datetime import datetime, time
-from functools import reduce
 from zoneinfo import ZoneInfo
 
-import pandas as pd
-from ib_insync import IB
+from ib_insync import Position
 
+from my_module.bootstrap import Bootstrap
 from my_module.close_all_positions import close_all_positions
-from my_module.connect import connect_ib
+from my_module.connect import create_ib
+from my_module.exposure import ExposureIndex
 from my_module.logger import Logger
+from my_module.pnl_tracker import PnLTracker
+from my_module.supervisor import ConnectionSupervisor
 
 logger = Logger.get_logger()
 
@@ -18,12 +20,24 @@ logger = Logger.get_logger()
 @dataclass
 class Config:
     EXIT_TIME = "15:45:00"
-    MAX_POSITION_SIZE = 50
+    # Notional limits per symbol and for all positions together, in dollars
+    # and in percent of net liquidation
+    MAX_SYMBOL_EXPOSURE = 10_000
+    MAX_SYMBOL_EXPOSURE_PCT = 25
+    MAX_GROSS_EXPOSURE = 40_000
+    MAX_GROSS_EXPOSURE_PCT = 100
     MAX_OPEN_POSITIONS = 7
     MAX_TRADES_PER_DAY = 20
     MAX_DAILY_DRAWDOWN = -200
+    # Largest give-back from the day's PnL high, open positions included
+    MAX_DRAWDOWN_FROM_PEAK = 300
     TIMEZONE = ZoneInfo("America/New_York")
     TURN_OFF_TIMER = False
+    # Derive MAX_DAILY_DRAWDOWN from the realized PnL history on startup
+    TUNE_DAILY_DRAWDOWN = False
+    # Share of resampled trading days allowed to reach the limit
+    DRAWDOWN_PERCENTILE = 5
+    MIN_HISTORY_DAYS = 20
 
 
 class Timer:
@@ -35,99 +49,253 @@ class Timer:
         return time(12, 0) if (now.month, now.day) in holiday_dates else time(15, 45)
 
     @staticmethod
-    async def check_exit_time(ib):
-        exit_time = Timer.get_exit_time()
-        logger.info(f"Current time: {datetime.now(Config.TIMEZONE).time()}")
-        if Config.TURN_OFF_TIMER:
-            return
-        if datetime.now(Config.TIMEZONE).time() > exit_time:
-            logger.info(f"Timer reached: {Config.EXIT_TIME} . Closing all positions...")
-            await close_all_positions(ib)
-            raise KeyboardInterrupt
+    def seconds_to_exit() -> float:
+        now = datetime.now(Config.TIMEZONE)
+        exit_at = datetime.combine(now.date(), Timer.get_exit_time(), Config.TIMEZONE)
+        return (exit_at - now).total_seconds()
+
+    @staticmethod
+    async def wait_exit_time(ib):
+        """Sleep until the exit time, then close all positions."""
+        delay = Timer.seconds_to_exit()
+        logger.info(f"Exit time {Timer.get_exit_time()} in {max(delay, 0):.0f}s")
+        await asyncio.sleep(max(delay, 0))
+        logger.info(f"Timer reached: {Config.EXIT_TIME} . Closing all positions...")
+        await close_all_positions(ib)
 
 
 class Account:
-    """Account keeps track of my portfolio and account details."""
+    """Risk limits, each check returns why it is breached (or None)."""
 
-    # Monitor drawdowns
+    # Monitor drawdowns, realized and unrealized
     @staticmethod
-    async def check_daily_pnl(ib):
-        account_summary = await ib.accountSummaryAsync()
-        df = pd.DataFrame(account_summary)
-        realized_pnl = df[df.tag == "RealizedPnL"].iloc[0].value
-        logger.info(f"Realized PnL: {realized_pnl} | {Config.MAX_DAILY_DRAWDOWN}")
-        if float(realized_pnl) < Config.MAX_DAILY_DRAWDOWN:
-            logger.info(f"Daily drawdown exceeded: {realized_pnl}. Closing trades.")
-            await close_all_positions(ib)
+    def check_daily_pnl(total_pnl: float) -> str | None:
+        if total_pnl < Config.MAX_DAILY_DRAWDOWN:
+            return f"Daily drawdown exceeded: {total_pnl:.2f}"
+        return None
 
-    # Monitor open positions
     @staticmethod
-    async def check_open_positions(ib):
-        positions = ib.positions()
+    def check_drawdown_from_peak(drawdown: float, peak: float) -> str | None:
+        if drawdown > Config.MAX_DRAWDOWN_FROM_PEAK:
+            return f"Drawdown from peak {peak:.2f} exceeded: {drawdown:.2f}"
+        return None
+
+    @staticmethod
+    def tune_daily_drawdown():
+        if not Config.TUNE_DAILY_DRAWDOWN:
+            return
+        bootstrap = Bootstrap.from_history()
+        if len(bootstrap.daily_pnl) < Config.MIN_HISTORY_DAYS:
+            logger.info(
+                f"Only {len(bootstrap.daily_pnl)} days of PnL history, keeping "
+                f"MAX_DAILY_DRAWDOWN at {Config.MAX_DAILY_DRAWDOWN}"
+            )
+            return
+        limit = bootstrap.suggest_max_daily_drawdown(Config.DRAWDOWN_PERCENTILE)
+        if limit >= 0:
+            logger.info("PnL history has no losing days, keeping MAX_DAILY_DRAWDOWN")
+            return
         logger.info(
-            f"Total open positions: {len(positions)} | {Config.MAX_OPEN_POSITIONS}"
+            f"MAX_DAILY_DRAWDOWN tuned: {Config.MAX_DAILY_DRAWDOWN} -> {limit:.2f}"
         )
-        if len(positions) > Config.MAX_OPEN_POSITIONS:
-            logger.info(f"Max positions exceeded: {len(positions)}. Closing trades.")
-            await close_all_positions(ib)
+        Config.MAX_DAILY_DRAWDOWN = round(limit, 2)
 
-    # Monitor position sizes
+    # Monitor open positions
     @staticmethod
-    async def check_position_sizes(ib):
-        positions = ib.positions()
-        total_size = reduce(lambda a, b: a + b, [p.position for p in positions], 0)
-        logger.info(f"Total position size: {total_size}")
-        for pos in positions:
-            if pos.position > Config.MAX_POSITION_SIZE:
-                logger.info(
-                    f"Position size exceeded: {pos.contract.symbol} - {pos.position}. Closing trades."
-                )
-                await close_all_positions(ib)
+    def check_open_positions(open_positions: int) -> str | None:
+        if open_positions > Config.MAX_OPEN_POSITIONS:
+            return f"Max positions exceeded: {open_positions}"
+        return None
+
+    # Monitor notional exposure
+    @staticmethod
+    def check_exposure(
+        name: str, notional: float, pct: float | None, limit: float, limit_pct: float
+    ) -> str | None:
+        if notional > limit or (pct is not None and pct > limit_pct):
+            share = f" ({pct:.0f}% of net liquidation)" if pct is not None else ""
+            return f"{name} exposure exceeded: ${notional:,.0f}{share}"
+        return None
+
+    @staticmethod
+    def check_symbol_exposure(exposure: ExposureIndex, symbol: str) -> str | None:
+        notional = exposure.exposure(symbol)
+        return Account.check_exposure(
+            symbol,
+            notional,
+            exposure.pct(notional),
+            Config.MAX_SYMBOL_EXPOSURE,
+            Config.MAX_SYMBOL_EXPOSURE_PCT,
+        )
+
+    @staticmethod
+    def check_gross_exposure(exposure: ExposureIndex) -> str | None:
+        return Account.check_exposure(
+            "Gross",
+            exposure.gross,
+            exposure.pct(exposure.gross),
+            Config.MAX_GROSS_EXPOSURE,
+            Config.MAX_GROSS_EXPOSURE_PCT,
+        )
 
     # Monitor daily trades
     @staticmethod
-    async def check_daily_trades(ib):
-        trades = ib.trades()
-        logger.info(f"Total trades today: {len(trades)} | {Config.MAX_TRADES_PER_DAY}")
-        if len(trades) > Config.MAX_TRADES_PER_DAY:
-            logger.info(f"Max trades exceeded: {len(trades)}. Closing trades.")
-            await close_all_positions(ib)
+    def check_daily_trades(trades: int) -> str | None:
+        if trades > Config.MAX_TRADES_PER_DAY:
+            return f"Max trades exceeded: {trades}"
+        return None
 
 
 class Guardian:
-    """Guardian ensures my assets are safe from over-exposure and unexpected events."""
+    """
+    Guardian ensures my assets are safe from over-exposure and unexpected events.
+
+    It reacts to position, order status, execution and PnL events as they
+    arrive, keeping its own counts up to date, so a breach is acted upon
+    right away instead of at the next poll.
+    """
 
     def __init__(self, ib, config: Config):
         self.config = config
         self.ib = ib
+        self.supervisor = ConnectionSupervisor(ib)
+        self.positions: dict[tuple, Position] = {}
+        self.orders: set[tuple] = set()
+        self.tracker: PnLTracker | None = None
+        self.exposure = ExposureIndex()
+        self.liquidation: asyncio.Task | None = None
 
-    async def run(self) -> None:
-        await connect_ib(self.ib)
-
-        # Main monitoring loop
-        while True:
-            try:
-                tasks = [
-                    Timer.check_exit_time(self.ib),
-                    Account.check_daily_pnl(self.ib),
-                    Account.check_open_positions(self.ib),
-                    Account.check_position_sizes(self.ib),
-                    Account.check_daily_trades(self.ib),
+    @staticmethod
+    def order_key(trade) -> tuple:
+        order = trade.order
+        return (order.clientId, order.orderId) if order.orderId > 0 else (order.permId,)
+
+    def load(self) -> None:
+        """Take the current state, events keep it up to date from here."""
+        self.positions = {
+            (pos.account, pos.contract.conId): pos
+            for pos in self.ib.positions()
+            if pos.position
+        }
+        self.orders = {Guardian.order_key(trade) for trade in self.ib.trades()}
+        self.exposure.load(self.ib.positions())
+        for value in self.ib.accountValues():
+            self.exposure.on_account_value(value)
+        logger.info(
+            f"Open positions: {len(self.positions)} | {Config.MAX_OPEN_POSITIONS}, "
+            f"trades today: {len(self.orders)} | {Config.MAX_TRADES_PER_DAY}, "
+            f"gross exposure: ${self.exposure.gross:,.0f}"
+        )
+        self.check(*self.exposure.shares)
+
+    def start(self) -> None:
+        accounts = self.ib.managedAccounts()
+        self.exposure.account = accounts[0] if accounts else None
+        self.load()
+        if accounts:
+            self.tracker = PnLTracker(self.ib, accounts[0])
+            self.tracker.start()
+            self.tracker.updateEvent += self.on_pnl
+        self.ib.positionEvent += self.on_position
+        self.ib.orderStatusEvent += self.on_order_status
+        self.ib.execDetailsEvent += self.on_exec_details
+        self.ib.accountValueEvent += self.exposure.on_account_value
+        self.supervisor.reconnectedEvent += self.load
+
+    def stop(self) -> None:
+        self.ib.positionEvent -= self.on_position
+        self.ib.orderStatusEvent -= self.on_order_status
+        self.ib.execDetailsEvent -= self.on_exec_details
+        self.ib.accountValueEvent -= self.exposure.on_account_value
+        self.supervisor.reconnectedEvent -= self.load
+        if self.tracker is not None:
+            self.tracker.updateEvent -= self.on_pnl
+            self.tracker.stop()
+
+    def on_position(self, position) -> None:
+        key = (position.account, position.contract.conId)
+        if position.position:
+            self.positions[key] = position
+        else:
+            self.positions.pop(key, None)
+        self.exposure.on_position(position)
+        logger.info(
+            f"Position {position.contract.symbol}: {position.position} | "
+            f"open positions: {len(self.positions)}"
+        )
+        self.check(position.contract.symbol)
+
+    def on_order_status(self, trade) -> None:
+        key = Guardian.order_key(trade)
+        if key not in self.orders:
+            self.orders.add(key)
+            logger.info(
+                f"Trades today: {len(self.orders)} | {Config.MAX_TRADES_PER_DAY}"
+            )
+            self.check()
+
+    def on_exec_details(self, trade, fill) -> None:
+        execution = fill.execution
+        logger.info(
+            f"Filled {execution.side} {execution.shares} {trade.contract.symbol} "
+            f"@ {execution.price}"
+        )
+        self.exposure.on_fill(trade, fill)
+        self.orders.add(Guardian.order_key(trade))
+        self.check(trade.contract.symbol)
+
+    def on_pnl(self, tracker: PnLTracker) -> None:
+        self.check()
+
+    def check(self, *symbols: str) -> None:
+        """Run the limits that may have changed, closing everything on a breach."""
+        try:
+            reasons = [
+                Account.check_open_positions(len(self.positions)),
+                Account.check_daily_trades(len(self.orders)),
+                Account.check_gross_exposure(self.exposure),
+                *(Account.check_symbol_exposure(self.exposure, s) for s in symbols),
+            ]
+            if self.tracker is not None:
+                reasons += [
+                    Account.check_daily_pnl(self.tracker.total),
+                    Account.check_drawdown_from_peak(
+                        self.tracker.drawdown, self.tracker.peak
+                    ),
                 ]
+            reasons = [reason for reason in reasons if reason]
+            if reasons:
+                self.breach(reasons)
+        except Exception as e:
+            logger.error(f"Error in Guardian monitoring: {str(e)}")
 
-                await asyncio.gather(*tasks)
-                print("=" * 40)
-                # Wait before next check
-                await asyncio.sleep(30)
-            except KeyboardInterrupt:
-                logger.info("Keyboard Interrupt.")
-                break
-            except Exception as e:
-                logger.error(f"Error in Guardian monitoring: {str(e)}")
-                await asyncio.sleep(30)  # Continue monitoring even after error
+    def breach(self, reasons: list[str]) -> None:
+        # Nothing to close, e.g. a PnL limit still breached after closing
+        if not self.positions:
+            return
+        if self.liquidation is not None and not self.liquidation.done():
+            return
+        logger.info(f"{'; '.join(reasons)}. Closing trades.")
+        self.liquidation = asyncio.ensure_future(close_all_positions(self.ib))
+
+    async def run(self) -> None:
+        if not await self.supervisor.start():
+            return
+        Account.tune_daily_drawdown()
+        self.start()
+        try:
+            if Config.TURN_OFF_TIMER:
+                await asyncio.Future()  # until interrupted
+            else:
+                await Timer.wait_exit_time(self.ib)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            logger.info("Keyboard Interrupt.")
+        finally:
+            self.stop()
+            self.supervisor.stop()
 
 
 if __name__ == "__main__":
-    ib = IB()
+    ib = create_ib()
     guardian = Guardian(ib, Config)
     asyncio.run(guardian.run())
@@ -1,22 +1,32 @@
 import asyncio
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
 import aiohttp
+import numpy as np
 import pandas as pd
 import requests
 from ib_insync import *
 from tabulate import tabulate
 
+from my_module.bar_buffer import BarRingBuffer
+from my_module.bar_cache import BarCache
 from my_module.close_all_positions import close_all_positions
-from my_module.connect import connect_ib
+from my_module.connect import connect_ib, create_ib
+from my_module.contract_cache import ContractCache
+from my_module.history_scheduler import HistoricalDataScheduler
+from my_module.indicator_panel import IndicatorPanel
+from my_module.indicator_state import IndicatorState
 from my_module.indicators import Indicators
 from my_module.logger import Logger
 from my_module.order import place_bracket_order
 from my_module.util import get_exit_time
 from my_module.utils.candle_stick_chart import create_candle_chart
 from my_module.utils.speak import Speak
+from my_module.watchlist import WatchlistConfig, WatchlistManager
+from scanner import Scanner
 
 logger = Logger.get_logger()
 speak = Speak()
@@ -29,6 +39,28 @@ class Config:
     HISTORICAL_DURATION: str = "2 D"
     BAR_SIZE: str = "3 mins"
     CHECK_INTERVAL_SECONDS: int = 180
+    # Update indicators bar by bar instead of recomputing the whole frame
+    INCREMENTAL_INDICATORS: bool = True
+    # Evaluate all contracts in one batched NumPy pass
+    PANEL_MODE: bool = False
+    # Keep bars on disk and only request the missing tail from IBKR
+    BAR_CACHE: bool = True
+    # Subscribe to live bars and evaluate each one as it completes
+    STREAMING: bool = False
+    # Bars (and their indicators) kept in memory per symbol, enough for
+    # HISTORICAL_DURATION since the panel reads the frame from them
+    BUFFER_CAPACITY: int = 512
+    # Signal and price level parameters, see sweep.py for tuning them
+    RSI_OVERSOLD: float = 30
+    RSI_OVERBOUGHT: float = 70
+    # Only signal while the retrace is below this ratio, None disables it
+    RETRACE_RATIO: float | None = None
+    ENTRY_RANGE_RATIO: float = 0.1
+    STOP_RANGE_RATIO: float = 0.25
+    # Add scanner candidates to CONTRACTS, evicting the least recently
+    # signalled symbols once the market data lines run out
+    DYNAMIC_WATCHLIST: bool = False
+    MARKET_DATA_LINES: int = 100
     # CONTRACTS = ["AAPL", "META", "AMD", "MU", "JPM", "TSLA", "SPY"]
     CONTRACTS = ["TSLA"]
 
@@ -36,20 +68,75 @@ class Config:
 class HistoricalDataFetcher:
     """Handles fetching historical data for a given stock symbol."""
 
+    # Longer gaps in the cache are refetched in full
+    MAX_GAP_SECONDS = 86400
+
     @staticmethod
-    def fetch(ib: IB, contract: Contract, config: Config) -> pd.DataFrame:
-        bars = ib.reqHistoricalData(
+    async def fetch(ib: IB, contract: Contract, config: Config) -> pd.DataFrame:
+        bars = await HistoricalDataFetcher.fetch_bars(ib, contract, config)
+        return HistoricalDataFetcher._add_indicators(
+            HistoricalDataFetcher.to_dataframe(bars)
+        )
+
+    @staticmethod
+    async def fetch_bars(
+        ib: IB, contract: Contract, config: Config, since: datetime | None = None
+    ) -> list[BarData]:
+        """
+        Bars of the configured duration, or only the newly fetched ones when
+        the caller already holds the cached bars up to ``since``.
+        """
+        if not config.BAR_CACHE:
+            return await HistoricalDataFetcher._request(
+                ib, contract, config.HISTORICAL_DURATION, config.BAR_SIZE
+            )
+
+        cache = BarCache()
+        last_time = cache.last_time(contract.symbol, config.BAR_SIZE)
+        gap_seconds = time.time() - last_time if last_time else None
+
+        if gap_seconds is None or gap_seconds > HistoricalDataFetcher.MAX_GAP_SECONDS:
+            duration = config.HISTORICAL_DURATION
+        else:
+            # Start at the last cached bar, it may still have been in progress
+            duration = f"{int(gap_seconds) + 1} S"
+
+        bars = await HistoricalDataFetcher._request(
+            ib, contract, duration, config.BAR_SIZE
+        )
+        cache.merge(contract.symbol, config.BAR_SIZE, BarCache.to_records(bars))
+        logger.debug(f"{contract.symbol}: fetched {len(bars)} bars ({duration})")
+
+        if (
+            since is not None
+            and duration != config.HISTORICAL_DURATION
+            and since.timestamp() >= last_time
+        ):
+            # The fetched tail starts at the last cached bar
+            return bars
+
+        count, unit = config.HISTORICAL_DURATION.split()
+        sessions = int(count) if unit == "D" else None
+        return BarCache.to_bars(cache.load(contract.symbol, config.BAR_SIZE, sessions))
+
+    @staticmethod
+    async def _request(
+        ib: IB, contract: Contract, duration: str, bar_size: str
+    ) -> BarDataList:
+        return await HistoricalDataScheduler.of(ib).request(
             contract,
             # endDateTime="20250226 05:00:00",
             endDateTime="",
-            durationStr="2 D",
-            barSizeSetting="3 mins",
+            durationStr=duration,
+            barSizeSetting=bar_size,
             whatToShow="TRADES",
             useRTH=True,
             formatDate=1,
         )
 
-        df = pd.DataFrame(
+    @staticmethod
+    def to_dataframe(bars) -> pd.DataFrame:
+        return pd.DataFrame(
             [
                 {
                     "time": bar.date,
@@ -63,8 +150,6 @@ class HistoricalDataFetcher:
             ]
         )
 
-        return HistoricalDataFetcher._add_indicators(df)
-
     @staticmethod
     def _add_indicators(df: pd.DataFrame) -> pd.DataFrame:
         """Add technical indicators to the dataframe"""
@@ -119,24 +204,19 @@ class PriceLevelCalculator:
     """Calculates suggested price levels for a given stock symbol."""
 
     @staticmethod
-    def calculate(df: pd.DataFrame, reversal_up: bool):
+    def calculate(
+        df: pd.DataFrame, reversal_up: bool, entry_ratio=0.1, stop_ratio=0.25
+    ):
         latest = df.iloc[-1]
-        high_of_day = latest["high_of_day"]
-        low_of_day = latest["low_of_day"]
-        range = high_of_day - low_of_day
-        close = latest["close"]
-
-        suggested_entry = (
-            min(low_of_day + (range * 0.1), close)
-            if reversal_up
-            else max(high_of_day - (range * 0.1), close)
+        entry, profit_target, stop = Indicators.price_levels(
+            latest["high_of_day"],
+            latest["low_of_day"],
+            latest["close"],
+            reversal_up,
+            entry_ratio,
+            stop_ratio,
         )
-        suggested_profit_target = (high_of_day + low_of_day) / 2
-        suggested_stop = (
-            suggested_entry - range / 4 if reversal_up else suggested_entry + range / 4
-        )
-
-        return suggested_entry, suggested_profit_target, suggested_stop
+        return float(entry), float(profit_target), float(stop)
 
 
 class AlertManager:
@@ -186,34 +266,145 @@ class ReversalAlgo:
         self.contracts = [
             Stock(symbol, "SMART", "USD") for symbol in self.config.CONTRACTS
         ]
+        self.indicator_states: dict[str, IndicatorState] = {}
+        self.bar_subscriptions: dict[str, BarDataList] = {}
+        # Streamed evaluations in flight, and one lock per symbol so they run
+        # one at a time on its indicator state
+        self.evaluations: set[asyncio.Task] = set()
+        self.evaluation_locks: dict[str, asyncio.Lock] = {}
+        self.watchlist = (
+            WatchlistManager(
+                ib,
+                WatchlistConfig(
+                    MAX_LINES=self.config.MARKET_DATA_LINES,
+                    PINNED=tuple(self.config.CONTRACTS),
+                ),
+                subscribe=self.subscribe_bars if self.config.STREAMING else None,
+                unsubscribe=lambda contract: self.unsubscribe_bars(contract.symbol),
+            )
+            if self.config.DYNAMIC_WATCHLIST
+            else None
+        )
+        if self.watchlist is not None:
+            self.watchlist.evictedEvent += self.forget_symbol
 
     async def check_alerts(self, contract: Contract) -> None:
         """Check for trading alerts for specific contract"""
         try:
-            df = HistoricalDataFetcher.fetch(self.ib, contract, self.config)
-            if df.empty:
+            state = self.indicator_states.get(contract.symbol)
+            since = (
+                state.last_time
+                if state is not None and self.config.INCREMENTAL_INDICATORS
+                else None
+            )
+            bars = await HistoricalDataFetcher.fetch_bars(
+                self.ib, contract, self.config, since
+            )
+            await self.evaluate_bars(contract, bars)
+        except Exception as e:
+            logger.error(f"Error in checking alerts for {contract.symbol}: {str(e)}")
+
+    async def evaluate_bars(self, contract: Contract, bars: list[BarData]) -> None:
+        """Run the reversal rule on the latest of the given bars"""
+        if not bars:
+            return
+
+        if self.config.INCREMENTAL_INDICATORS:
+            state = self.indicator_state(contract.symbol)
+            state.update_many(bars)
+            if state.previous is None:
                 return
 
+            prev, last = state.previous, state.latest
+            logger.info(
+                f"{contract.symbol} | {last['time']} | close: {last['close']:.2f} "
+                f"| vwap: {last['vwap']:.2f} | rsi: {last['rsi']:.2f}"
+            )
+        else:
+            df = HistoricalDataFetcher._add_indicators(
+                HistoricalDataFetcher.to_dataframe(bars)
+            )
             prev, last = df.iloc[-2], df.iloc[-1]
 
-            reversal_up = (
-                last["rsi"] > 30 and prev["rsi"] < 30 and last["breakout_lower_vwap"]
+        oversold, overbought = self.config.RSI_OVERSOLD, self.config.RSI_OVERBOUGHT
+        reversal_up = (
+            last["rsi"] > oversold
+            and prev["rsi"] < oversold
+            and last["breakout_lower_vwap"]
+        )
+        # reversal_up = True
+        reversal_down = (
+            last["rsi"] < overbought
+            and prev["rsi"] > overbought
+            and last["breakout_upper_vwap"]
+        )
+        retrace_ratio = self.config.RETRACE_RATIO
+        if retrace_ratio is not None and not last["retrace_percentage"] < retrace_ratio:
+            reversal_up = reversal_down = False
+
+        if reversal_up or reversal_down:
+            if self.config.INCREMENTAL_INDICATORS:
+                # The full frame is only needed for the chart and price levels
+                df = state.buffer.to_dataframe()
+                last = df.iloc[-1]
+            await self.handle_reversal(contract, df, last, reversal_up)
+
+    async def check_alerts_panel(self, contracts: list[Contract]) -> None:
+        """Check for trading alerts across all contracts in one batched pass"""
+        try:
+            states = {
+                contract.symbol: self.indicator_state(contract.symbol)
+                for contract in contracts
+            }
+            # Queued together, the scheduler paces them
+            results = await asyncio.gather(
+                *(
+                    HistoricalDataFetcher.fetch_bars(
+                        self.ib,
+                        contract,
+                        self.config,
+                        states[contract.symbol].last_time,
+                    )
+                    for contract in contracts
+                )
             )
-            # reversal_up = True
-            reversal_down = (
-                last["rsi"] < 70 and prev["rsi"] > 70 and last["breakout_upper_vwap"]
+            for contract, bars in zip(contracts, results):
+                states[contract.symbol].update_many(bars)
+            panel = IndicatorPanel.from_buffers(
+                {symbol: state.buffer for symbol, state in states.items()}
             )
+            if not panel.symbols:
+                return
 
-            if reversal_up or reversal_down:
-                await self.handle_reversal(contract, df, last, reversal_up)
+            reversal_up, reversal_down = panel.reversal_masks(
+                self.config.RSI_OVERSOLD,
+                self.config.RSI_OVERBOUGHT,
+                self.config.RETRACE_RATIO,
+            )
+            signals = reversal_up[:, -1] | reversal_down[:, -1]
+
+            for row in np.flatnonzero(signals):
+                symbol = panel.symbols[row]
+                contract = next(c for c in contracts if c.symbol == symbol)
+                df = states[symbol].buffer.to_dataframe()
+                await self.handle_reversal(
+                    contract, df, df.iloc[-1], bool(reversal_up[row, -1])
+                )
         except Exception as e:
-            logger.error(f"Error in checking alerts for {contract.symbol}: {str(e)}")
+            logger.error(f"Error in checking panel alerts: {str(e)}")
 
     async def handle_reversal(
         self, contract: Contract, df: pd.DataFrame, latest: pd.Series, reversal_up: bool
     ) -> None:
         """Handle a detected reversal"""
-        entry, profit_target, stop = PriceLevelCalculator.calculate(df, reversal_up)
+        if self.watchlist is not None:
+            self.watchlist.touch(contract.symbol)
+        entry, profit_target, stop = PriceLevelCalculator.calculate(
+            df,
+            reversal_up,
+            self.config.ENTRY_RANGE_RATIO,
+            self.config.STOP_RANGE_RATIO,
+        )
 
         image_path = await asyncio.to_thread(
             create_candle_chart,
@@ -243,10 +434,129 @@ class ReversalAlgo:
         speak.say(f"{direction.lower()} reversal")
         speak.say_letter_by_letter(contract.symbol)
 
+    async def subscribe_bars(self, contract: Contract) -> None:
+        """Stream bars for a contract, kept up to date by IBKR"""
+        bars = await HistoricalDataScheduler.of(self.ib).request(
+            contract,
+            endDateTime="",
+            durationStr=self.config.HISTORICAL_DURATION,
+            barSizeSetting=self.config.BAR_SIZE,
+            whatToShow="TRADES",
+            useRTH=True,
+            formatDate=1,
+            keepUpToDate=True,
+        )
+        bars.updateEvent += lambda bars, has_new_bar: self._on_bar_update(
+            contract, bars, has_new_bar
+        )
+        self.bar_subscriptions[contract.symbol] = bars
+        logger.info(f"📡 Streaming {self.config.BAR_SIZE} bars for {contract.symbol}")
+
+    def unsubscribe_bars(self, symbol: str) -> None:
+        bars = self.bar_subscriptions.pop(symbol, None)
+        if bars is not None:
+            self.ib.cancelHistoricalData(bars)
+
+    def indicator_state(self, symbol: str) -> IndicatorState:
+        """The incremental indicators and bar buffer of a symbol"""
+        state = self.indicator_states.get(symbol)
+        if state is None:
+            state = self.indicator_states[symbol] = IndicatorState(
+                buffer=BarRingBuffer(self.config.BUFFER_CAPACITY)
+            )
+        return state
+
+    def forget_symbol(self, contract: Contract) -> None:
+        """Drop the indicator state of a symbol that left the watchlist"""
+        self.indicator_states.pop(contract.symbol, None)
+
+    def _on_bar_update(
+        self, contract: Contract, bars: BarDataList, has_new_bar: bool
+    ) -> None:
+        # Only react once a bar completes; the last bar is the one in progress
+        if not has_new_bar or not self.is_running:
+            return
+
+        active_symbols = {pos.contract.symbol.upper() for pos in self.ib.positions()}
+        if contract.symbol.upper() in active_symbols:
+            return
+
+        completed = bars[:-1]
+        if self.config.BAR_CACHE:
+            BarCache().merge(
+                contract.symbol,
+                self.config.BAR_SIZE,
+                BarCache.to_records(completed[-1:]),
+            )
+        task = asyncio.create_task(self._evaluate_streamed(contract, completed))
+        self.evaluations.add(task)
+        task.add_done_callback(self.evaluations.discard)
+
+    async def _evaluate_streamed(self, contract: Contract, bars: list[BarData]):
+        lock = self.evaluation_locks.setdefault(contract.symbol, asyncio.Lock())
+        try:
+            async with lock:
+                await self.evaluate_bars(contract, bars)
+        except Exception as e:
+            logger.error(f"Error in checking alerts for {contract.symbol}: {str(e)}")
+
+    async def qualify_contracts(self) -> None:
+        """Resolve the configured contracts once, from the contract cache"""
+        cache = ContractCache.shared()
+        await cache.refresh(self.ib)
+        self.contracts = await cache.qualify(self.ib, *self.contracts)
+
+    async def start_watchlist(self) -> asyncio.Task | None:
+        """Watch the configured contracts and keep adding scanner candidates"""
+        if self.watchlist is None:
+            return None
+        for contract in self.contracts:
+            await self.watchlist.add(contract)
+        return asyncio.create_task(
+            self.watchlist.follow_scanner(lambda: Scanner.get_candidates(self.ib))
+        )
+
+    def stop_watchlist(self, task: asyncio.Task | None) -> None:
+        if task is not None:
+            task.cancel()
+        if self.watchlist is not None:
+            self.watchlist.clear()
+
+    async def run_streaming(self):
+        """Algo execution driven by completed bars instead of polling"""
+        watchlist_task = None
+        try:
+            self.is_running = True
+            await self.qualify_contracts()
+            if self.watchlist is not None:
+                watchlist_task = await self.start_watchlist()
+            else:
+                for contract in self.contracts:
+                    await self.subscribe_bars(contract)
+
+            while self.is_running:
+                await asyncio.sleep(1)
+
+        except KeyboardInterrupt:
+            logger.info("Received shutdown signal")
+        except Exception as e:
+            logger.error(f"Error in streaming reversal algo: {str(e)}")
+        finally:
+            self.is_running = False
+            self.stop_watchlist(watchlist_task)
+            for symbol in list(self.bar_subscriptions):
+                self.unsubscribe_bars(symbol)
+
     async def run(self):
         """Main algo execution loop"""
+        if self.config.STREAMING:
+            return await self.run_streaming()
+
+        watchlist_task = None
         try:
             self.is_running = True
+            await self.qualify_contracts()
+            watchlist_task = await self.start_watchlist()
 
             while self.is_running:
                 # Do not check alerts for active position stocks
@@ -254,14 +564,23 @@ class ReversalAlgo:
                     pos.contract.symbol.upper() for pos in self.ib.positions()
                 }
 
-                tasks = [
-                    self.check_alerts(contract)
-                    for contract in self.contracts
+                watched = (
+                    self.contracts
+                    if self.watchlist is None
+                    else self.watchlist.contracts
+                )
+                contracts = [
+                    contract
+                    for contract in watched
                     if contract.symbol.upper() not in active_symbols
                 ]
 
-                await asyncio.gather(*tasks)
-                logger.info(f"Monitored:{self.config.CONTRACTS}")
+                if self.config.PANEL_MODE:
+                    await self.check_alerts_panel(contracts)
+                else:
+                    tasks = [self.check_alerts(contract) for contract in contracts]
+                    await asyncio.gather(*tasks)
+                logger.info(f"Monitored:{[c.symbol for c in watched]}")
                 self.ib.sleep(self.config.CHECK_INTERVAL_SECONDS)
 
         except KeyboardInterrupt:
@@ -270,12 +589,13 @@ class ReversalAlgo:
             logger.error(f"Error in running reversal algo: {str(e)}")
         finally:
             self.is_running = False
+            self.stop_watchlist(watchlist_task)
 
 
 async def main():
     """Application entry point"""
     try:
-        ib = IB()
+        ib = create_ib()
         await connect_ib(ib)
 
         algo = ReversalAlgo(ib)
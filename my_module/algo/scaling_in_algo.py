@@ -2,9 +2,10 @@ import asyncio
 from decimal import Decimal
 from typing import Literal
 
-from ib_insync import LimitOrder, Stock, StopLimitOrder, StopOrder
+from ib_insync import LimitOrder, StopLimitOrder, StopOrder
 
 from my_module.close_positions import close_positions
+from my_module.contract_cache import ContractCache
 from my_module.logger import Logger
 
 logger = Logger.get_logger()
@@ -42,7 +43,9 @@ class ScalingInAlgo:
         """
         try:
             self.is_running = True
-            contract = Stock(symbol, "SMART", "USD")
+            contract = await ContractCache.shared().stock(self.ib, symbol)
+            if contract is None:
+                raise ValueError(f"Unknown symbol {symbol}")
 
             self._set_order_actions(direction)
 
@@ -0,0 +1,250 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from my_module.bar_cache import MARKET_TIMEZONE, BarCache
+from my_module.indicator_panel import IndicatorPanel
+from my_module.indicators import Indicators
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class BacktestConfig:
+    """Parameters of the reversal signal replayed by the backtester."""
+
+    BAR_SIZE: str = "3 mins"
+    SESSIONS: int = 2
+    RSI_OVERSOLD: float = 30
+    RSI_OVERBOUGHT: float = 70
+    RETRACE_RATIO: float | None = None
+    ENTRY_RANGE_RATIO: float = 0.1
+    STOP_RANGE_RATIO: float = 0.25
+    # Symbol-days evaluated per NumPy pass, bounds memory use
+    CHUNK_ROWS: int = 500
+    # Processes the symbols are split across
+    WORKERS: int = os.cpu_count() or 1
+
+
+@dataclass
+class BacktestResult:
+    signals: pd.DataFrame
+    summary: dict
+
+
+class Backtester:
+    """
+    Replays cached bars through ``IndicatorPanel`` and the ``check_alerts`` rule.
+
+    Every (symbol, trading day) becomes one panel row holding the frame the
+    live algo would fetch on that day: the previous ``SESSIONS - 1`` days plus
+    the day itself. All rows are evaluated at once and signals are taken from
+    the bars of the day, so each signal is what the algo would have seen when
+    that bar completed.
+    """
+
+    def __init__(self, config: BacktestConfig = BacktestConfig(), cache=None):
+        self.config = config
+        self.cache = cache or BarCache()
+
+    def _frames(self, symbols, start=None, end=None):
+        """Yield (symbol, frame records, bars in the day) for every cached day."""
+        for symbol in symbols:
+            days = self.cache.days(symbol, self.config.BAR_SIZE)
+            records = [
+                self.cache.load_day(symbol, self.config.BAR_SIZE, day, mmap=False)
+                for day in days
+            ]
+            for i in range(self.config.SESSIONS - 1, len(days)):
+                if (start and days[i] < start) or (end and days[i] > end):
+                    continue
+                frame = records[i - self.config.SESSIONS + 1 : i + 1]
+                yield symbol, frame, len(records[i])
+
+    def _panel(self, frames) -> tuple[IndicatorPanel, np.ndarray]:
+        """Right-aligned panel over frames, plus the first column of each day."""
+        width = max(sum(len(day) for day in frame) for _, frame, _ in frames)
+        shape = (len(frames), width)
+        time = np.zeros(shape, dtype=np.int64)
+        day = np.full(shape, -1, dtype=np.int64)
+        columns = {name: np.full(shape, np.nan) for name in BarCache.DTYPE.names[1:]}
+
+        for row, (_, frame, _) in enumerate(frames):
+            col = width - sum(len(records) for records in frame)
+            for session, records in enumerate(frame):
+                cols = slice(col, col + len(records))
+                time[row, cols] = records["time"]
+                day[row, cols] = session
+                for name, array in columns.items():
+                    array[row, cols] = records[name]
+                col += len(records)
+
+        symbols = [symbol for symbol, _, _ in frames]
+        session_start = width - np.array([n for _, _, n in frames])
+        return IndicatorPanel(symbols, time, day, **columns), session_start
+
+    def _outcomes(self, panel, rows, cols, reversal_up, entry, target, stop):
+        """Walk the bars after each signal until the day ends.
+
+        Returns the outcome, the bars to exit (-1 when not closed) and the exit
+        price; trades still open are marked at the last close of the day.
+        """
+        width = panel.close.shape[1]
+        steps = cols[:, None] + 1 + np.arange(width)
+        in_day = steps < width
+        steps = np.minimum(steps, width - 1)
+        high = np.where(in_day, panel.high[rows[:, None], steps], np.nan)
+        low = np.where(in_day, panel.low[rows[:, None], steps], np.nan)
+
+        up = reversal_up[:, None]
+        filled = np.where(up, low <= entry[:, None], high >= entry[:, None])
+        is_filled = filled.any(axis=1)
+        after_fill = np.arange(width) >= np.argmax(filled, axis=1)[:, None]
+
+        # A bar touching both levels is counted as a stop
+        hit_stop = after_fill & np.where(
+            up, low <= stop[:, None], high >= stop[:, None]
+        )
+        hit_target = after_fill & np.where(
+            up, high >= target[:, None], low <= target[:, None]
+        )
+        stop_step = np.where(hit_stop.any(axis=1), np.argmax(hit_stop, axis=1), width)
+        target_step = np.where(
+            hit_target.any(axis=1), np.argmax(hit_target, axis=1), width
+        )
+
+        outcome = np.select(
+            [~is_filled, target_step < stop_step, stop_step < width],
+            ["unfilled", "target", "stop"],
+            default="open",
+        )
+        exit_step = np.minimum(stop_step, target_step)
+        closed = is_filled & (exit_step < width)
+        exit_price = np.select(
+            [outcome == "target", outcome == "stop", outcome == "open"],
+            [target, stop, panel.close[rows, -1]],
+            default=np.nan,
+        )
+        return outcome, np.where(closed, exit_step + 1, -1), exit_price
+
+    def run(self, symbols, start=None, end=None) -> BacktestResult:
+        """Backtest ``symbols`` over cached days between ``start`` and ``end`` (YYYYMMDD)."""
+        workers = min(self.config.WORKERS, len(symbols))
+        if workers > 1:
+            groups = [symbols[i::workers] for i in range(workers)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parts = list(
+                    pool.map(
+                        _run_group,
+                        [(self.config, self.cache.root, g, start, end) for g in groups],
+                    )
+                )
+        else:
+            parts = [self.run_signals(symbols, start, end)]
+
+        frames = [signals for signals, _ in parts if not signals.empty]
+        signals = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if not signals.empty:
+            signals = signals.sort_values(["time", "symbol"], ignore_index=True)
+            signals["time"] = pd.to_datetime(
+                signals["time"], unit="s", utc=True
+            ).dt.tz_convert(MARKET_TIMEZONE)
+
+        summary = Backtester.summarize(signals, sum(days for _, days in parts))
+        logger.info(f"Backtest summary: {summary}")
+        return BacktestResult(signals, summary)
+
+    def run_signals(self, symbols, start=None, end=None) -> tuple[pd.DataFrame, int]:
+        """Signals with their outcomes, and the number of symbol-days replayed."""
+        frames = self._frames(symbols, start, end)
+        symbol_days = 0
+        results = []
+
+        while chunk := list(islice(frames, self.config.CHUNK_ROWS)):
+            symbol_days += len(chunk)
+            panel, session_start = self._panel(chunk)
+            indicators = panel.compute()
+            up, down = panel.reversal_masks(
+                self.config.RSI_OVERSOLD,
+                self.config.RSI_OVERBOUGHT,
+                self.config.RETRACE_RATIO,
+            )
+            in_day = np.arange(panel.close.shape[1]) >= session_start[:, None]
+            rows, cols = np.nonzero((up | down) & in_day)
+            if not len(rows):
+                continue
+
+            reversal_up = up[rows, cols]
+            high_of_day = indicators["high_of_day"][rows, cols]
+            low_of_day = indicators["low_of_day"][rows, cols]
+            close = panel.close[rows, cols]
+            entry, target, stop = Indicators.price_levels(
+                high_of_day,
+                low_of_day,
+                close,
+                reversal_up,
+                self.config.ENTRY_RANGE_RATIO,
+                self.config.STOP_RANGE_RATIO,
+            )
+            outcome, bars_to_exit, exit_price = self._outcomes(
+                panel, rows, cols, reversal_up, entry, target, stop
+            )
+            direction = np.where(reversal_up, 1, -1)
+
+            results.append(
+                pd.DataFrame(
+                    {
+                        "symbol": np.array(panel.symbols)[rows],
+                        "time": panel.time[rows, cols],
+                        "direction": np.where(reversal_up, "up", "down"),
+                        "close": close,
+                        "rsi": indicators["rsi"][rows, cols],
+                        "vwap": indicators["vwap"][rows, cols],
+                        "high_of_day": high_of_day,
+                        "low_of_day": low_of_day,
+                        "entry": entry,
+                        "profit_target": target,
+                        "stop": stop,
+                        "outcome": outcome,
+                        "bars_to_exit": bars_to_exit,
+                        "exit_price": exit_price,
+                        "return": direction * (exit_price - entry) / entry,
+                    }
+                )
+            )
+
+        signals = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+        return signals, symbol_days
+
+    @staticmethod
+    def summarize(signals: pd.DataFrame, symbol_days: int = 0) -> dict:
+        counts = (
+            signals["outcome"].value_counts().to_dict() if not signals.empty else {}
+        )
+        targets, stops = counts.get("target", 0), counts.get("stop", 0)
+        return {
+            "symbol_days": symbol_days,
+            "signals": len(signals),
+            "filled": len(signals) - counts.get("unfilled", 0),
+            "targets": targets,
+            "stops": stops,
+            "open": counts.get("open", 0),
+            "hit_rate": (
+                targets / (targets + stops) if targets + stops else float("nan")
+            ),
+            # Mean return per filled signal, NaN for unfilled ones is skipped
+            "avg_return": (
+                float(signals["return"].mean()) if not signals.empty else float("nan")
+            ),
+        }
+
+
+def _run_group(args) -> tuple[pd.DataFrame, int]:
+    """Process pool entry point: backtest one group of symbols."""
+    config, cache_root, symbols, start, end = args
+    return Backtester(config, BarCache(cache_root)).run_signals(symbols, start, end)
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ("open", "high", "low", "close", "volume")
+INDICATOR_COLUMNS = (
+    "high_of_day",
+    "low_of_day",
+    "vwap",
+    "std_dev",
+    "vwap_upper",
+    "vwap_lower",
+    "price_extension",
+    "volume_ma",
+    "volume_trend",
+    "rsi",
+    "breakout_upper_vwap",
+    "breakout_lower_vwap",
+    "retrace_percentage",
+)
+
+
+class BarRingBuffer:
+    """
+    Fixed-capacity bar store for one symbol.
+
+    Every column is a preallocated array of twice the capacity and each value
+    is written to slot ``i`` and its mirror ``i + capacity``. The latest
+    ``capacity`` rows are therefore always contiguous, and ``view`` returns
+    them oldest-first as a zero-copy NumPy view. Memory is fixed at creation
+    and appending a bar only writes into the existing arrays.
+    """
+
+    __slots__ = ("capacity", "columns", "_time", "_data", "_index", "_head", "_size")
+
+    def __init__(self, capacity: int = 512, columns=BAR_COLUMNS + INDICATOR_COLUMNS):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._time = np.zeros(2 * capacity, dtype=np.int64)
+        self._data = np.full((len(self.columns), 2 * capacity), np.nan)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._head = 0  # slot of the next row
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slot(self, index: int) -> int:
+        if not -self._size <= index < self._size:
+            raise IndexError("bar index out of range")
+        return (self._head - self._size + index % self._size) % self.capacity
+
+    def append(self, time, open, high, low, close, volume) -> None:
+        slot = self._head
+        self._head = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+        self._data[:, slot] = np.nan
+        self._data[:, slot + self.capacity] = np.nan
+        self._write_bar(slot, time, open, high, low, close, volume)
+
+    def replace_last(self, time, open, high, low, close, volume) -> None:
+        """Overwrite the latest row, e.g. with a revised in-progress bar."""
+        self._write_bar(self._slot(-1), time, open, high, low, close, volume)
+
+    def drop_oldest(self, count: int) -> None:
+        """Forget the oldest rows, e.g. of a session that left the frame."""
+        self._size = max(self._size - count, 0)
+
+    def append_bar(self, bar) -> None:
+        self.append(
+            int(bar.date.timestamp()),
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            bar.volume,
+        )
+
+    def _write_bar(self, slot, time, open, high, low, close, volume) -> None:
+        for name, value in zip(BAR_COLUMNS, (open, high, low, close, volume)):
+            self.set(name, value, slot=slot)
+        self._time[slot] = self._time[slot + self.capacity] = time
+
+    def set(self, column: str, value, index: int = -1, slot: int | None = None):
+        """Set one value of the row at ``index`` (latest row by default)."""
+        slot = self._slot(index) if slot is None else slot
+        row = self._data[self._index[column]]
+        row[slot] = row[slot + self.capacity] = value
+
+    def get(self, column: str, index: int = -1) -> float:
+        return self._data[self._index[column], self._slot(index)]
+
+    @property
+    def time(self) -> np.ndarray:
+        start = (
+            self._head - self._size + (self.capacity if self._head < self._size else 0)
+        )
+        return self._time[start : start + self._size]
+
+    def view(self, column: str) -> np.ndarray:
+        """Zero-copy, oldest-first view of a column."""
+        start = (
+            self._head - self._size + (self.capacity if self._head < self._size else 0)
+        )
+        return self._data[self._index[column], start : start + self._size]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.view(column)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Copy the buffer into a DataFrame shaped like HistoricalDataFetcher's."""
+        df = pd.DataFrame({name: self.view(name) for name in self.columns})
+        df.insert(
+            0,
+            "time",
+            pd.to_datetime(self.time, unit="s", utc=True).tz_convert(
+                "America/New_York"
+            ),
+        )
+        return df
@@ -0,0 +1,176 @@
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from ib_insync import BarData
+
+from my_module.history_scheduler import HistoricalDataScheduler, Priority
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+BAR_CACHE_DIR = "assets/db/bars"
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+
+class BarCache:
+    """
+    On-disk bar store, one ``.npy`` record array per symbol, bar size and
+    trading day. Files are memory-mapped on load, so reading a day back is
+    cheap and only the newest day is ever rewritten.
+    """
+
+    DTYPE = np.dtype(
+        [
+            ("time", "i8"),  # epoch seconds
+            ("open", "f8"),
+            ("high", "f8"),
+            ("low", "f8"),
+            ("close", "f8"),
+            ("volume", "f8"),
+        ]
+    )
+
+    def __init__(self, root: str = BAR_CACHE_DIR):
+        self.root = root
+
+    def _dir(self, symbol: str, bar_size: str) -> str:
+        return os.path.join(self.root, bar_size.replace(" ", "_"), symbol.upper())
+
+    def _path(self, symbol: str, bar_size: str, day: str) -> str:
+        return os.path.join(self._dir(symbol, bar_size), f"{day}.npy")
+
+    def days(self, symbol: str, bar_size: str) -> list[str]:
+        """Cached trading days (``YYYYMMDD``), oldest first."""
+        directory = self._dir(symbol, bar_size)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            name[:-4] for name in os.listdir(directory) if name.endswith(".npy")
+        )
+
+    def modified(self, symbol: str, bar_size: str, day: str) -> int:
+        """Last write time of a cached day, in nanoseconds."""
+        return os.stat(self._path(symbol, bar_size, day)).st_mtime_ns
+
+    def load_day(
+        self, symbol: str, bar_size: str, day: str, mmap: bool = True
+    ) -> np.ndarray:
+        path = self._path(symbol, bar_size, day)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=self.DTYPE)
+        return np.load(path, mmap_mode="r" if mmap else None)
+
+    def load(
+        self, symbol: str, bar_size: str, sessions: int | None = None
+    ) -> np.ndarray:
+        """Bars of the last ``sessions`` cached days (all days if None)."""
+        days = self.days(symbol, bar_size)
+        if sessions is not None:
+            days = days[-sessions:]
+        if not days:
+            return np.empty(0, dtype=self.DTYPE)
+        return np.concatenate([self.load_day(symbol, bar_size, day) for day in days])
+
+    def last_time(self, symbol: str, bar_size: str) -> int | None:
+        days = self.days(symbol, bar_size)
+        if not days:
+            return None
+        latest = self.load_day(symbol, bar_size, days[-1])
+        return int(latest["time"][-1]) if len(latest) else None
+
+    def merge(self, symbol: str, bar_size: str, records: np.ndarray) -> None:
+        """Write new bars; cached bars within the span of the new bars are replaced."""
+        if not len(records):
+            return
+
+        os.makedirs(self._dir(symbol, bar_size), exist_ok=True)
+        first_time, last_time = records["time"][0], records["time"][-1]
+        record_days = BarCache.day_keys(records["time"])
+
+        for day in np.unique(record_days):
+            cached = self.load_day(symbol, bar_size, day)
+            merged = np.concatenate(
+                [
+                    cached[cached["time"] < first_time],
+                    records[record_days == day],
+                    cached[cached["time"] > last_time],
+                ]
+            )
+
+            # Write to a temp file first so an interrupted write never corrupts the day
+            path = self._path(symbol, bar_size, day)
+            tmp_path = f"{path}.tmp.npy"
+            np.save(tmp_path, merged)
+            del cached
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def day_keys(times: np.ndarray) -> np.ndarray:
+        return np.array(
+            [
+                datetime.fromtimestamp(t, MARKET_TIMEZONE).strftime("%Y%m%d")
+                for t in times
+            ]
+        )
+
+    @staticmethod
+    def to_records(bars) -> np.ndarray:
+        records = np.empty(len(bars), dtype=BarCache.DTYPE)
+        for i, bar in enumerate(bars):
+            records[i] = (
+                int(bar.date.timestamp()),
+                bar.open,
+                bar.high,
+                bar.low,
+                bar.close,
+                bar.volume,
+            )
+        return records
+
+    @staticmethod
+    def to_bars(records: np.ndarray) -> list[BarData]:
+        return [
+            BarData(
+                date=datetime.fromtimestamp(int(r["time"]), MARKET_TIMEZONE),
+                open=float(r["open"]),
+                high=float(r["high"]),
+                low=float(r["low"]),
+                close=float(r["close"]),
+                volume=float(r["volume"]),
+            )
+            for r in records
+        ]
+
+
+async def backfill(ib, contract, bar_size: str, days: int, cache=None, chunk_days=5):
+    """Fill the cache with the last ``days`` trading days of bars, newest first."""
+    cache = cache or BarCache()
+    end_time = ""
+    fetched_days = set()
+
+    while len(fetched_days) < days:
+        bars = await HistoricalDataScheduler.of(ib).request(
+            contract,
+            endDateTime=end_time,
+            durationStr=f"{min(chunk_days, days - len(fetched_days))} D",
+            barSizeSetting=bar_size,
+            whatToShow="TRADES",
+            useRTH=True,
+            formatDate=1,
+            priority=Priority.BACKFILL,
+        )
+        if not bars or bars[0].date == end_time:
+            break
+
+        records = BarCache.to_records(bars)
+        cache.merge(contract.symbol, bar_size, records)
+        fetched_days.update(BarCache.day_keys(records["time"]))
+        end_time = bars[0].date
+        logger.info(
+            f"Backfilled {contract.symbol} {bar_size} from {bars[0].date} "
+            f"({len(fetched_days)}/{days} days)"
+        )
+
+    return sorted(fetched_days)
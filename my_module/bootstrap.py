@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from my_module.logger import Logger
+from my_module.pnl_history import MARKET_TIMEZONE, PnLHistory
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class BootstrapConfig:
+    """Resampling settings for projections from the realized PnL history."""
+
+    SAMPLES: int = 100_000
+    # Trading days per projected equity path
+    HORIZON_DAYS: int = 20
+    # Consecutive days (or fills, for intraday) drawn together by the block
+    # bootstrap, keeping streaks intact. 1 is the plain iid bootstrap.
+    BLOCK_DAYS: int = 1
+    BLOCK_FILLS: int = 1
+    PERCENTILES: tuple = (1, 5, 25, 50, 75, 95, 99)
+    # Rows resampled per NumPy pass, bounds memory use
+    CHUNK_ROWS: int = 20_000
+    SEED: int | None = None
+
+
+@dataclass
+class BootstrapResult:
+    final_pnl: np.ndarray
+    max_drawdown: np.ndarray
+    summary: dict
+
+
+def _resample_index(rng, n, rows, length, block) -> np.ndarray:
+    """(rows, length) indices into a series of n values, in circular blocks."""
+    if block <= 1:
+        return rng.integers(0, n, size=(rows, length))
+    starts = rng.integers(0, n, size=(rows, -(-length // block)))
+    index = (starts[:, :, None] + np.arange(block)) % n
+    return index.reshape(rows, -1)[:, :length]
+
+
+def _drawdown(pnl: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Final cumulative PnL and max drawdown of each row of PnL steps."""
+    equity = np.cumsum(pnl, axis=1)
+    peak = np.maximum.accumulate(np.maximum(equity, 0), axis=1)
+    return equity[:, -1], (peak - equity).max(axis=1)
+
+
+class Bootstrap:
+    """
+    Resamples the realized PnL history to project equity paths.
+
+    ``project`` draws whole trading days to build multi-day equity curves,
+    ``intraday`` rebuilds single days from individual fills to estimate how
+    deep realized PnL goes within a day. Both resample index arrays in
+    chunks, so thousands of days of history take seconds.
+    """
+
+    def __init__(
+        self, fills: pd.DataFrame, config: BootstrapConfig = BootstrapConfig()
+    ):
+        self.config = config
+        fills = fills.sort_values("time")
+        day = fills["time"].dt.tz_convert(MARKET_TIMEZONE).dt.date
+        self.fill_pnl = fills["realized_pnl"].to_numpy(dtype=np.float64)
+        self.daily_pnl = fills.groupby(day)["realized_pnl"].sum().to_numpy()
+        self.fills_per_day = day.value_counts(sort=False).to_numpy()
+        self.rng = np.random.default_rng(config.SEED)
+
+    @classmethod
+    def from_history(cls, history: PnLHistory | None = None, **kwargs):
+        return cls((history or PnLHistory()).load(), **kwargs)
+
+    def _chunks(self):
+        for start in range(0, self.config.SAMPLES, self.config.CHUNK_ROWS):
+            yield min(self.config.CHUNK_ROWS, self.config.SAMPLES - start)
+
+    def project(self) -> BootstrapResult:
+        """Equity paths of ``HORIZON_DAYS`` resampled trading days."""
+        config = self.config
+        finals, drawdowns = [], []
+        for rows in self._chunks():
+            index = _resample_index(
+                self.rng,
+                len(self.daily_pnl),
+                rows,
+                config.HORIZON_DAYS,
+                config.BLOCK_DAYS,
+            )
+            final, drawdown = _drawdown(self.daily_pnl[index])
+            finals.append(final)
+            drawdowns.append(drawdown)
+
+        final_pnl, max_drawdown = np.concatenate(finals), np.concatenate(drawdowns)
+        summary = {
+            "days": len(self.daily_pnl),
+            "horizon_days": config.HORIZON_DAYS,
+            "final_pnl": self._percentiles(final_pnl),
+            "max_drawdown": self._percentiles(max_drawdown),
+            "losing_paths": float((final_pnl < 0).mean()),
+        }
+        logger.info(f"Bootstrap projection: {summary}")
+        return BootstrapResult(final_pnl, max_drawdown, summary)
+
+    def intraday(self) -> BootstrapResult:
+        """
+        Single trading days rebuilt from resampled fills.
+
+        The number of fills of each simulated day is drawn from the history;
+        ``max_drawdown`` here is the lowest realized PnL reached during the
+        day, which is what the Guardian's daily drawdown limit is checked on.
+        """
+        config = self.config
+        width = int(self.fills_per_day.max())
+        finals, lows = [], []
+        for rows in self._chunks():
+            counts = self.fills_per_day[
+                self.rng.integers(0, len(self.fills_per_day), size=rows)
+            ]
+            index = _resample_index(
+                self.rng, len(self.fill_pnl), rows, width, config.BLOCK_FILLS
+            )
+            pnl = np.where(
+                np.arange(width) < counts[:, None], self.fill_pnl[index], 0.0
+            )
+            equity = np.cumsum(pnl, axis=1)
+            finals.append(equity[:, -1])
+            lows.append(np.minimum(equity.min(axis=1), 0))
+
+        final_pnl, low = np.concatenate(finals), np.concatenate(lows)
+        summary = {
+            "fills": len(self.fill_pnl),
+            "daily_pnl": self._percentiles(final_pnl),
+            "intraday_low": self._percentiles(low),
+        }
+        logger.info(f"Bootstrap intraday: {summary}")
+        return BootstrapResult(final_pnl, -low, summary)
+
+    def suggest_max_daily_drawdown(self, percentile: float = 5) -> float:
+        """Daily loss limit only reached on ``percentile``% of resampled days."""
+        result = self.intraday()
+        return float(np.percentile(-result.max_drawdown, percentile))
+
+    def _percentiles(self, values: np.ndarray) -> dict:
+        levels = np.percentile(values, self.config.PERCENTILES)
+        return {
+            f"p{p}": round(float(v), 2) for p, v in zip(self.config.PERCENTILES, levels)
+        }
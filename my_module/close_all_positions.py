@@ -1,8 +1,4 @@
-import asyncio
-
-from ib_insync import MarketOrder
-
-from my_module.connect import disconnect_ib
+from my_module.liquidation import Liquidator
 from my_module.logger import Logger
 
 logger = Logger.get_logger()
@@ -10,25 +6,10 @@ logger = Logger.get_logger()
 
 async def close_all_positions(ib):
     """
-    Closes all active positions with MARKET order.
+    Closes all active positions with MARKET orders, all at once.
     """
     try:
         logger.info("Cancelling all outstanding orders...")
-        ib.reqGlobalCancel()
-        for pos in ib.positions():  # Exit all active trades
-            contract = pos.contract
-            contract.exchange = "SMART"
-            order = MarketOrder(
-                "SELL" if pos.position > 0 else "BUY", abs(pos.position)
-            )
-            trade = ib.placeOrder(contract, order)
-
-            while not trade.isDone():
-                await asyncio.sleep(1)
-            logger.info(
-                f"🚫 Position for {contract.localSymbol} with {abs(pos.position)} shares closed."
-            )
-
-        disconnect_ib(ib)
+        return await Liquidator(ib).close_all()
     except Exception as e:
-        logger.error(f"Error during position closure: {e}")
\ No newline at end of file
+        logger.error(f"Error during position closure: {e}")
@@ -1,24 +1,42 @@
+import os
 import random
 
 from ib_insync import IB, MarketOrder, util
 
+from my_module.gateway_client import GatewayClient
 from my_module.logger import Logger
 
 logger = Logger.get_logger()
 
 
-async def connect_ib(ib):
+def create_ib() -> IB | GatewayClient:
+    """
+    IB connection, or a client of the shared gateway when IB_GATEWAY is set.
+
+    Start the gateway first with ``python -m my_module.gateway``.
+    """
+    if os.getenv("IB_GATEWAY"):
+        return GatewayClient()
+    return IB()
+
+
+async def connect_ib(ib, client_id: int | None = None):
     """
     Connects to the IBKR TWS API.
 
     This function attempts to establish a connection with the Interactive
     Brokers Trader Workstation API, using a specified client ID and host.
+    The client ID is random unless ``client_id`` is given, e.g. to reconnect
+    as the same client.
 
     Returns:
         int: 1 if connection is successful, 0 if there is an error.
     """
-    random_number = random.randint(1, 10000)
+    random_number = client_id or random.randint(1, 10000)
     try:
+        if isinstance(ib, GatewayClient):
+            await ib.connectAsync()
+            return 1
         # 7497 IBKR TWS API / 4002 IB Gateway API
         await ib.connectAsync("127.0.0.1", 7497, clientId=random_number)
         logger.info(f"🟢 Connected to IBKR tws API")
@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import os
+from copy import copy
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from ib_insync import Contract, Stock, util
+
+from my_module.connect import create_ib, connect_ib, disconnect_ib
+from my_module.gateway_protocol import contract_key, decode, encode
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+CONTRACT_CACHE_PATH = "assets/db/contracts.json"
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+
+class ContractCache:
+    """
+    Qualified contracts by conId, persisted so TWS resolves each one once.
+
+    Lookups never wait on TWS for a contract seen before: ``qualify`` fills
+    contracts in place from the cache (like ``ib.qualifyContractsAsync``) and
+    only asks TWS about unknown ones. Entries are requalified by ``refresh``
+    once they are from a previous day, ideally at startup or pre-market.
+    """
+
+    _shared: "ContractCache | None" = None
+
+    def __init__(self, path: str = CONTRACT_CACHE_PATH):
+        self.path = path
+        self.contracts: dict[int, Contract] = {}
+        self.qualified: dict[int, date] = {}
+        # Unqualified contract keys, e.g. "AAPL|STK|SMART|USD", to conIds
+        self.keys: dict[str, int] = {}
+        # Dropped here, so merging on save must not bring them back
+        self.removed: set[int] = set()
+        self.load()
+
+    @classmethod
+    def shared(cls) -> "ContractCache":
+        """The cache of this process, read from disk on first use."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @staticmethod
+    def today() -> date:
+        return datetime.now(MARKET_TIMEZONE).date()
+
+    def _read(self) -> tuple[dict, dict, dict]:
+        """Contracts, qualified dates and keys as they are on disk."""
+        contracts, qualified, keys = {}, {}, {}
+        if not os.path.exists(self.path):
+            return contracts, qualified, keys
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Contract cache unreadable, starting empty: {e}")
+            return contracts, qualified, keys
+        for con_id, entry in data["contracts"].items():
+            contracts[int(con_id)] = decode(entry["contract"])
+            qualified[int(con_id)] = date.fromisoformat(entry["qualified"])
+        keys = {
+            key: con_id for key, con_id in data["keys"].items() if con_id in contracts
+        }
+        return contracts, qualified, keys
+
+    def load(self) -> None:
+        self.contracts, self.qualified, self.keys = self._read()
+
+    def save(self) -> None:
+        """Merge with what other processes saved meanwhile, then write."""
+        contracts, qualified, keys = self._read()
+        for con_id, day in qualified.items():
+            if con_id in self.removed:
+                continue
+            if con_id not in self.qualified or self.qualified[con_id] < day:
+                self.contracts[con_id] = contracts[con_id]
+                self.qualified[con_id] = day
+        for key, con_id in keys.items():
+            if con_id in self.contracts:
+                self.keys.setdefault(key, con_id)
+
+        data = {
+            "contracts": {
+                str(con_id): {
+                    "contract": encode(contract),
+                    "qualified": self.qualified[con_id].isoformat(),
+                }
+                for con_id, contract in self.contracts.items()
+            },
+            "keys": self.keys,
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, contract: Contract) -> Contract | None:
+        """The cached contract for a qualified or unqualified one, if any."""
+        con_id = contract.conId or self.keys.get(contract_key(contract))
+        return self.contracts.get(con_id)
+
+    def for_order(self, contract: Contract) -> Contract:
+        """
+        A SMART routed contract to trade, e.g. for a position's contract
+        (which has no exchange); the given contract is left untouched.
+        """
+        contract = copy(self.lookup(contract) or contract)
+        contract.exchange = "SMART"
+        return contract
+
+    def _store(self, requested: Contract, contract: Contract, day: date) -> None:
+        self.contracts[contract.conId] = copy(contract)
+        self.qualified[contract.conId] = day
+        self.removed.discard(contract.conId)
+        if not requested.conId:
+            self.keys[contract_key(requested)] = contract.conId
+
+    async def qualify(self, ib, *contracts: Contract) -> list[Contract]:
+        """Qualify contracts in place, returning the ones that are known."""
+        missing = [c for c in contracts if self.lookup(c) is None]
+        if missing:
+            keys = [copy(c) for c in missing]
+            await ib.qualifyContractsAsync(*missing)
+            day = ContractCache.today()
+            for requested, contract in zip(keys, missing):
+                if contract.conId:
+                    self._store(requested, contract, day)
+            self.save()
+
+        qualified = []
+        for contract in contracts:
+            cached = self.lookup(contract)
+            if cached is None:
+                continue
+            exchange = contract.exchange
+            util.dataclassUpdate(contract, cached)
+            # Keep the routing asked for, as ib_insync does for SMART
+            if exchange == "SMART":
+                contract.exchange = exchange
+            qualified.append(contract)
+        return qualified
+
+    async def stocks(self, ib, symbols) -> list[Contract]:
+        """Qualified US stocks for the symbols, skipping unknown ones."""
+        contracts = [Stock(symbol.upper(), "SMART", "USD") for symbol in symbols]
+        return await self.qualify(ib, *contracts)
+
+    async def stock(self, ib, symbol: str) -> Contract | None:
+        contracts = await self.stocks(ib, [symbol])
+        return contracts[0] if contracts else None
+
+    async def refresh(self, ib, force: bool = False) -> None:
+        """Requalify the entries from a previous day (all of them when forced)."""
+        day = ContractCache.today()
+        stale = [
+            con_id for con_id in self.contracts if force or self.qualified[con_id] < day
+        ]
+        if not stale:
+            return
+
+        unknown = set()
+
+        def on_error(req_id, error_code, error_string, contract):
+            # 200: no security definition has been found for the request
+            if error_code == 200 and contract is not None:
+                unknown.add(contract.conId)
+
+        contracts = [Contract(conId=con_id) for con_id in stale]
+        ib.errorEvent += on_error
+        try:
+            await ib.qualifyContractsAsync(*contracts)
+        finally:
+            ib.errorEvent -= on_error
+
+        for con_id, contract in zip(stale, contracts):
+            if con_id in unknown:
+                # No longer known to TWS, e.g. delisted
+                del self.contracts[con_id], self.qualified[con_id]
+                self.removed.add(con_id)
+                continue
+            if not contract.exchange:
+                # Timed out or failed otherwise, keep it and retry next time
+                logger.warning(f"Could not requalify {self.contracts[con_id].symbol}")
+                continue
+            # Qualifying by conId returns the primary exchange, keep the routing
+            contract.exchange = self.contracts[con_id].exchange
+            self.contracts[con_id] = contract
+            self.qualified[con_id] = day
+        self.keys = {k: v for k, v in self.keys.items() if v in self.contracts}
+        self.save()
+        logger.info(f"Contract cache refreshed: {len(self.contracts)} contracts")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Refresh the contract cache")
+    parser.add_argument("--symbols", nargs="*", default=[], help="Stocks to add")
+    parser.add_argument("--force", action="store_true", help="Requalify everything")
+    args = parser.parse_args()
+
+    ib = create_ib()
+    try:
+        await connect_ib(ib)
+        cache = ContractCache.shared()
+        await cache.refresh(ib, args.force)
+        await cache.stocks(ib, args.symbols)
+    finally:
+        disconnect_ib(ib)
+
+
+if __name__ == "__main__":
+    """Refresh pre-market, e.g. python -m my_module.contract_cache --symbols AAPL"""
+
+    asyncio.run(main())
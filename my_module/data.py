@@ -4,6 +4,7 @@ from zoneinfo import ZoneInfo
 import pandas as pd
 
 from my_module.logger import Logger
+from my_module.pnl_history import PnLHistory
 
 logger = Logger.get_logger()
 
@@ -42,6 +43,10 @@ class Data:
 
         return today_trades
 
+    def record_realized_pnl(self, history: PnLHistory | None = None) -> int:
+        """Persist realized PnL of the session fills for the bootstrap projections"""
+        return (history or PnLHistory()).record(self.ib.trades())
+
     def export_to_excel(self, data, file_name):
         if not data:
             logger.error("No data provided to export")
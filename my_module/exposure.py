@@ -0,0 +1,91 @@
+class ExposureIndex:
+    """
+    Notional exposure per symbol, per direction and for the whole account.
+
+    Share counts only come from position updates, which carry the absolute
+    position, so replayed or reordered events can never count a fill twice.
+    Fills only mark the symbol at their price. Each update only swaps that
+    symbol's old notional for its new one in the running totals, so every
+    query is constant time.
+    """
+
+    def __init__(self, account: str | None = None):
+        self.account = account
+        self.shares: dict[str, float] = {}
+        self.prices: dict[str, float] = {}
+        # Signed, short positions are negative
+        self.notional: dict[str, float] = {}
+        self.long = 0.0
+        self.short = 0.0
+        self.net_liquidation: float | None = None
+
+    @property
+    def gross(self) -> float:
+        return self.long + self.short
+
+    @property
+    def net(self) -> float:
+        return self.long - self.short
+
+    def exposure(self, symbol: str) -> float:
+        """Absolute notional of a symbol."""
+        return abs(self.notional.get(symbol, 0.0))
+
+    def pct(self, notional: float) -> float | None:
+        """Notional as a percentage of net liquidation, once that is known."""
+        if not self.net_liquidation or self.net_liquidation <= 0:
+            return None
+        return 100 * notional / self.net_liquidation
+
+    def _tracks(self, account: str) -> bool:
+        return self.account is None or account == self.account
+
+    def _set(self, symbol: str, shares: float, price: float) -> None:
+        old = self.notional.pop(symbol, 0.0)
+        if old > 0:
+            self.long -= old
+        else:
+            self.short += old
+
+        self.prices[symbol] = price
+        if not shares:
+            self.shares.pop(symbol, None)
+            if not self.notional:
+                # Flat, drop the rounding the running sums picked up
+                self.long = self.short = 0.0
+            return
+        self.shares[symbol] = shares
+        new = self.notional[symbol] = shares * price
+        if new > 0:
+            self.long += new
+        else:
+            self.short -= new
+
+    def load(self, positions) -> None:
+        """Start over from positions, marked at their average cost."""
+        self.shares, self.prices, self.notional = {}, {}, {}
+        self.long = self.short = 0.0
+        for position in positions:
+            if self._tracks(position.account) and position.position:
+                self._set(position.contract.symbol, position.position, position.avgCost)
+
+    def on_fill(self, trade, fill) -> None:
+        execution = fill.execution
+        if not self._tracks(execution.acctNumber):
+            return
+        symbol = trade.contract.symbol
+        self._set(symbol, self.shares.get(symbol, 0.0), execution.price)
+
+    def on_position(self, position) -> None:
+        if not self._tracks(position.account):
+            return
+        symbol = position.contract.symbol
+        price = self.prices.get(symbol) or position.avgCost
+        self._set(symbol, position.position, price)
+
+    def on_account_value(self, value) -> None:
+        if value.tag == "NetLiquidation" and self._tracks(value.account):
+            try:
+                self.net_liquidation = float(value.value)
+            except ValueError:
+                pass
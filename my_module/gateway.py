@@ -0,0 +1,389 @@
+import asyncio
+import hmac
+import inspect
+from collections import Counter
+
+from ib_insync import IB, Contract, ScannerSubscription
+
+from my_module.contract_cache import ContractCache
+from my_module.gateway_protocol import (
+    TICKER_FIELDS,
+    GatewayConfig,
+    contract_key,
+    decode,
+    dumps,
+    encode,
+    gateway_token,
+    loads,
+    subscription_key,
+)
+from my_module.history_scheduler import HistoricalDataScheduler
+from my_module.logger import Logger
+from my_module.supervisor import ConnectionSupervisor
+
+logger = Logger.get_logger()
+
+# IB events fanned out to every client
+BROADCAST_EVENTS = (
+    "newOrderEvent",
+    "orderStatusEvent",
+    "execDetailsEvent",
+    "commissionReportEvent",
+    "positionEvent",
+    "accountValueEvent",
+    "errorEvent",
+)
+# IB methods clients may call as they are
+FORWARDED_METHODS = (
+    "placeOrder",
+    "cancelOrder",
+    "reqGlobalCancel",
+    "reqAllOpenOrdersAsync",
+    "accountSummaryAsync",
+    "reqTickersAsync",
+    "reqScannerDataAsync",
+)
+
+
+class _Session:
+    """One connected client process."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.peer = writer.get_extra_info("peername")
+        self.authenticated = False
+
+    def __repr__(self) -> str:
+        return f"Session{self.peer}"
+
+
+class _Shared:
+    """One TWS subscription and how many times each session asked for it."""
+
+    def __init__(self, handle: asyncio.Future, cancel):
+        self.handle = handle
+        self.cancel = cancel
+        self.sessions: Counter[_Session] = Counter()
+
+
+class Gateway:
+    """
+    Owns the single TWS connection and serves it to local processes.
+
+    Clients (see ``GatewayClient``) talk newline-delimited JSON over a
+    loopback socket and must send the gateway's token (see ``gateway_token``)
+    with their first request, ``sync``. Order and position events are fanned
+    out to every authenticated client, and bars, tickers, scanner and PnL
+    subscriptions are shared: the first client asking for one opens it in
+    TWS, later ones reuse it, and it is cancelled once the last of them lets
+    go or disconnects.
+    """
+
+    def __init__(self, ib: IB, config: GatewayConfig = GatewayConfig()):
+        self.ib = ib
+        self.config = config
+        self.sessions: set[_Session] = set()
+        self.shared: dict[str, _Shared] = {}
+        self.token = gateway_token(config.TOKEN_PATH, create=True)
+        # Shared subscriptions survive TWS restarts, clients stay connected
+        self.supervisor = ConnectionSupervisor(ib)
+        self.methods = {
+            "sync": self._sync,
+            "reserveOrderIds": self._reserve_order_ids,
+            "qualifyContractsAsync": self._qualify_contracts,
+            "reqHistoricalDataAsync": self._historical_data,
+            "subscribeBars": self._subscribe_bars,
+            "subscribeTicker": self._subscribe_ticker,
+            "subscribeScanner": self._subscribe_scanner,
+            "subscribePnL": self._subscribe_pnl,
+            "subscribePnLSingle": self._subscribe_pnl_single,
+            "unsubscribe": self._unsubscribe,
+        }
+
+    def _send(self, session: _Session, data: bytes) -> None:
+        writer = session.writer
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.config.MAX_BACKLOG_BYTES:
+            logger.warning(f"{session} is not reading its events, dropping it")
+            writer.close()
+            return
+        writer.write(data)
+
+    def broadcast(self, event: str, *args) -> None:
+        data = dumps({"event": event, "args": encode(args)})
+        for session in list(self.sessions):
+            self._send(session, data)
+
+    def publish(self, key: str, event: str, *args) -> None:
+        """Send an update of a shared subscription to the sessions using it."""
+        shared = self.shared.get(key)
+        if shared is None:
+            return
+        data = dumps({"event": event, "key": key, "args": encode(args)})
+        for session in list(shared.sessions):
+            self._send(session, data)
+
+    async def _share(self, session: _Session, key: str, start, cancel):
+        shared = self.shared.get(key)
+        if shared is None:
+            shared = self.shared[key] = _Shared(asyncio.ensure_future(start()), cancel)
+            logger.info(f"📡 Gateway subscription opened: {key}")
+        shared.sessions[session] += 1
+        try:
+            return await asyncio.shield(shared.handle)
+        except Exception:
+            self._release(session, key)
+            raise
+
+    def _release(self, session: _Session, key: str, count: int = 1) -> None:
+        shared = self.shared.get(key)
+        if shared is None:
+            return
+        shared.sessions[session] -= count
+        if shared.sessions[session] <= 0:
+            del shared.sessions[session]
+        if shared.sessions:
+            return
+        del self.shared[key]
+        if shared.handle.done() and not shared.handle.exception():
+            shared.cancel(shared.handle.result())
+        else:
+            shared.handle.cancel()
+        logger.info(f"Gateway subscription closed: {key}")
+
+    async def _sync(self, session: _Session, token: str = "") -> dict:
+        if not hmac.compare_digest(token.encode(), self.token.encode()):
+            raise PermissionError("Invalid gateway token")
+        if not session.authenticated:
+            session.authenticated = True
+            self.sessions.add(session)
+            logger.info(f"🔑 Gateway client authenticated: {session}")
+        return {
+            "accounts": self.ib.managedAccounts(),
+            "accountValues": self.ib.accountValues(),
+            "positions": self.ib.positions(),
+            "trades": self.ib.trades(),
+        }
+
+    async def _reserve_order_ids(self, session: _Session, count: int) -> list[int]:
+        return [self.ib.client.getReqId() for _ in range(count)]
+
+    async def _qualify_contracts(self, session: _Session, *contracts: Contract):
+        # Aligned with the request, None where a contract is unknown
+        await ContractCache.shared().qualify(self.ib, *contracts)
+        return [contract if contract.conId else None for contract in contracts]
+
+    async def _historical_data(self, session: _Session, contract: Contract, **kwargs):
+        # Paced together with the gateway's own requests
+        return await HistoricalDataScheduler.of(self.ib).request(contract, **kwargs)
+
+    async def _subscribe_bars(
+        self,
+        session: _Session,
+        contract: Contract,
+        durationStr: str,
+        barSizeSetting: str,
+        whatToShow: str,
+        useRTH: bool,
+        formatDate: int = 1,
+    ) -> dict:
+        key = subscription_key(
+            "bars",
+            contract_key(contract),
+            durationStr,
+            barSizeSetting,
+            whatToShow,
+            useRTH,
+            formatDate,
+        )
+
+        async def start():
+            bars = await HistoricalDataScheduler.of(self.ib).request(
+                contract,
+                endDateTime="",
+                durationStr=durationStr,
+                barSizeSetting=barSizeSetting,
+                whatToShow=whatToShow,
+                useRTH=useRTH,
+                formatDate=formatDate,
+                keepUpToDate=True,
+            )
+            # The last two bars cover both a completed and a new bar
+            bars.updateEvent += lambda bars, has_new_bar: self.publish(
+                key, "barUpdate", len(bars), bars[-2:], has_new_bar
+            )
+            return bars
+
+        bars = await self._share(session, key, start, self.ib.cancelHistoricalData)
+        return {"key": key, "bars": list(bars)}
+
+    async def _subscribe_ticker(
+        self, session: _Session, contract: Contract, genericTickList: str = ""
+    ) -> dict:
+        key = subscription_key("ticker", contract_key(contract), genericTickList)
+
+        async def start():
+            ticker = self.ib.reqMktData(contract, genericTickList)
+            ticker.updateEvent += lambda ticker: self.publish(
+                key, "tickerUpdate", Gateway.ticker_fields(ticker)
+            )
+            return ticker
+
+        ticker = await self._share(
+            session, key, start, lambda ticker: self.ib.cancelMktData(ticker.contract)
+        )
+        return {"key": key, "fields": Gateway.ticker_fields(ticker)}
+
+    async def _subscribe_scanner(
+        self,
+        session: _Session,
+        subscription: ScannerSubscription,
+        scannerSubscriptionOptions: list = [],
+        scannerSubscriptionFilterOptions: list = [],
+    ) -> dict:
+        key = subscription_key(
+            "scanner",
+            subscription,
+            scannerSubscriptionOptions,
+            scannerSubscriptionFilterOptions,
+        )
+
+        async def start():
+            scan_data = self.ib.reqScannerSubscription(
+                subscription,
+                scannerSubscriptionOptions,
+                scannerSubscriptionFilterOptions,
+            )
+            scan_data.updateEvent += lambda scan_data: self.publish(
+                key, "scanData", list(scan_data)
+            )
+            return scan_data
+
+        scan_data = await self._share(
+            session, key, start, self.ib.cancelScannerSubscription
+        )
+        return {"key": key, "data": list(scan_data)}
+
+    async def _subscribe_pnl(
+        self, session: _Session, account: str, modelCode: str = ""
+    ) -> dict:
+        key = subscription_key("pnl", account, modelCode)
+
+        async def start():
+            # Updates arrive through ib.pnlEvent, see _on_pnl
+            return self.ib.reqPnL(account, modelCode)
+
+        pnl = await self._share(
+            session,
+            key,
+            start,
+            lambda pnl: self.ib.cancelPnL(pnl.account, pnl.modelCode),
+        )
+        return {"key": key, "pnl": pnl}
+
+    def _on_pnl(self, pnl) -> None:
+        key = subscription_key("pnl", pnl.account, pnl.modelCode)
+        self.publish(key, "pnlUpdate", pnl)
+
+    async def _subscribe_pnl_single(
+        self, session: _Session, account: str, modelCode: str, conId: int
+    ) -> dict:
+        key = subscription_key("pnlSingle", account, modelCode, conId)
+
+        async def start():
+            # Updates arrive through ib.pnlSingleEvent, see _on_pnl_single
+            return self.ib.reqPnLSingle(account, modelCode, conId)
+
+        pnl = await self._share(
+            session,
+            key,
+            start,
+            lambda pnl: self.ib.cancelPnLSingle(pnl.account, pnl.modelCode, pnl.conId),
+        )
+        return {"key": key, "pnl": pnl}
+
+    def _on_pnl_single(self, pnl) -> None:
+        key = subscription_key("pnlSingle", pnl.account, pnl.modelCode, pnl.conId)
+        self.publish(key, "pnlSingleUpdate", pnl)
+
+    async def _unsubscribe(self, session: _Session, key: str) -> None:
+        self._release(session, key)
+
+    @staticmethod
+    def ticker_fields(ticker) -> dict:
+        return {name: getattr(ticker, name) for name in TICKER_FIELDS}
+
+    async def _dispatch(self, session: _Session, message: dict) -> None:
+        method = message.get("method")
+        try:
+            args = decode(message.get("args", []))
+            kwargs = decode(message.get("kwargs", {}))
+            if not session.authenticated and method != "sync":
+                raise PermissionError("Not authenticated, send sync first")
+            if method in self.methods:
+                result = await self.methods[method](session, *args, **kwargs)
+            elif method in FORWARDED_METHODS:
+                result = getattr(self.ib, method)(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+            else:
+                raise ValueError(f"Unknown method {method}")
+            reply = {"id": message.get("id"), "result": encode(result)}
+        except Exception as e:
+            logger.warning(f"Gateway request {method} from {session} failed: {e}")
+            reply = {"id": message.get("id"), "error": f"{type(e).__name__}: {e}"}
+        self._send(session, dumps(reply))
+        if not session.authenticated:
+            session.writer.close()
+
+    async def _serve(self, reader, writer) -> None:
+        session = _Session(reader, writer)
+        logger.info(f"🔌 Gateway client connected: {session}")
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._dispatch(session, loads(line)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except Exception as e:
+            logger.warning(f"Gateway connection to {session} failed: {e}")
+        finally:
+            self.sessions.discard(session)
+            for task in tasks:
+                task.cancel()
+            for key, shared in list(self.shared.items()):
+                if session in shared.sessions:
+                    self._release(session, key, shared.sessions[session])
+            writer.close()
+            logger.info(f"Gateway client disconnected: {session}")
+
+    async def run(self) -> None:
+        if not await self.supervisor.start():
+            return
+        for name in BROADCAST_EVENTS:
+            getattr(self.ib, name).connect(
+                lambda *args, name=name: self.broadcast(name, *args)
+            )
+        self.ib.pnlEvent += self._on_pnl
+        self.ib.pnlSingleEvent += self._on_pnl_single
+
+        server = await asyncio.start_server(
+            self._serve,
+            self.config.HOST,
+            self.config.PORT,
+            limit=self.config.MAX_MESSAGE_BYTES,
+        )
+        logger.info(f"🛰️ Gateway listening on {self.config.HOST}:{self.config.PORT}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.supervisor.stop()
+
+
+if __name__ == "__main__":
+    """Share one TWS connection, e.g. python -m my_module.gateway"""
+
+    asyncio.run(Gateway(IB()).run())
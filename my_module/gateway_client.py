@@ -0,0 +1,557 @@
+import asyncio
+import itertools
+from collections import deque
+
+from ib_insync import (
+    AccountValue,
+    BarDataList,
+    BracketOrder,
+    Contract,
+    Event,
+    LimitOrder,
+    Order,
+    OrderStatus,
+    PnL,
+    PnLSingle,
+    Position,
+    ScanDataList,
+    ScannerSubscription,
+    StopOrder,
+    Ticker,
+    Trade,
+    util,
+)
+
+from my_module.gateway_protocol import (
+    GatewayConfig,
+    decode,
+    dumps,
+    encode,
+    gateway_token,
+    loads,
+)
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+class GatewayClient:
+    """
+    Stand-in for ``IB`` that goes through the gateway process.
+
+    Positions and trades are mirrored locally from the gateway's events, so
+    ``positions()``, ``trades()`` and ``placeOrder()`` stay synchronous like
+    on ``IB``. Order ids come from blocks reserved in advance, which lets
+    ``bracketOrder`` link children to their parent before anything is sent.
+    """
+
+    def __init__(self, config: GatewayConfig = GatewayConfig()):
+        self.config = config
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._read_task: asyncio.Task | None = None
+        self._refill_task: asyncio.Task | None = None
+        self._request_ids = itertools.count(1)
+        self._requests: dict[int, asyncio.Future] = {}
+        self._order_ids: deque[int] = deque()
+        self._accounts: list[str] = []
+        self._trades: dict[int, Trade] = {}
+        self._positions: dict[tuple, Position] = {}
+        self._account_values: dict[tuple, AccountValue] = {}
+        # Subscription key -> local bars, tickers and scan lists fed by it
+        self._subscribers: dict[str, list] = {}
+        self._keys: dict[int, str] = {}
+
+        self.connectedEvent = Event("connectedEvent")
+        self.disconnectedEvent = Event("disconnectedEvent")
+        self.newOrderEvent = Event("newOrderEvent")
+        self.orderStatusEvent = Event("orderStatusEvent")
+        self.execDetailsEvent = Event("execDetailsEvent")
+        self.commissionReportEvent = Event("commissionReportEvent")
+        self.positionEvent = Event("positionEvent")
+        self.accountValueEvent = Event("accountValueEvent")
+        self.errorEvent = Event("errorEvent")
+        self.pendingTickersEvent = Event("pendingTickersEvent")
+        self.pnlEvent = Event("pnlEvent")
+        self.pnlSingleEvent = Event("pnlSingleEvent")
+
+    async def connectAsync(self, timeout: float = 4) -> "GatewayClient":
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.config.HOST,
+                self.config.PORT,
+                limit=self.config.MAX_MESSAGE_BYTES,
+            ),
+            timeout,
+        )
+        self._read_task = asyncio.create_task(self._read())
+
+        token = gateway_token(self.config.TOKEN_PATH)
+        state = await self.request("sync", token=token)
+        self._accounts = state["accounts"]
+        for value in state["accountValues"]:
+            self._account_values[GatewayClient.account_value_key(value)] = value
+        for position in state["positions"]:
+            self._positions[(position.account, position.contract.conId)] = position
+        for trade in state["trades"]:
+            self._trades[trade.order.orderId] = trade
+        await self._reserve_order_ids()
+
+        logger.info(f"🟢 Connected to the gateway on {self.config.PORT}")
+        self.connectedEvent.emit()
+        return self
+
+    def isConnected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+    sleep = staticmethod(util.sleep)
+
+    async def _read(self) -> None:
+        try:
+            while line := await self._reader.readline():
+                message = loads(line)
+                if "id" in message:
+                    self._on_reply(message)
+                else:
+                    self._on_event(message)
+        except Exception as e:
+            logger.error(f"Gateway connection failed: {e}")
+        finally:
+            for future in self._requests.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Gateway disconnected"))
+            self._requests.clear()
+            self._writer.close()
+            logger.info("Disconnected from the gateway.")
+            self.disconnectedEvent.emit()
+
+    def _on_reply(self, message: dict) -> None:
+        future = self._requests.pop(message["id"], None)
+        if future is None or future.done():
+            return
+        if "error" in message:
+            future.set_exception(RuntimeError(message["error"]))
+        else:
+            future.set_result(decode(message["result"]))
+
+    def _on_event(self, message: dict) -> None:
+        handler = getattr(self, f"_on_{message['event']}", None)
+        if handler is None:
+            return
+        args = decode(message["args"])
+        try:
+            if "key" in message:
+                for subscriber in list(self._subscribers.get(message["key"], [])):
+                    handler(subscriber, *args)
+            else:
+                handler(*args)
+        except Exception as e:
+            logger.error(f"Error in handling gateway event {message['event']}: {e}")
+
+    def _send(self, method: str, *args, **kwargs) -> asyncio.Future:
+        if not self.isConnected():
+            raise ConnectionError("Not connected to the gateway")
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        self._writer.write(
+            dumps(
+                {
+                    "id": request_id,
+                    "method": method,
+                    "args": encode(args),
+                    "kwargs": encode(kwargs),
+                }
+            )
+        )
+        return future
+
+    async def request(self, method: str, *args, **kwargs):
+        """Call a gateway method and wait for its result."""
+        future = self._send(method, *args, **kwargs)
+        return await asyncio.wait_for(future, self.config.REQUEST_TIMEOUT_SECONDS)
+
+    def _fire(self, method: str, *args, on_result=None, **kwargs) -> None:
+        """Call a gateway method without waiting, for the synchronous IB API."""
+
+        def done(future: asyncio.Future):
+            if future.cancelled():
+                return
+            if future.exception():
+                logger.error(f"Gateway request {method} failed: {future.exception()}")
+            elif on_result is not None:
+                on_result(future.result())
+
+        self._send(method, *args, **kwargs).add_done_callback(done)
+
+    # Orders
+
+    async def _reserve_order_ids(self) -> None:
+        ids = await self.request("reserveOrderIds", self.config.ORDER_ID_BLOCK)
+        self._order_ids.extend(ids)
+
+    def getReqId(self) -> int:
+        if len(self._order_ids) < self.config.ORDER_ID_BLOCK // 2 and (
+            self._refill_task is None or self._refill_task.done()
+        ):
+            self._refill_task = asyncio.ensure_future(self._reserve_order_ids())
+        if not self._order_ids:
+            raise RuntimeError("No order ids reserved from the gateway")
+        return self._order_ids.popleft()
+
+    def managedAccounts(self) -> list[str]:
+        return list(self._accounts)
+
+    def accountValues(self, account: str = "") -> list[AccountValue]:
+        return [
+            value
+            for value in self._account_values.values()
+            if not account or value.account == account
+        ]
+
+    @staticmethod
+    def account_value_key(value: AccountValue) -> tuple:
+        return (value.account, value.tag, value.currency, value.modelCode)
+
+    def positions(self, account: str = "") -> list[Position]:
+        return [
+            position
+            for position in self._positions.values()
+            if not account or position.account == account
+        ]
+
+    def trades(self) -> list[Trade]:
+        return list(self._trades.values())
+
+    def openTrades(self) -> list[Trade]:
+        return [trade for trade in self._trades.values() if not trade.isDone()]
+
+    def openOrders(self) -> list[Order]:
+        return [trade.order for trade in self.openTrades()]
+
+    def fills(self) -> list:
+        return [fill for trade in self._trades.values() for fill in trade.fills]
+
+    def bracketOrder(
+        self,
+        action: str,
+        quantity: float,
+        limitPrice: float,
+        takeProfitPrice: float,
+        stopLossPrice: float,
+        **kwargs,
+    ) -> BracketOrder:
+        assert action in ("BUY", "SELL")
+        reverse_action = "BUY" if action == "SELL" else "SELL"
+        parent = LimitOrder(
+            action,
+            quantity,
+            limitPrice,
+            orderId=self.getReqId(),
+            transmit=False,
+            **kwargs,
+        )
+        take_profit = LimitOrder(
+            reverse_action,
+            quantity,
+            takeProfitPrice,
+            orderId=self.getReqId(),
+            transmit=False,
+            parentId=parent.orderId,
+            **kwargs,
+        )
+        stop_loss = StopOrder(
+            reverse_action,
+            quantity,
+            stopLossPrice,
+            orderId=self.getReqId(),
+            transmit=True,
+            parentId=parent.orderId,
+            **kwargs,
+        )
+        return BracketOrder(parent, take_profit, stop_loss)
+
+    def placeOrder(self, contract: Contract, order: Order) -> Trade:
+        if not order.orderId:
+            order.orderId = self.getReqId()
+        trade = self._trades.get(order.orderId)
+        if trade is None:
+            trade = Trade(
+                contract,
+                order,
+                OrderStatus(orderId=order.orderId, status=OrderStatus.PendingSubmit),
+            )
+            self._trades[order.orderId] = trade
+        self._fire("placeOrder", contract, order, on_result=self._merge_trade)
+        return trade
+
+    def cancelOrder(self, order: Order) -> Trade | None:
+        self._fire("cancelOrder", order)
+        trade = self._trades.get(order.orderId)
+        if trade is not None and not trade.isDone():
+            trade.orderStatus.status = OrderStatus.PendingCancel
+        return trade
+
+    def reqGlobalCancel(self) -> None:
+        self._fire("reqGlobalCancel")
+
+    async def reqAllOpenOrdersAsync(self) -> list[Trade]:
+        """Working orders of every client, as the gateway's connection sees them."""
+        return await self.request("reqAllOpenOrdersAsync")
+
+    def _merge_trade(self, trade: Trade) -> Trade:
+        """Update the local trade in place, so references held stay current."""
+        local = self._trades.get(trade.order.orderId)
+        if local is None:
+            self._trades[trade.order.orderId] = trade
+            return trade
+        util.dataclassUpdate(local.order, trade.order)
+        util.dataclassUpdate(local.contract, trade.contract)
+        local.orderStatus = trade.orderStatus
+        local.fills = trade.fills
+        local.log = trade.log
+        local.advancedError = trade.advancedError
+        return local
+
+    def _on_newOrderEvent(self, trade: Trade) -> None:
+        self.newOrderEvent.emit(self._merge_trade(trade))
+
+    def _on_orderStatusEvent(self, trade: Trade) -> None:
+        trade = self._merge_trade(trade)
+        self.orderStatusEvent.emit(trade)
+        trade.statusEvent.emit(trade)
+        if trade.orderStatus.status == OrderStatus.Filled:
+            trade.filledEvent.emit(trade)
+        elif trade.orderStatus.status in OrderStatus.DoneStates:
+            trade.cancelledEvent.emit(trade)
+
+    def _on_execDetailsEvent(self, trade: Trade, fill) -> None:
+        trade = self._merge_trade(trade)
+        self.execDetailsEvent.emit(trade, fill)
+        trade.fillEvent.emit(trade, fill)
+
+    def _on_commissionReportEvent(self, trade: Trade, fill, report) -> None:
+        trade = self._merge_trade(trade)
+        self.commissionReportEvent.emit(trade, fill, report)
+        trade.commissionReportEvent.emit(trade, fill, report)
+
+    def _on_positionEvent(self, position: Position) -> None:
+        key = (position.account, position.contract.conId)
+        if position.position:
+            self._positions[key] = position
+        else:
+            self._positions.pop(key, None)
+        self.positionEvent.emit(position)
+
+    def _on_accountValueEvent(self, value: AccountValue) -> None:
+        self._account_values[GatewayClient.account_value_key(value)] = value
+        self.accountValueEvent.emit(value)
+
+    def _on_errorEvent(self, *args) -> None:
+        self.errorEvent.emit(*args)
+
+    # Requests
+
+    async def accountSummaryAsync(self, account: str = "") -> list:
+        return await self.request("accountSummaryAsync", account)
+
+    async def qualifyContractsAsync(self, *contracts: Contract) -> list[Contract]:
+        qualified = await self.request("qualifyContractsAsync", *contracts)
+        for contract, result in zip(contracts, qualified):
+            if result is not None:
+                util.dataclassUpdate(contract, result)
+        return [c for c, result in zip(contracts, qualified) if result is not None]
+
+    def qualifyContracts(self, *contracts: Contract) -> list[Contract]:
+        return util.run(self.qualifyContractsAsync(*contracts))
+
+    async def reqTickersAsync(self, *contracts: Contract, **kwargs) -> list[Ticker]:
+        return await self.request("reqTickersAsync", *contracts, **kwargs)
+
+    async def reqScannerDataAsync(self, subscription: ScannerSubscription, *args):
+        return ScanDataList(
+            await self.request("reqScannerDataAsync", subscription, *args)
+        )
+
+    async def reqHistoricalDataAsync(
+        self,
+        contract: Contract,
+        endDateTime,
+        durationStr: str,
+        barSizeSetting: str,
+        whatToShow: str,
+        useRTH: bool,
+        formatDate: int = 1,
+        keepUpToDate: bool = False,
+        chartOptions: list = [],
+        timeout: float = 60,
+    ) -> BarDataList:
+        if keepUpToDate:
+            reply = await self.request(
+                "subscribeBars",
+                contract,
+                durationStr=durationStr,
+                barSizeSetting=barSizeSetting,
+                whatToShow=whatToShow,
+                useRTH=useRTH,
+                formatDate=formatDate,
+            )
+            bars = BarDataList(reply["bars"])
+            self._register(reply["key"], bars)
+        else:
+            bars = BarDataList(
+                await self.request(
+                    "reqHistoricalDataAsync",
+                    contract,
+                    endDateTime=endDateTime,
+                    durationStr=durationStr,
+                    barSizeSetting=barSizeSetting,
+                    whatToShow=whatToShow,
+                    useRTH=useRTH,
+                    formatDate=formatDate,
+                    timeout=timeout,
+                )
+            )
+        bars.reqId = 0
+        bars.contract = contract
+        bars.endDateTime = endDateTime
+        bars.durationStr = durationStr
+        bars.barSizeSetting = barSizeSetting
+        bars.whatToShow = whatToShow
+        bars.useRTH = useRTH
+        bars.formatDate = formatDate
+        bars.keepUpToDate = keepUpToDate
+        bars.chartOptions = chartOptions
+        return bars
+
+    def reqHistoricalData(self, *args, **kwargs) -> BarDataList:
+        return util.run(self.reqHistoricalDataAsync(*args, **kwargs))
+
+    def cancelHistoricalData(self, bars: BarDataList) -> None:
+        self._unregister(bars)
+
+    def reqMktData(
+        self, contract: Contract, genericTickList: str = "", *args, **kwargs
+    ) -> Ticker:
+        """Shared streaming ticker; snapshot flags are not supported."""
+        ticker = Ticker(contract=contract)
+
+        def subscribed(reply: dict):
+            self._register(reply["key"], ticker)
+            self._on_tickerUpdate(ticker, reply["fields"])
+
+        self._fire("subscribeTicker", contract, genericTickList, on_result=subscribed)
+        return ticker
+
+    def cancelMktData(self, contract: Contract) -> None:
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in subscribers:
+                if isinstance(subscriber, Ticker) and subscriber.contract is contract:
+                    self._unregister(subscriber)
+                    return
+
+    def reqScannerSubscription(
+        self, subscription: ScannerSubscription, *args
+    ) -> ScanDataList:
+        scan_data = ScanDataList()
+        scan_data.subscription = subscription
+
+        def subscribed(reply: dict):
+            self._register(reply["key"], scan_data)
+            self._on_scanData(scan_data, reply["data"])
+
+        self._fire("subscribeScanner", subscription, *args, on_result=subscribed)
+        return scan_data
+
+    def cancelScannerSubscription(self, scan_data: ScanDataList) -> None:
+        self._unregister(scan_data)
+
+    def reqPnL(self, account: str, modelCode: str = "") -> PnL:
+        """Shared PnL subscription, updated in place like on ``IB``."""
+        pnl = PnL(account, modelCode)
+
+        def subscribed(reply: dict):
+            self._register(reply["key"], pnl)
+            self._on_pnlUpdate(pnl, reply["pnl"])
+
+        self._fire("subscribePnL", account, modelCode, on_result=subscribed)
+        return pnl
+
+    def cancelPnL(self, account: str, modelCode: str = "") -> None:
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in subscribers:
+                if (
+                    isinstance(subscriber, PnL)
+                    and subscriber.account == account
+                    and subscriber.modelCode == modelCode
+                ):
+                    self._unregister(subscriber)
+                    return
+
+    def reqPnLSingle(self, account: str, modelCode: str, conId: int) -> PnLSingle:
+        """Shared PnL subscription of one position."""
+        pnl = PnLSingle(account, modelCode, conId)
+
+        def subscribed(reply: dict):
+            self._register(reply["key"], pnl)
+            self._on_pnlSingleUpdate(pnl, reply["pnl"])
+
+        self._fire(
+            "subscribePnLSingle", account, modelCode, conId, on_result=subscribed
+        )
+        return pnl
+
+    def cancelPnLSingle(self, account: str, modelCode: str, conId: int) -> None:
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in subscribers:
+                if isinstance(subscriber, PnLSingle) and (
+                    subscriber.account,
+                    subscriber.modelCode,
+                    subscriber.conId,
+                ) == (account, modelCode, conId):
+                    self._unregister(subscriber)
+                    return
+
+    def _register(self, key: str, subscriber) -> None:
+        self._subscribers.setdefault(key, []).append(subscriber)
+        self._keys[id(subscriber)] = key
+
+    def _unregister(self, subscriber) -> None:
+        key = self._keys.pop(id(subscriber), None)
+        if key is None:
+            return
+        subscribers = self._subscribers[key]
+        subscribers.remove(subscriber)
+        if not subscribers:
+            del self._subscribers[key]
+        if self.isConnected():
+            self._fire("unsubscribe", key)
+
+    def _on_barUpdate(
+        self, bars: BarDataList, size: int, tail: list, has_new_bar: bool
+    ) -> None:
+        del bars[max(size - len(tail), 0) :]
+        bars.extend(tail)
+        bars.updateEvent.emit(bars, has_new_bar)
+
+    def _on_tickerUpdate(self, ticker: Ticker, fields: dict) -> None:
+        for name, value in fields.items():
+            setattr(ticker, name, value)
+        ticker.updateEvent.emit(ticker)
+        self.pendingTickersEvent.emit({ticker})
+
+    def _on_pnlUpdate(self, pnl: PnL, update: PnL) -> None:
+        util.dataclassUpdate(pnl, update)
+        self.pnlEvent.emit(pnl)
+
+    def _on_pnlSingleUpdate(self, pnl: PnLSingle, update: PnLSingle) -> None:
+        util.dataclassUpdate(pnl, update)
+        self.pnlSingleEvent.emit(pnl)
+
+    def _on_scanData(self, scan_data: ScanDataList, data: list) -> None:
+        scan_data[:] = data
+        scan_data.updateEvent.emit(scan_data)
@@ -0,0 +1,139 @@
+import json
+import os
+import secrets
+from dataclasses import dataclass, is_dataclass
+from datetime import date, datetime
+
+import ib_insync
+from ib_insync import Contract, Order, util
+
+# ib_insync dataclasses and named tuples that may cross the gateway socket
+TYPES = {
+    name: obj
+    for name, obj in vars(ib_insync).items()
+    if isinstance(obj, type)
+    and (is_dataclass(obj) or (issubclass(obj, tuple) and hasattr(obj, "_fields")))
+}
+
+# Ticker fields streamed to subscribers on every update
+TICKER_FIELDS = (
+    "time",
+    "bid",
+    "bidSize",
+    "ask",
+    "askSize",
+    "last",
+    "lastSize",
+    "volume",
+    "open",
+    "high",
+    "low",
+    "close",
+    "vwap",
+    "markPrice",
+    "halted",
+)
+
+
+@dataclass
+class GatewayConfig:
+    # Loopback TCP works on Windows too, unlike Unix sockets under asyncio
+    HOST: str = "127.0.0.1"
+    PORT: int = 7600
+    # Longest message, e.g. the trades snapshot sent on connect
+    MAX_MESSAGE_BYTES: int = 16 * 1024 * 1024
+    # Clients not reading their events are dropped past this backlog
+    MAX_BACKLOG_BYTES: int = 8 * 1024 * 1024
+    # Order ids handed to a client at once, so placeOrder stays synchronous
+    ORDER_ID_BLOCK: int = 100
+    REQUEST_TIMEOUT_SECONDS: int = 60
+    # Shared secret clients send with sync, IB_GATEWAY_TOKEN overrides the file
+    TOKEN_PATH: str = "assets/db/gateway.token"
+
+
+def gateway_token(path: str, create: bool = False) -> str:
+    """The gateway's shared secret, generated into a private file if asked."""
+    token = os.getenv("IB_GATEWAY_TOKEN")
+    if token:
+        return token
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readable by this user only
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(path) as f:
+        return f.read().strip()
+
+
+def encode(obj):
+    """ib_insync objects to JSON values, tagged with their type."""
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    if isinstance(obj, datetime):
+        return {"$datetime": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"$date": obj.isoformat()}
+    if util.isnamedtupleinstance(obj):
+        return {
+            "$type": type(obj).__name__,
+            **{name: encode(getattr(obj, name)) for name in obj._fields},
+        }
+    if is_dataclass(obj):
+        # Subclasses like Stock or LimitOrder set fields in their own __init__
+        if isinstance(obj, Contract):
+            name = "Contract"
+        elif isinstance(obj, Order):
+            name = "Order"
+        else:
+            name = type(obj).__name__
+        return {
+            "$type": name,
+            **{k: encode(v) for k, v in util.dataclassNonDefaults(obj).items()},
+        }
+    if isinstance(obj, dict):
+        return {str(k): encode(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [encode(v) for v in obj]
+    return str(obj)
+
+
+def decode(obj):
+    """Inverse of ``encode``."""
+    if isinstance(obj, list):
+        return [decode(v) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    if "$date" in obj:
+        return date.fromisoformat(obj["$date"])
+    if "$type" in obj:
+        fields = {k: decode(v) for k, v in obj.items() if k != "$type"}
+        if obj["$type"] == "Contract":
+            return Contract.create(**fields)
+        return TYPES[obj["$type"]](**fields)
+    return {k: decode(v) for k, v in obj.items()}
+
+
+def dumps(message: dict) -> bytes:
+    """One newline terminated JSON message."""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def loads(line: bytes) -> dict:
+    return json.loads(line)
+
+
+def contract_key(contract) -> str:
+    """Identifies a contract across processes."""
+    if contract.conId:
+        return str(contract.conId)
+    return (
+        f"{contract.symbol}|{contract.secType}|{contract.exchange}|{contract.currency}"
+    )
+
+
+def subscription_key(kind: str, *parts) -> str:
+    """Clients asking for the same data get the same key, and share it."""
+    return json.dumps([kind, *encode(list(parts))], sort_keys=True)
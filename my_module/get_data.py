@@ -1,19 +1,16 @@
-from ib_insync import Contract
+from my_module.contract_cache import ContractCache
+from my_module.ticker_cache import TickerCache
 
 
 class GetData:
 
     @staticmethod
     async def get_live_data(ib, symbol):
-        contract = Contract(
-            symbol=symbol, secType="STK", exchange="SMART", currency="USD"
-        )
-        ib.qualifyContracts(contract)
+        contract = await ContractCache.shared().stock(ib, symbol)
+        if contract is None:
+            return symbol, None, None
 
-        ticker = ib.reqMktData(contract, "", False, False)
-        ib.sleep(2)
+        # Shared live ticker, resolved by its first price
+        ticker = await TickerCache.of(ib).get(contract)
 
-        price = ticker.last if ticker.last else ticker.close
-        volume = ticker.volume
-
-        return symbol, price, volume
+        return symbol, TickerCache.price(ticker), ticker.volume
@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from weakref import WeakKeyDictionary
+
+from ib_insync import BarDataList, Contract
+
+from my_module.gateway_protocol import contract_key
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+class Priority(IntEnum):
+    """Lower goes first."""
+
+    LIVE = 0  # signals of running algos
+    SCAN = 1  # scanner enrichment
+    BACKFILL = 2  # cache and index building
+
+
+@dataclass
+class HistorySchedulerConfig:
+    # IBKR allows 60 historical requests per 10 minutes...
+    MAX_REQUESTS: int = 60
+    WINDOW_SECONDS: float = 600
+    # ...and no identical request within 15 seconds
+    IDENTICAL_SECONDS: float = 15
+    MAX_IN_FLIGHT: int = 6
+    TIMEOUT_SECONDS: float = 60
+    # Pause after TWS reports a pacing violation anyway (e.g. other clients)
+    VIOLATION_PAUSE_SECONDS: float = 60
+    MAX_RETRIES: int = 2
+
+
+@dataclass
+class _Request:
+    params: dict
+    future: asyncio.Future
+    priority: Priority
+    # Seconds TWS gets to answer once sent, the config default when None
+    timeout: float | None = None
+    retries: int = 0
+    sent: bool = False
+
+
+class HistoricalDataScheduler:
+    """
+    Single queue for the historical data requests of one IB connection.
+
+    Requests wait in a priority queue and are only sent while the pacing
+    window has room. Identical requests share one call to TWS: those asked
+    for while one is queued or in flight wait for it, and those asked for
+    within ``IDENTICAL_SECONDS`` of its answer get the same bars back.
+    """
+
+    _schedulers: WeakKeyDictionary = WeakKeyDictionary()
+
+    def __init__(self, ib, config: HistorySchedulerConfig = HistorySchedulerConfig()):
+        self.ib = ib
+        self.config = config
+        self._queue: list[tuple] = []
+        self._sequence = itertools.count()
+        self._pending: dict[tuple, _Request] = {}
+        self._recent: dict[tuple, tuple[float, BarDataList]] = {}
+        self._sent: deque[float] = deque()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._violations: set[int] = set()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        ib.errorEvent += self._on_error
+
+    @classmethod
+    def of(cls, ib) -> "HistoricalDataScheduler":
+        """The scheduler of an IB connection, created on first use."""
+        if ib not in cls._schedulers:
+            cls._schedulers[ib] = cls(ib)
+        return cls._schedulers[ib]
+
+    async def request(
+        self,
+        contract: Contract,
+        endDateTime="",
+        durationStr: str = "1 D",
+        barSizeSetting: str = "1 min",
+        whatToShow: str = "TRADES",
+        useRTH: bool = True,
+        formatDate: int = 1,
+        keepUpToDate: bool = False,
+        priority: Priority = Priority.LIVE,
+        timeout: float | None = None,
+    ) -> BarDataList:
+        params = dict(
+            contract=contract,
+            endDateTime=endDateTime,
+            durationStr=durationStr,
+            barSizeSetting=barSizeSetting,
+            whatToShow=whatToShow,
+            useRTH=useRTH,
+            formatDate=formatDate,
+            keepUpToDate=keepUpToDate,
+        )
+        # Live subscriptions are handed out to one caller each
+        key = (
+            (id(params),)
+            if keepUpToDate
+            else (
+                contract_key(contract),
+                str(endDateTime),
+                durationStr,
+                barSizeSetting,
+                whatToShow,
+                useRTH,
+                formatDate,
+            )
+        )
+
+        recent = self._recent.get(key)
+        if recent and time.monotonic() - recent[0] < self.config.IDENTICAL_SECONDS:
+            return recent[1]
+
+        pending = self._pending.get(key)
+        if pending is None:
+            future = asyncio.get_running_loop().create_future()
+            pending = self._pending[key] = _Request(params, future, priority, timeout)
+            self._push(key, pending)
+        elif priority < pending.priority:
+            # Waited for by a more urgent caller now
+            pending.priority = priority
+            self._push(key, pending)
+        return await asyncio.shield(pending.future)
+
+    def _push(self, key: tuple, request: _Request) -> None:
+        heapq.heappush(self._queue, (request.priority, next(self._sequence), key))
+        self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._dispatch())
+
+    def _delay(self) -> float:
+        """Seconds until the pacing window lets another request through."""
+        now = time.monotonic()
+        while self._sent and now - self._sent[0] >= self.config.WINDOW_SECONDS:
+            self._sent.popleft()
+        delay = self._paused_until - now
+        if len(self._sent) >= self.config.MAX_REQUESTS:
+            delay = max(delay, self._sent[0] + self.config.WINDOW_SECONDS - now)
+        return delay
+
+    async def _dispatch(self) -> None:
+        while self._queue:
+            delay = self._delay()
+            if delay <= 0 and self._in_flight < self.config.MAX_IN_FLIGHT:
+                _, _, key = heapq.heappop(self._queue)
+                request = self._pending.get(key)
+                if request is None or request.sent:
+                    continue  # stale entry of a re-prioritized request
+                request.sent = True
+                self._sent.append(time.monotonic())
+                self._in_flight += 1
+                asyncio.ensure_future(self._run(key, request))
+                continue
+
+            if delay > 0:
+                logger.info(f"⏳ Historical data paced, next request in {delay:.0f}s")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(delay, 0) or None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, key: tuple, request: _Request) -> None:
+        timeout = request.timeout
+        if timeout is None:
+            timeout = self.config.TIMEOUT_SECONDS
+        try:
+            bars = await self.ib.reqHistoricalDataAsync(
+                **request.params, timeout=timeout
+            )
+        except Exception as e:
+            self._pending.pop(key, None)
+            request.future.set_exception(e)
+            return
+        finally:
+            self._in_flight -= 1
+            self._wake.set()
+
+        violated = getattr(bars, "reqId", None) in self._violations
+        self._violations.discard(getattr(bars, "reqId", None))
+        if violated and not bars and request.retries < self.config.MAX_RETRIES:
+            request.retries += 1
+            request.sent = False
+            self._push(key, request)
+            return
+
+        self._pending.pop(key, None)
+        if not request.params["keepUpToDate"]:
+            now = time.monotonic()
+            self._recent = {
+                k: v
+                for k, v in self._recent.items()
+                if now - v[0] < self.config.IDENTICAL_SECONDS
+            }
+            self._recent[key] = (now, bars)
+        request.future.set_result(bars)
+
+    def _on_error(self, reqId, errorCode, errorString, contract) -> None:
+        if errorCode == 162 and "pacing violation" in errorString.lower():
+            self._violations.add(reqId)
+            self._paused_until = time.monotonic() + self.config.VIOLATION_PAUSE_SECONDS
+            logger.warning(
+                f"Historical data pacing violation, pausing requests for "
+                f"{self.config.VIOLATION_PAUSE_SECONDS}s"
+            )
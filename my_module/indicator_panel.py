@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+class IndicatorPanel:
+    """
+    Batched ``Indicators`` for many symbols at once.
+
+    Bars are held in symbols x bars arrays, right-aligned so that the latest bar
+    of every symbol sits in the last column; shorter histories are padded with
+    NaN at the front. Every indicator is computed causally (column ``t`` only
+    sees bars up to ``t``), so the last column matches the per-symbol pandas
+    pass and any earlier column is what the live algo would have seen then.
+    """
+
+    def __init__(self, symbols, time, day, open, high, low, close, volume):
+        self.symbols = list(symbols)
+        self.time = time  # epoch seconds, 0 for padding
+        self.day = day  # trading day number, -1 for padding
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.valid = day >= 0
+        self.indicators: dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_bars(cls, bars_by_symbol: dict) -> "IndicatorPanel":
+        """Align ``BarData`` lists (one per symbol) into a right-aligned panel."""
+        symbols = [symbol for symbol, bars in bars_by_symbol.items() if bars]
+        shape = (
+            len(symbols),
+            max((len(bars_by_symbol[s]) for s in symbols), default=0),
+        )
+
+        time = np.zeros(shape, dtype=np.int64)
+        day = np.full(shape, -1, dtype=np.int64)
+        ohlcv = np.full((5,) + shape, np.nan)
+
+        for row, symbol in enumerate(symbols):
+            bars = bars_by_symbol[symbol]
+            cols = slice(shape[1] - len(bars), shape[1])
+            time[row, cols] = [int(bar.date.timestamp()) for bar in bars]
+            day[row, cols] = [bar.date.toordinal() for bar in bars]
+            ohlcv[:, row, cols] = np.array(
+                [[bar.open, bar.high, bar.low, bar.close, bar.volume] for bar in bars]
+            ).T
+
+        return cls(symbols, time, day, *ohlcv)
+
+    @classmethod
+    def from_buffers(cls, buffers: dict) -> "IndicatorPanel":
+        """
+        Build a panel over ``BarRingBuffer``s (one per symbol). A single buffer
+        is wrapped without copying; several are aligned into new arrays.
+        """
+        symbols = [symbol for symbol, buffer in buffers.items() if len(buffer)]
+        columns = ("open", "high", "low", "close", "volume")
+
+        if len(symbols) == 1:
+            buffer = buffers[symbols[0]]
+            time = buffer.time[None, :]
+            arrays = [buffer.view(name)[None, :] for name in columns]
+        else:
+            shape = (len(symbols), max((len(buffers[s]) for s in symbols), default=0))
+            time = np.zeros(shape, dtype=np.int64)
+            arrays = [np.full(shape, np.nan) for _ in columns]
+            for row, symbol in enumerate(symbols):
+                buffer = buffers[symbol]
+                cols = slice(shape[1] - len(buffer), shape[1])
+                time[row, cols] = buffer.time
+                for array, name in zip(arrays, columns):
+                    array[row, cols] = buffer.view(name)
+
+        local_time = pd.to_datetime(time.ravel(), unit="s", utc=True).tz_convert(
+            "America/New_York"
+        )
+        day = local_time.tz_localize(None).to_numpy().astype("datetime64[D]")
+        day = np.where(time.ravel() > 0, day.astype(np.int64), -1)
+
+        return cls(symbols, time, day.reshape(time.shape), *arrays)
+
+    def compute(self, rsi_periods=14, volume_periods=20) -> dict:
+        """Compute VWAP, VWAP bands, RSI, day range and breakout flags."""
+        valid, close = self.valid, self.close
+        n_rows, n_cols = close.shape
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volume = np.where(valid, self.volume, 0.0)
+            cum_vol = np.cumsum(volume, axis=1)
+            vwap = np.cumsum(volume * np.where(valid, close, 0.0), axis=1) / cum_vol
+            vwap[~valid] = np.nan
+
+            periods = np.cumsum(valid, axis=1)
+            squared_deviation = (close - vwap) ** 2
+            cum_sq_dev = np.cumsum(np.nan_to_num(squared_deviation), axis=1)
+            std_dev = np.sqrt(cum_sq_dev / periods)
+            std_dev[np.isnan(squared_deviation)] = np.nan
+
+            cum_volume = np.concatenate([np.zeros((n_rows, 1)), cum_vol], axis=1)
+            window_start = np.maximum(np.arange(n_cols) + 1 - volume_periods, 0)
+            volume_ma = (
+                cum_volume[:, 1:] - cum_volume[:, window_start]
+            ) / volume_periods
+            volume_ma[periods < volume_periods] = np.nan
+            volume_trend = self.volume / volume_ma
+
+        first_col = np.argmax(valid, axis=1)
+        open_price = self.open[np.arange(n_rows), first_col][:, None]
+        price_extension = (close - self.open) / open_price
+
+        # Sequential pass over bars, vectorized across symbols: RSI (RMA of gains
+        # and losses) and the high/low of day, which resets on each new session.
+        alpha = 1 / rsi_periods
+        old_wt = 1.0 * (1.0 - alpha)
+        avg_gain = np.full(n_rows, np.nan)
+        avg_loss = np.full(n_rows, np.nan)
+        rsi = np.full(close.shape, np.nan)
+        high_of_day = np.full(close.shape, np.nan)
+        low_of_day = np.full(close.shape, np.nan)
+        delta = np.diff(close, axis=1, prepend=np.nan)
+        gain = np.where(delta < 0, 0.0, delta)
+        loss = -np.where(delta > 0, 0.0, delta)
+        new_day = np.ones(close.shape, dtype=bool)
+        new_day[:, 1:] = self.day[:, 1:] != self.day[:, :-1]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for t in range(n_cols):
+                for avg, value in ((avg_gain, gain[:, t]), (avg_loss, loss[:, t])):
+                    smoothed = (old_wt * avg + alpha * value) / (old_wt + alpha)
+                    avg[:] = np.where(
+                        np.isnan(avg), value, np.where(avg != value, smoothed, avg)
+                    )
+                rsi[:, t] = 100 - (100 / (1 + avg_gain / avg_loss))
+
+                if t == 0:
+                    high_of_day[:, t], low_of_day[:, t] = (
+                        self.high[:, t],
+                        self.low[:, t],
+                    )
+                    continue
+                reset = new_day[:, t]
+                high_of_day[:, t] = np.where(
+                    reset,
+                    self.high[:, t],
+                    np.fmax(high_of_day[:, t - 1], self.high[:, t]),
+                )
+                low_of_day[:, t] = np.where(
+                    reset, self.low[:, t], np.fmin(low_of_day[:, t - 1], self.low[:, t])
+                )
+
+            move = high_of_day - open_price
+            retrace_percentage = np.where(
+                close > open_price,
+                (close - open_price) / move,
+                (high_of_day - close) / move,
+            )
+
+        vwap_upper = vwap + std_dev * 1
+        vwap_lower = vwap - std_dev * 1
+
+        self.indicators = {
+            "high_of_day": high_of_day,
+            "low_of_day": low_of_day,
+            "vwap": vwap,
+            "std_dev": std_dev,
+            "vwap_upper": vwap_upper,
+            "vwap_lower": vwap_lower,
+            "price_extension": price_extension,
+            "volume_ma": volume_ma,
+            "volume_trend": volume_trend,
+            "rsi": rsi,
+            "breakout_upper_vwap": close > vwap_upper,
+            "breakout_lower_vwap": close < vwap_lower,
+            "retrace_percentage": retrace_percentage,
+        }
+        return self.indicators
+
+    def reversal_masks(self, rsi_oversold=30, rsi_overbought=70, retrace_ratio=None):
+        """
+        Boolean symbols x bars masks of the ``ReversalAlgo.check_alerts`` rule:
+        RSI crossing back over a threshold while price is outside the VWAP band,
+        optionally only while the retrace is below ``retrace_ratio``.
+        """
+        if not self.indicators:
+            self.compute()
+
+        rsi = self.indicators["rsi"]
+        prev_rsi = np.full(rsi.shape, np.nan)
+        prev_rsi[:, 1:] = rsi[:, :-1]
+
+        reversal_up = (
+            (rsi > rsi_oversold)
+            & (prev_rsi < rsi_oversold)
+            & self.indicators["breakout_lower_vwap"]
+        )
+        reversal_down = (
+            (rsi < rsi_overbought)
+            & (prev_rsi > rsi_overbought)
+            & self.indicators["breakout_upper_vwap"]
+        )
+        if retrace_ratio is not None:
+            retraced = self.indicators["retrace_percentage"] < retrace_ratio
+            reversal_up &= retraced
+            reversal_down &= retraced
+        return reversal_up, reversal_down
+
+    def latest(self, symbol) -> dict:
+        """Latest bar and indicator values of one symbol, keyed like the DataFrame."""
+        row = self.symbols.index(symbol)
+        values = {
+            "open": self.open[row, -1],
+            "high": self.high[row, -1],
+            "low": self.low[row, -1],
+            "close": self.close[row, -1],
+            "volume": self.volume[row, -1],
+        }
+        values.update({name: arr[row, -1] for name, arr in self.indicators.items()})
+        return values
@@ -0,0 +1,397 @@
+import math
+from collections import deque
+
+from my_module.bar_buffer import INDICATOR_COLUMNS, BarRingBuffer
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+def _divide(a, b):
+    """Float division with pandas semantics (x/0 -> +-inf, 0/0 -> nan)."""
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _RollingMean:
+    """Sliding window mean that mirrors pandas' compensated ``roll_mean``."""
+
+    __slots__ = (
+        "periods",
+        "window",
+        "sum_x",
+        "compensation",
+        "nobs",
+        "neg_ct",
+        "same_value_count",
+        "prev_value",
+        "_undo",
+    )
+
+    def __init__(self, periods):
+        self.periods = periods
+        self.window = deque()
+        self.sum_x = 0.0
+        self.compensation = 0.0
+        self.nobs = 0
+        self.neg_ct = 0
+        self.same_value_count = 0
+        self.prev_value = math.nan
+        self._undo = None
+
+    def mark(self):
+        """Remember the state before the next ``push``, see ``undo``."""
+        evicted = self.window[0] if len(self.window) == self.periods else None
+        self._undo = (
+            self.sum_x,
+            self.compensation,
+            self.nobs,
+            self.neg_ct,
+            self.same_value_count,
+            self.prev_value,
+            evicted,
+        )
+
+    def undo(self):
+        """Take back the ``push`` since the last ``mark``."""
+        (
+            self.sum_x,
+            self.compensation,
+            self.nobs,
+            self.neg_ct,
+            self.same_value_count,
+            self.prev_value,
+            evicted,
+        ) = self._undo
+        self.window.pop()
+        if evicted is not None:
+            self.window.appendleft(evicted)
+
+    def _add(self, value):
+        self.nobs += 1
+        y = value - self.compensation
+        t = self.sum_x + y
+        self.compensation = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        if value == self.prev_value:
+            self.same_value_count += 1
+        else:
+            self.same_value_count = 1
+        self.prev_value = value
+
+    def _remove(self, value):
+        self.nobs -= 1
+        y = -value - self.compensation
+        t = self.sum_x + y
+        self.compensation = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+    def push(self, value):
+        if len(self.window) == self.periods:
+            self._remove(self.window.popleft())
+        self.window.append(value)
+        self._add(value)
+
+        if self.nobs < self.periods:
+            return math.nan
+        if self.same_value_count >= self.nobs:
+            return self.prev_value
+        result = self.sum_x / self.nobs
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+
+class _Accumulators:
+    """Running sums behind the indicators of a single frame."""
+
+    __slots__ = (
+        "open_price",
+        "prev_close",
+        "avg_gain",
+        "avg_loss",
+        "cum_vol",
+        "cum_vol_price",
+        "cum_sq_dev",
+        "periods",
+        "day",
+        "high_of_day",
+        "low_of_day",
+        "extended_up",
+        "extended_down",
+        "volume_mean",
+        "_undo",
+    )
+
+    def __init__(self, volume_periods):
+        self.open_price = None
+        self.prev_close = None
+        self.avg_gain = math.nan
+        self.avg_loss = math.nan
+        self.cum_vol = 0.0
+        self.cum_vol_price = 0.0
+        self.cum_sq_dev = 0.0
+        self.periods = 0
+        self.day = None
+        self.high_of_day = -math.inf
+        self.low_of_day = math.inf
+        self.extended_up = False
+        self.extended_down = False
+        self.volume_mean = _RollingMean(volume_periods)
+        self._undo = None
+
+    def mark(self):
+        """Remember the sums before the next bar, so a revision can undo it."""
+        self._undo = (
+            self.open_price,
+            self.prev_close,
+            self.avg_gain,
+            self.avg_loss,
+            self.cum_vol,
+            self.cum_vol_price,
+            self.cum_sq_dev,
+            self.periods,
+            self.day,
+            self.high_of_day,
+            self.low_of_day,
+            self.extended_up,
+            self.extended_down,
+        )
+        self.volume_mean.mark()
+
+    def undo(self):
+        """Restore the sums of the last ``mark``; the mark stays valid."""
+        (
+            self.open_price,
+            self.prev_close,
+            self.avg_gain,
+            self.avg_loss,
+            self.cum_vol,
+            self.cum_vol_price,
+            self.cum_sq_dev,
+            self.periods,
+            self.day,
+            self.high_of_day,
+            self.low_of_day,
+            self.extended_up,
+            self.extended_down,
+        ) = self._undo
+        self.volume_mean.undo()
+
+
+class IndicatorState:
+    """
+    Streaming counterpart of ``Indicators`` for a single symbol.
+
+    Each new bar updates RSI, VWAP, VWAP std-dev and the rolling volume mean in
+    constant time. The snapshot returned for a bar matches the last row that
+    ``HistoricalDataFetcher._add_indicators`` produces for the same frame, i.e.
+    the last ``sessions`` trading days ending at that bar.
+
+    When a ``BarRingBuffer`` is given, every bar of the frame and the
+    indicator values seen at that bar are also written into it, so array
+    consumers can read them as NumPy views.
+
+    A revised latest bar is undone in place: the accumulators remember their
+    scalars before each bar, so no per-bar copies are made.
+    """
+
+    def __init__(
+        self,
+        sessions=2,
+        rsi_periods=14,
+        volume_periods=20,
+        buffer: BarRingBuffer | None = None,
+    ):
+        self.sessions = sessions
+        self.rsi_periods = rsi_periods
+        self.volume_periods = volume_periods
+        self._session_bars = deque()  # one list of bars per trading day
+        self._acc = _Accumulators(volume_periods)
+        self.latest = None
+        self.previous = None
+        self.buffer = buffer
+
+    @property
+    def last_time(self):
+        return self.latest["time"] if self.latest else None
+
+    def update(self, bar) -> dict:
+        """Apply one bar; a bar with the latest timestamp replaces the latest bar."""
+        last_time = self.last_time
+        if last_time is not None and bar.date < last_time:
+            return self.latest
+
+        if last_time is not None and bar.date == last_time:
+            # The in-progress bar has been revised: roll back and reapply it.
+            self._session_bars[-1][-1] = bar
+            self._acc.undo()
+            self.latest = self._apply(bar)
+            if self.buffer is not None:
+                self.buffer.replace_last(*self._bar_values(bar))
+                self._record(self.latest)
+            return self.latest
+
+        if self.buffer is not None:
+            self.buffer.append(*self._bar_values(bar))
+
+        day = bar.date.date()
+        if not self._session_bars or self._acc.day != day:
+            self._session_bars.append([])
+            if len(self._session_bars) > self.sessions:
+                self._session_bars.popleft()
+                self._session_bars[-1].append(bar)
+                self._replay()
+                self._record(self.latest)
+                self._trim()
+                return self.latest
+
+        self._session_bars[-1].append(bar)
+        self.previous = self.latest
+        self._acc.mark()
+        self.latest = self._apply(bar)
+        self._record(self.latest)
+        return self.latest
+
+    def update_many(self, bars) -> dict | None:
+        """Apply the bars that are not older than the latest processed bar."""
+        last_time = self.last_time
+        start = len(bars)
+        while start > 0 and (last_time is None or bars[start - 1].date >= last_time):
+            start -= 1
+
+        for bar in bars[start:]:
+            self.update(bar)
+        return self.latest
+
+    def _replay(self):
+        """Rebuild the accumulators after the oldest session left the frame."""
+        logger.debug(f"Rolling indicator frame over {len(self._session_bars)} sessions")
+        self._acc = _Accumulators(self.volume_periods)
+        self.latest = self.previous = None
+        for session in self._session_bars:
+            for bar in session:
+                self.previous = self.latest
+                self._acc.mark()
+                self.latest = self._apply(bar)
+
+    def _trim(self):
+        """Drop the buffer rows of the sessions that left the frame."""
+        if self.buffer is None:
+            return
+        excess = len(self.buffer) - sum(len(s) for s in self._session_bars)
+        if excess > 0:
+            self.buffer.drop_oldest(excess)
+
+    @staticmethod
+    def _bar_values(bar):
+        return (
+            int(bar.date.timestamp()),
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            bar.volume,
+        )
+
+    def _record(self, snapshot):
+        """Write the indicator values of a snapshot into the latest buffer row."""
+        if self.buffer is None:
+            return
+        for column in INDICATOR_COLUMNS:
+            self.buffer.set(column, snapshot[column])
+
+    def _rma(self, avg, value):
+        """One step of ``ewm(alpha=1/n, adjust=False).mean()``."""
+        if math.isnan(avg):
+            return value
+        alpha = 1 / self.rsi_periods
+        old_wt = 1.0 * (1.0 - alpha)
+        if avg != value:
+            avg = (old_wt * avg + alpha * value) / (old_wt + alpha)
+        return avg
+
+    def _apply(self, bar) -> dict:
+        acc = self._acc
+        close, volume = bar.close, bar.volume
+
+        if acc.open_price is None:
+            acc.open_price = bar.open
+
+        day = bar.date.date()
+        if acc.day != day:
+            acc.day = day
+            acc.high_of_day, acc.low_of_day = -math.inf, math.inf
+        acc.high_of_day = max(acc.high_of_day, bar.high)
+        acc.low_of_day = min(acc.low_of_day, bar.low)
+
+        # VWAP and its cumulative standard deviation
+        acc.cum_vol += volume
+        acc.cum_vol_price += volume * close
+        vwap = _divide(acc.cum_vol_price, acc.cum_vol)
+        acc.periods += 1
+        deviation = close - vwap
+        if math.isnan(deviation):
+            std_dev = math.nan
+        else:
+            acc.cum_sq_dev += deviation**2
+            std_dev = math.sqrt(acc.cum_sq_dev / acc.periods)
+        vwap_upper = vwap + std_dev * 1
+        vwap_lower = vwap - std_dev * 1
+
+        # RSI on RMA smoothed gains and losses
+        if acc.prev_close is not None:
+            delta = close - acc.prev_close
+            gain = 0.0 if delta < 0 else delta
+            loss = -(0.0 if delta > 0 else delta)
+            acc.avg_gain = self._rma(acc.avg_gain, gain)
+            acc.avg_loss = self._rma(acc.avg_loss, loss)
+        acc.prev_close = close
+        rs = _divide(acc.avg_gain, acc.avg_loss)
+        rsi = 100 - _divide(100, 1 + rs)
+
+        volume_ma = acc.volume_mean.push(volume)
+        volume_trend = _divide(volume, volume_ma)
+
+        price_extension = (close - bar.open) / acc.open_price
+        acc.extended_up = acc.extended_up or price_extension > 0.01
+        acc.extended_down = acc.extended_down or price_extension < -0.01
+
+        move = acc.high_of_day - acc.open_price
+        if close > acc.open_price:
+            retrace_percentage = _divide(close - acc.open_price, move)
+        else:
+            retrace_percentage = _divide(acc.high_of_day - close, move)
+
+        return {
+            "time": bar.date,
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": close,
+            "volume": volume,
+            "high_of_day": acc.high_of_day,
+            "low_of_day": acc.low_of_day,
+            "vwap": vwap,
+            "std_dev": std_dev,
+            "vwap_upper": vwap_upper,
+            "vwap_lower": vwap_lower,
+            "price_extension": price_extension,
+            "volume_ma": volume_ma,
+            "volume_trend": volume_trend,
+            "extended_up": acc.extended_up,
+            "extended_down": acc.extended_down,
+            "rsi": rsi,
+            "breakout_upper_vwap": close > vwap_upper,
+            "breakout_lower_vwap": close < vwap_lower,
+            "retrace_percentage": retrace_percentage,
+        }
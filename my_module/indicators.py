@@ -115,9 +115,27 @@ class Indicators:
         return retrace_percentage
 
     @staticmethod
-    def reversal_up(df):
-        return (df["retrace_percentage"] < 0.85) & df["trend_down"]
-
-    @staticmethod
-    def reversal_down(df):
-        return (df["retrace_percentage"] < 0.85) & df["trend_up"]
+    def reversal_up(df, retrace_ratio=0.85):
+        return (df["retrace_percentage"] < retrace_ratio) & df["trend_down"]
+
+    @staticmethod
+    def reversal_down(df, retrace_ratio=0.85):
+        return (df["retrace_percentage"] < retrace_ratio) & df["trend_up"]
+
+    # Price levels
+    @staticmethod
+    def price_levels(
+        high_of_day, low_of_day, close, reversal_up, entry_ratio=0.1, stop_ratio=0.25
+    ):
+        """Entry, profit target and stop for a reversal; scalars or arrays."""
+        day_range = high_of_day - low_of_day
+        entry = np.where(
+            reversal_up,
+            np.minimum(low_of_day + (day_range * entry_ratio), close),
+            np.maximum(high_of_day - (day_range * entry_ratio), close),
+        )
+        profit_target = (high_of_day + low_of_day) / 2
+        stop = np.where(
+            reversal_up, entry - day_range * stop_ratio, entry + day_range * stop_ratio
+        )
+        return entry, profit_target, stop
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from ib_insync import Contract, LimitOrder, MarketOrder, Trade
+
+from my_module.contract_cache import ContractCache
+from my_module.logger import Logger
+from my_module.ticker_cache import TickerCache
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class LiquidationConfig:
+    # Wait for working orders, those of other clients included, to be gone
+    # before the exits go out, so a bracket's stop cannot fill on top of its exit
+    CANCEL_TIMEOUT_SECONDS: float = 2
+    POLL_SECONDS: float = 0.25
+    FILL_TIMEOUT_SECONDS: float = 5
+    # Unfilled remainders are resent as limit orders this far through the last
+    # price, one step per escalation (market orders are rejected outside RTH)
+    ESCALATION_OFFSETS: tuple = (0.005, 0.01, 0.02)
+
+
+@dataclass
+class ExitResult:
+    symbol: str
+    quantity: float
+    filled: float = 0.0
+    avg_price: float = 0.0
+    seconds: float = 0.0
+    attempts: int = 0
+
+    @property
+    def done(self) -> bool:
+        return self.filled >= self.quantity
+
+
+class Liquidator:
+    """
+    Flattens positions with all exit orders in flight at once.
+
+    Every exit is awaited concurrently with its own timeout. An exit that
+    times out is cancelled and, once the cancel is confirmed, the rest of the
+    position is resent as an increasingly aggressive marketable limit order.
+    The connection is left open, other components keep using it.
+    """
+
+    def __init__(self, ib, config: LiquidationConfig = LiquidationConfig()):
+        self.ib = ib
+        self.config = config
+
+    @staticmethod
+    async def wait_done(trade: Trade, timeout: float) -> bool:
+        """Whether the trade is done (filled, cancelled or rejected) in time."""
+        if trade.isDone():
+            return True
+        done = asyncio.get_running_loop().create_future()
+
+        def on_status(trade: Trade):
+            if trade.isDone() and not done.done():
+                done.set_result(True)
+
+        trade.statusEvent += on_status
+        try:
+            await asyncio.wait_for(done, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            trade.statusEvent -= on_status
+        return trade.isDone()
+
+    async def cancel_orders(self, symbol: str | None = None) -> bool:
+        """Cancel working orders, waiting until no client has any left."""
+        if symbol is None:
+            # Also reaches orders placed by other clients or in TWS
+            self.ib.reqGlobalCancel()
+        else:
+            for trade in self.ib.openTrades():
+                if trade.contract.symbol == symbol:
+                    self.ib.cancelOrder(trade.order)
+
+        deadline = time.monotonic() + self.config.CANCEL_TIMEOUT_SECONDS
+        while True:
+            working = [
+                trade
+                for trade in await self.ib.reqAllOpenOrdersAsync()
+                if not trade.isDone()
+                and (symbol is None or trade.contract.symbol == symbol)
+            ]
+            if not working:
+                return True
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(self.config.POLL_SECONDS)
+
+        for trade in working:
+            logger.warning(
+                f"Order {trade.order.orderId} of client {trade.order.clientId} "
+                f"for {trade.contract.symbol} still working"
+            )
+        return False
+
+    def _remaining(self, position, result: ExitResult) -> float:
+        """Shares still to close, never more than the account currently holds."""
+        current = next(
+            (
+                pos.position
+                for pos in self.ib.positions(position.account)
+                if pos.contract.conId == position.contract.conId
+            ),
+            0.0,
+        )
+        if current * position.position <= 0:
+            # Flat, or flipped by a fill we did not place
+            return 0.0
+        return min(result.quantity - result.filled, abs(current))
+
+    async def _exit_order(
+        self, contract: Contract, action: str, quantity: float, step: int
+    ):
+        if step == 0:
+            return MarketOrder(action, quantity)
+        offset = self.config.ESCALATION_OFFSETS[step - 1]
+        ticker = await TickerCache.of(self.ib).get(contract)
+        price = TickerCache.price(ticker)
+        if price is None:
+            return MarketOrder(action, quantity)
+        limit = price * (1 + offset if action == "BUY" else 1 - offset)
+        return LimitOrder(action, quantity, round(limit, 2), outsideRth=True)
+
+    async def close(self, position) -> ExitResult:
+        """Flatten one position, escalating until filled or out of steps."""
+        contract = ContractCache.shared().for_order(position.contract)
+        action = "SELL" if position.position > 0 else "BUY"
+        result = ExitResult(contract.symbol, abs(position.position))
+        started = time.monotonic()
+        value = 0.0
+
+        for step in range(len(self.config.ESCALATION_OFFSETS) + 1):
+            remaining = self._remaining(position, result)
+            if remaining <= 0:
+                logger.warning(f"{contract.symbol} was closed by another order")
+                result.quantity = result.filled
+                break
+            order = await self._exit_order(contract, action, remaining, step)
+            trade = self.ib.placeOrder(contract, order)
+            result.attempts += 1
+            confirmed = await Liquidator.wait_done(
+                trade, self.config.FILL_TIMEOUT_SECONDS
+            )
+            if not confirmed:
+                self.ib.cancelOrder(order)
+                confirmed = await Liquidator.wait_done(
+                    trade, self.config.CANCEL_TIMEOUT_SECONDS
+                )
+
+            filled = trade.filled()
+            value += filled * (trade.orderStatus.avgFillPrice or 0.0)
+            result.filled += filled
+            if result.done:
+                break
+            if not confirmed:
+                # It may still fill, a new order on top could overshoot
+                logger.error(
+                    f"Exit of {contract.symbol} not confirmed cancelled, "
+                    f"not escalating"
+                )
+                break
+            logger.warning(
+                f"Exit of {contract.symbol} {trade.orderStatus.status}, "
+                f"{result.quantity - result.filled} left, escalating"
+            )
+
+        result.seconds = time.monotonic() - started
+        result.avg_price = value / result.filled if result.filled else 0.0
+        return result
+
+    async def close_all(self, symbol: str | None = None) -> list[ExitResult]:
+        """Flatten every position (or those of one symbol) concurrently."""
+        if not await self.cancel_orders(symbol):
+            logger.error("Working orders left, a stop may fill on top of an exit")
+        positions = [
+            pos
+            for pos in self.ib.positions()
+            if pos.position and (symbol is None or pos.contract.symbol == symbol)
+        ]
+        results = await asyncio.gather(
+            *(self.close(pos) for pos in positions), return_exceptions=True
+        )
+
+        for pos, result in zip(positions, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error closing {pos.contract.symbol}: {result}")
+            elif result.done:
+                logger.info(
+                    f"🚫 Position for {result.symbol} with {result.quantity} shares "
+                    f"closed @ {result.avg_price:.2f} in {result.seconds:.2f}s "
+                    f"({result.attempts} orders)"
+                )
+            else:
+                logger.error(
+                    f"Position for {result.symbol} not closed: {result.filled} of "
+                    f"{result.quantity} shares filled after {result.attempts} orders"
+                )
+        return [result for result in results if isinstance(result, ExitResult)]
@@ -0,0 +1,180 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class MonteCarloConfig:
+    """Trade model and size of the Monte Carlo simulation."""
+
+    PATHS: int = 100_000
+    TRADES: int = 1_000
+    WIN_RATE: float = 0.5
+    # R-multiples won and lost per trade, in units of the current risk
+    WIN_R: float = 3
+    LOSS_R: float = 3
+    INITIAL_RISK: float = 10
+    MIN_RISK: float = 5
+    MAX_RISK: float = 50
+    # Dynamic sizing: risk is raised by this after a win and lowered after a
+    # loss, within MIN_RISK and MAX_RISK. 0 keeps the risk fixed.
+    RISK_STEP: float = 0
+    INITIAL_EQUITY: float = 1_000
+    # A path is ruined and stops trading once equity falls to this level
+    RUIN_EQUITY: float = 0
+    # Trade numbers the percentile bands are sampled at
+    BAND_POINTS: int = 100
+    PERCENTILES: tuple = (5, 25, 50, 75, 95)
+    SEED: int | None = None
+    # Paths per shard, bounds memory per process
+    SHARD_PATHS: int = 50_000
+    WORKERS: int = os.cpu_count() or 1
+
+
+@dataclass
+class MonteCarloResult:
+    # Percentiles of equity (columns) after each sampled trade number (index)
+    bands: pd.DataFrame
+    final_equity: np.ndarray
+    max_drawdown: np.ndarray
+    ruined: np.ndarray
+    summary: dict
+
+
+class MonteCarlo:
+    """
+    Simulates equity paths of a fixed win rate / R-multiple trade model.
+
+    Paths are NumPy arrays stepped one trade at a time, so the path-dependent
+    sizing rules stay exact while every step is a vectorized operation over a
+    whole shard. Shards run in a process pool with independent streams
+    spawned from one ``SeedSequence``, so a seeded run is reproducible
+    regardless of the number of workers.
+    """
+
+    def __init__(self, config: MonteCarloConfig = MonteCarloConfig()):
+        self.config = config
+
+    def checkpoints(self) -> np.ndarray:
+        """Trade numbers (1-based) the equity bands are sampled at."""
+        points = min(self.config.BAND_POINTS, self.config.TRADES)
+        return np.unique(np.linspace(1, self.config.TRADES, points).astype(int))
+
+    def run(self) -> MonteCarloResult:
+        config = self.config
+        sizes = [config.SHARD_PATHS] * (config.PATHS // config.SHARD_PATHS)
+        if config.PATHS % config.SHARD_PATHS:
+            sizes.append(config.PATHS % config.SHARD_PATHS)
+        seeds = np.random.SeedSequence(config.SEED).spawn(len(sizes))
+        tasks = [(config, size, seed) for size, seed in zip(sizes, seeds)]
+
+        # Shards are copied into preallocated arrays as they arrive, so the
+        # merged equity is never held twice
+        at_checkpoints = np.empty((len(self.checkpoints()), config.PATHS), np.float32)
+        final_equity = np.empty(config.PATHS)
+        max_drawdown = np.empty(config.PATHS)
+        ruined = np.empty(config.PATHS, dtype=bool)
+
+        start = 0
+        for shard in MonteCarlo._shards(config, tasks):
+            end = start + len(shard[1])
+            at_checkpoints[:, start:end] = shard[0]
+            final_equity[start:end] = shard[1]
+            max_drawdown[start:end] = shard[2]
+            ruined[start:end] = shard[3]
+            start = end
+
+        bands = pd.DataFrame(
+            # Partitions the merged equity in place instead of copying it
+            np.percentile(
+                at_checkpoints, config.PERCENTILES, axis=1, overwrite_input=True
+            ).T,
+            index=pd.Index(self.checkpoints(), name="trade"),
+            columns=[f"p{p}" for p in config.PERCENTILES],
+        )
+        summary = MonteCarlo.summarize(config, final_equity, max_drawdown, ruined)
+        logger.info(f"Monte Carlo summary: {summary}")
+        return MonteCarloResult(bands, final_equity, max_drawdown, ruined, summary)
+
+    @staticmethod
+    def _shards(config, tasks):
+        """Yields simulated shards in task order."""
+        workers = min(config.WORKERS, len(tasks))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                yield from pool.map(_simulate_shard, tasks)
+        else:
+            for task in tasks:
+                yield _simulate_shard(task)
+
+    @staticmethod
+    def summarize(config, final_equity, max_drawdown, ruined) -> dict:
+        drawdown = np.percentile(max_drawdown, (50, 95, 99))
+        return {
+            "paths": len(final_equity),
+            "trades": config.TRADES,
+            "mean_final_equity": float(final_equity.mean()),
+            "median_final_equity": float(np.median(final_equity)),
+            "median_max_drawdown": float(drawdown[0]),
+            "p95_max_drawdown": float(drawdown[1]),
+            "p99_max_drawdown": float(drawdown[2]),
+            "risk_of_ruin": float(ruined.mean()),
+        }
+
+
+def _simulate_shard(args):
+    """Process pool entry point: simulate one shard of paths."""
+    config, size, seed = args
+    rng = np.random.default_rng(seed)
+    checkpoints = MonteCarlo(config).checkpoints()
+
+    equity = np.full(size, config.INITIAL_EQUITY, dtype=np.float64)
+    peak = equity.copy()
+    max_drawdown = np.zeros(size)
+    risk = np.full(size, config.INITIAL_RISK, dtype=np.float64)
+    alive = np.ones(size, dtype=bool)
+    # Checkpoint-major so every write and the final percentiles are contiguous
+    at_checkpoints = np.empty((len(checkpoints), size), dtype=np.float32)
+    next_checkpoint = 0
+
+    # Scratch buffers reused every trade, the loop allocates nothing
+    draws = np.empty(size, dtype=np.float32)
+    wins = np.empty(size, dtype=bool)
+    factor = np.empty(size)
+    scratch = np.empty(size)
+
+    for trade in range(1, config.TRADES + 1):
+        rng.random(size, dtype=np.float32, out=draws)
+        np.less(draws, config.WIN_RATE, out=wins)
+
+        # +WIN_R on a win, -LOSS_R on a loss, 0 once ruined
+        np.multiply(wins, config.WIN_R + config.LOSS_R, out=factor)
+        factor -= config.LOSS_R
+        factor *= alive
+        np.multiply(risk, factor, out=scratch)
+        equity += scratch
+
+        if config.RISK_STEP:
+            np.multiply(wins, 2 * config.RISK_STEP, out=scratch)
+            scratch -= config.RISK_STEP
+            risk += scratch
+            np.clip(risk, config.MIN_RISK, config.MAX_RISK, out=risk)
+
+        np.maximum(peak, equity, out=peak)
+        np.subtract(peak, equity, out=scratch)
+        np.maximum(max_drawdown, scratch, out=max_drawdown)
+        np.greater(equity, config.RUIN_EQUITY, out=wins)
+        alive &= wins
+
+        if trade == checkpoints[next_checkpoint]:
+            at_checkpoints[next_checkpoint] = equity
+            next_checkpoint = min(next_checkpoint + 1, len(checkpoints) - 1)
+
+    return at_checkpoints, equity, max_drawdown, ~alive
@@ -3,7 +3,7 @@ from typing import Union
 
 from ib_insync import IB, LimitOrder, MarketOrder, Stock, StopOrder
 
-from my_module.connect import connect_ib, disconnect_ib
+from my_module.connect import connect_ib, create_ib, disconnect_ib
 from my_module.logger import Logger
 
 logger = Logger.get_logger()
@@ -60,7 +60,7 @@ def place_bracket_order(
 
 
 async def main():
-    ib = IB()
+    ib = create_ib()
     try:
         await connect_ib(ib)
         contract = Stock("AAPL", "SMART", "USD")
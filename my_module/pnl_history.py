@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+PNL_HISTORY_FILE = "assets/db/realized_pnl.csv"
+MARKET_TIMEZONE = "America/New_York"
+
+# IB reports this for fills that have no realized PnL yet
+_UNSET_DOUBLE = 1e300
+
+
+class PnLHistory:
+    """
+    Realized PnL of every fill, accumulated across sessions.
+
+    Rows are keyed by execution id, so recording the same trades twice (e.g.
+    generating the report more than once a day) does not double count.
+    """
+
+    COLUMNS = ["exec_id", "time", "symbol", "realized_pnl"]
+
+    def __init__(self, path: str = PNL_HISTORY_FILE):
+        self.path = path
+
+    def load(self) -> pd.DataFrame:
+        if os.path.exists(self.path):
+            df = pd.read_csv(self.path)
+        else:
+            df = pd.DataFrame(columns=PnLHistory.COLUMNS)
+        df["time"] = pd.to_datetime(df["time"], utc=True)
+        return df
+
+    @staticmethod
+    def from_trades(trades) -> pd.DataFrame:
+        """Closing fills of ``ib.trades()`` with their realized PnL."""
+        rows = []
+        for trade in trades:
+            for fill in trade.fills:
+                report = fill.commissionReport
+                realized_pnl = report.realizedPNL
+                # No report yet, or an opening fill; breakeven closes are kept
+                if not report.execId or abs(realized_pnl) >= _UNSET_DOUBLE:
+                    continue
+                rows.append(
+                    {
+                        "exec_id": fill.execution.execId,
+                        "time": fill.execution.time,
+                        "symbol": trade.contract.symbol,
+                        "realized_pnl": realized_pnl,
+                    }
+                )
+        df = pd.DataFrame(rows, columns=PnLHistory.COLUMNS)
+        df["time"] = pd.to_datetime(df["time"], utc=True)
+        return df
+
+    def record(self, trades) -> int:
+        """Append the new closing fills of ``trades``; returns how many were added."""
+        history = self.load()
+        fills = PnLHistory.from_trades(trades)
+        new = fills[~fills["exec_id"].isin(history["exec_id"])]
+        if new.empty:
+            return 0
+
+        history = pd.concat([history, new], ignore_index=True)
+        history = history.sort_values("time", ignore_index=True)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        history.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Recorded {len(new)} fills to {self.path}")
+        return len(new)
+
+    def daily(self) -> pd.Series:
+        """Realized PnL per trading day."""
+        history = self.load()
+        day = history["time"].dt.tz_convert(MARKET_TIMEZONE).dt.date
+        return history.groupby(day)["realized_pnl"].sum()
@@ -0,0 +1,97 @@
+from math import isnan
+
+from ib_insync import Event, PnL, PnLSingle
+
+
+def _valid(value: float) -> bool:
+    # TWS sends Double.MAX for values it has no data for yet
+    return not isnan(value) and abs(value) < 1e300
+
+
+class PnLTracker:
+    """
+    Intraday PnL of an account, open positions included, and its high.
+
+    The account's ``reqPnL`` stream sets the daily PnL (realized and
+    unrealized) whenever it ticks; in between, the ``reqPnLSingle`` stream of
+    each open position moves it by the change of that position's daily PnL.
+    Every tick is a constant time update, so ``total``, ``peak`` and
+    ``drawdown`` are current after each one. A closed position keeps its last
+    value in the total until the account stream books it as realized, so
+    taking profit never shows up as a drawdown.
+    """
+
+    def __init__(self, ib, account: str):
+        self.ib = ib
+        self.account = account
+        self.pnl: PnL | None = None
+        self.singles: dict[int, PnLSingle] = {}
+        # Last daily PnL seen per position, the base of its next change
+        self.daily: dict[int, float] = {}
+        self.total = 0.0
+        # The day starts flat, so the high is never below 0
+        self.peak = 0.0
+        self.updateEvent = Event("updateEvent")
+
+    @property
+    def drawdown(self) -> float:
+        """How far the total is below its high of the day."""
+        return self.peak - self.total
+
+    def start(self) -> None:
+        self.pnl = self.ib.reqPnL(self.account)
+        for position in self.ib.positions(self.account):
+            self._follow(position.contract.conId)
+        self.ib.positionEvent += self._on_position
+        self.ib.pnlEvent += self._on_pnl
+        self.ib.pnlSingleEvent += self._on_pnl_single
+
+    def stop(self) -> None:
+        self.ib.positionEvent -= self._on_position
+        self.ib.pnlEvent -= self._on_pnl
+        self.ib.pnlSingleEvent -= self._on_pnl_single
+        if not self.ib.isConnected():
+            return
+        if self.pnl is not None:
+            self.ib.cancelPnL(self.account)
+        for con_id in list(self.singles):
+            self._unfollow(con_id)
+
+    def _follow(self, con_id: int) -> None:
+        if con_id not in self.singles:
+            self.singles[con_id] = self.ib.reqPnLSingle(self.account, "", con_id)
+
+    def _unfollow(self, con_id: int) -> None:
+        # The total keeps the position's last value until the account stream
+        # moves it into realized PnL
+        if self.singles.pop(con_id, None) is not None:
+            self.ib.cancelPnLSingle(self.account, "", con_id)
+        self.daily.pop(con_id, None)
+
+    def _update(self) -> None:
+        if self.total > self.peak:
+            self.peak = self.total
+        self.updateEvent.emit(self)
+
+    def _on_position(self, position) -> None:
+        if position.account != self.account:
+            return
+        if position.position:
+            self._follow(position.contract.conId)
+        else:
+            self._unfollow(position.contract.conId)
+
+    def _on_pnl(self, pnl: PnL) -> None:
+        if pnl is self.pnl and _valid(pnl.dailyPnL):
+            self.total = pnl.dailyPnL
+            self._update()
+
+    def _on_pnl_single(self, pnl: PnLSingle) -> None:
+        if self.singles.get(pnl.conId) is not pnl or not _valid(pnl.dailyPnL):
+            return
+        previous = self.daily.get(pnl.conId)
+        self.daily[pnl.conId] = pnl.dailyPnL
+        if previous is not None:
+            # The first tick is already part of the account's daily PnL
+            self.total += pnl.dailyPnL - previous
+            self._update()
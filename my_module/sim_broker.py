@@ -0,0 +1,374 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from ib_insync import (
+    BarData,
+    BracketOrder,
+    CommissionReport,
+    Contract,
+    Event,
+    Execution,
+    Fill,
+    LimitOrder,
+    Order,
+    OrderStatus,
+    Position,
+    StopOrder,
+    Trade,
+    TradeLogEntry,
+)
+
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class SimBrokerConfig:
+    """Execution model of the simulated broker."""
+
+    ACCOUNT: str = "SIM"
+    # Delay before a placed or cancelled order takes effect
+    LATENCY_SECONDS: float = 0.0
+    # Adverse price move per share on market and stop fills
+    SLIPPAGE: float = 0.01
+    COMMISSION_PER_SHARE: float = 0.0
+
+
+class SimBroker:
+    """
+    Local stand-in for the subset of ``ib_insync.IB`` used by the order code
+    (``place_bracket_order``, ``ScalingInAlgo``, ``close_all_positions``).
+
+    Orders are filled from market data pushed in with ``on_bar`` or
+    ``on_tick``: market orders at the next price, limit orders when the price
+    trades through the limit, stop and stop-limit orders once triggered.
+    Children of a bracket wait for their parent to fill and cancel each other
+    when one of them fills. Trades, fills and positions are the regular
+    ``ib_insync`` objects, so existing code can inspect them unchanged.
+    """
+
+    def __init__(self, config: SimBrokerConfig = SimBrokerConfig()):
+        self.config = config
+        self.now: datetime | None = None
+        self._next_order_id = 1
+        self._next_exec_id = 1
+        self._trades: dict[int, Trade] = {}
+        self._working: dict[str, list[Trade]] = {}  # symbol -> live trades
+        self._active_at: dict[int, datetime] = {}
+        self._cancel_at: dict[int, datetime] = {}
+        self._triggered: set[int] = set()
+        self._positions: dict[str, Position] = {}
+
+        self.orderStatusEvent = Event("orderStatusEvent")
+        self.execDetailsEvent = Event("execDetailsEvent")
+        self.positionEvent = Event("positionEvent")
+        self.newOrderEvent = Event("newOrderEvent")
+
+    # IB surface
+
+    def isConnected(self) -> bool:
+        return True
+
+    def disconnect(self) -> None:
+        pass
+
+    def sleep(self, seconds: float = 0) -> bool:
+        return True
+
+    def positions(self, account: str = "") -> list[Position]:
+        return [pos for pos in self._positions.values() if pos.position]
+
+    def trades(self) -> list[Trade]:
+        return list(self._trades.values())
+
+    def openTrades(self) -> list[Trade]:
+        return [trade for trade in self._trades.values() if not trade.isDone()]
+
+    def openOrders(self) -> list[Order]:
+        return [trade.order for trade in self.openTrades()]
+
+    def bracketOrder(
+        self,
+        action: str,
+        quantity: float,
+        limitPrice: float,
+        takeProfitPrice: float,
+        stopLossPrice: float,
+        **kwargs,
+    ) -> BracketOrder:
+        assert action in ("BUY", "SELL")
+        reverse_action = "BUY" if action == "SELL" else "SELL"
+        parent = LimitOrder(
+            action,
+            quantity,
+            limitPrice,
+            orderId=self._new_order_id(),
+            transmit=False,
+            **kwargs,
+        )
+        take_profit = LimitOrder(
+            reverse_action,
+            quantity,
+            takeProfitPrice,
+            orderId=self._new_order_id(),
+            transmit=False,
+            parentId=parent.orderId,
+            **kwargs,
+        )
+        stop_loss = StopOrder(
+            reverse_action,
+            quantity,
+            stopLossPrice,
+            orderId=self._new_order_id(),
+            transmit=True,
+            parentId=parent.orderId,
+            **kwargs,
+        )
+        return BracketOrder(parent, take_profit, stop_loss)
+
+    def placeOrder(self, contract: Contract, order: Order) -> Trade:
+        if not order.orderId:
+            order.orderId = self._new_order_id()
+
+        trade = self._trades.get(order.orderId)
+        if trade is not None:
+            # Modification of a working order
+            trade.order = order
+            trade.modifyEvent.emit(trade)
+            return trade
+
+        status = "PreSubmitted" if order.parentId else "PendingSubmit"
+        trade = Trade(
+            contract=contract,
+            order=order,
+            orderStatus=OrderStatus(
+                orderId=order.orderId,
+                status=status,
+                remaining=order.totalQuantity,
+                parentId=order.parentId,
+            ),
+        )
+        self._log(trade, status)
+        self._trades[order.orderId] = trade
+        self._working.setdefault(contract.symbol, []).append(trade)
+        self._active_at[order.orderId] = self._after_latency()
+        self.newOrderEvent.emit(trade)
+        return trade
+
+    def cancelOrder(self, order: Order) -> Trade | None:
+        trade = self._trades.get(order.orderId)
+        if trade is None or trade.isDone():
+            return trade
+
+        self._cancel_at[order.orderId] = self._after_latency()
+        self._set_status(trade, "PendingCancel")
+        trade.cancelEvent.emit(trade)
+        if not self.config.LATENCY_SECONDS:
+            self._cancel(trade)
+        return trade
+
+    def reqGlobalCancel(self) -> None:
+        for trade in self.openTrades():
+            self.cancelOrder(trade.order)
+
+    async def reqAllOpenOrdersAsync(self) -> list[Trade]:
+        return self.openTrades()
+
+    # Market data
+
+    def on_tick(self, symbol: str, price: float, time: datetime | None = None):
+        """Fill against a single trade print."""
+        self.on_bar(
+            symbol,
+            BarData(
+                date=time or self.now or datetime.now(timezone.utc),
+                open=price,
+                high=price,
+                low=price,
+                close=price,
+            ),
+        )
+
+    def on_bar(self, symbol: str, bar) -> None:
+        """Fill working orders of ``symbol`` against one OHLC bar."""
+        self.now = bar.date
+        for trade in list(self._working.get(symbol, [])):
+            if trade.isDone():
+                continue  # cancelled as the sibling of an earlier fill
+            order_id = trade.order.orderId
+            if order_id in self._cancel_at and self._cancel_at[order_id] <= bar.date:
+                self._cancel(trade)
+                continue
+            if trade.orderStatus.status == "PreSubmitted" and trade.order.parentId:
+                continue  # child waiting for its parent
+            if self._active_at[order_id] > bar.date:
+                continue
+            if trade.orderStatus.status == "PendingSubmit":
+                self._set_status(trade, "Submitted")
+
+            price = self._fill_price(trade, bar)
+            if price is not None:
+                self._fill(trade, price, bar.date)
+
+    async def replay(self, bars_by_symbol: dict) -> None:
+        """Push bars of several symbols in time order, yielding to other tasks."""
+        events = sorted(
+            (
+                (bar.date, symbol, bar)
+                for symbol, bars in bars_by_symbol.items()
+                for bar in bars
+            ),
+            key=lambda event: event[0],
+        )
+        for _, symbol, bar in events:
+            self.on_bar(symbol, bar)
+            await asyncio.sleep(0)
+
+    # Internals
+
+    def _new_order_id(self) -> int:
+        order_id = self._next_order_id
+        self._next_order_id += 1
+        return order_id
+
+    def _after_latency(self) -> datetime:
+        now = self.now or datetime.min.replace(tzinfo=timezone.utc)
+        return now + timedelta(seconds=self.config.LATENCY_SECONDS)
+
+    def _fill_price(self, trade: Trade, bar) -> float | None:
+        order = trade.order
+        buy = order.action == "BUY"
+        slippage = self.config.SLIPPAGE if buy else -self.config.SLIPPAGE
+        order_type = order.orderType
+
+        if order_type == "MKT":
+            return bar.open + slippage
+
+        if order_type in ("STP", "STP LMT") and order.orderId not in self._triggered:
+            stop = float(order.auxPrice)
+            if buy and bar.high >= stop:
+                trigger = max(bar.open, stop)
+            elif not buy and bar.low <= stop:
+                trigger = min(bar.open, stop)
+            else:
+                return None
+            self._triggered.add(order.orderId)
+            if order_type == "STP":
+                return trigger + slippage
+
+            # Stop-limit: marketable at the trigger or left working as a limit
+            limit = float(order.lmtPrice)
+            if (buy and trigger <= limit) or (not buy and trigger >= limit):
+                return trigger
+            return None
+
+        if order_type == "STP":
+            return bar.open + slippage  # triggered earlier, now a market order
+
+        if order_type in ("LMT", "STP LMT"):
+            limit = float(order.lmtPrice)
+            if buy:
+                return min(bar.open, limit) if bar.low <= limit else None
+            return max(bar.open, limit) if bar.high >= limit else None
+
+        logger.warning(f"SimBroker: unsupported order type {order_type}")
+        return None
+
+    def _fill(self, trade: Trade, price: float, time: datetime) -> None:
+        order, contract = trade.order, trade.contract
+        shares = float(trade.remaining())
+        signed = shares if order.action == "BUY" else -shares
+        realized_pnl = self._update_position(contract, signed, price)
+
+        exec_id = f"SIM.{self._next_exec_id}"
+        self._next_exec_id += 1
+        execution = Execution(
+            execId=exec_id,
+            time=time,
+            acctNumber=self.config.ACCOUNT,
+            exchange=contract.exchange or "SMART",
+            side="BOT" if order.action == "BUY" else "SLD",
+            shares=shares,
+            price=price,
+            orderId=order.orderId,
+            cumQty=shares,
+            avgPrice=price,
+        )
+        commission = CommissionReport(
+            execId=exec_id,
+            commission=shares * self.config.COMMISSION_PER_SHARE,
+            currency=contract.currency or "USD",
+            realizedPNL=realized_pnl,
+        )
+        fill = Fill(contract, execution, commission, time)
+        trade.fills.append(fill)
+
+        status = trade.orderStatus
+        status.filled, status.remaining = float(order.totalQuantity), 0.0
+        status.avgFillPrice = status.lastFillPrice = price
+        self._finish(trade, "Filled")
+
+        trade.fillEvent.emit(trade, fill)
+        trade.commissionReportEvent.emit(trade, fill, commission)
+        self.execDetailsEvent.emit(trade, fill)
+        trade.filledEvent.emit(trade)
+
+        # Bracket handling: a filled parent releases its children, a filled
+        # child cancels its siblings.
+        for other in list(self._working.get(contract.symbol, [])):
+            if other.order.parentId and other.order.parentId == order.orderId:
+                self._active_at[other.order.orderId] = self._after_latency()
+                self._set_status(other, "Submitted")
+            elif order.parentId and other.order.parentId == order.parentId:
+                self._cancel(other)
+
+    def _update_position(self, contract: Contract, signed: float, price: float):
+        """Apply a fill to the position and return the realized PnL."""
+        key = contract.symbol
+        pos = self._positions.get(key)
+        quantity, avg_cost = (pos.position, pos.avgCost) if pos else (0.0, 0.0)
+
+        realized_pnl = 0.0
+        if quantity and (quantity > 0) != (signed > 0):
+            closed = min(abs(signed), abs(quantity))
+            direction = 1 if quantity > 0 else -1
+            realized_pnl = (price - avg_cost) * closed * direction
+            realized_pnl -= closed * self.config.COMMISSION_PER_SHARE
+
+        new_quantity = quantity + signed
+        if not new_quantity:
+            avg_cost = 0.0
+        elif not quantity or (quantity > 0) == (signed > 0):
+            avg_cost = (avg_cost * quantity + price * signed) / new_quantity
+        elif (new_quantity > 0) != (quantity > 0):
+            avg_cost = price  # flipped through zero
+
+        position = Position(self.config.ACCOUNT, contract, new_quantity, avg_cost)
+        self._positions[key] = position
+        self.positionEvent.emit(position)
+        return realized_pnl
+
+    def _cancel(self, trade: Trade) -> None:
+        if trade.isDone():
+            return
+        self._finish(trade, "Cancelled")
+        trade.cancelledEvent.emit(trade)
+
+    def _finish(self, trade: Trade, status: str) -> None:
+        order_id = trade.order.orderId
+        self._working[trade.contract.symbol].remove(trade)
+        self._active_at.pop(order_id, None)
+        self._cancel_at.pop(order_id, None)
+        self._triggered.discard(order_id)
+        self._set_status(trade, status)
+
+    def _set_status(self, trade: Trade, status: str) -> None:
+        trade.orderStatus.status = status
+        self._log(trade, status)
+        trade.statusEvent.emit(trade)
+        self.orderStatusEvent.emit(trade)
+
+    def _log(self, trade: Trade, status: str) -> None:
+        trade.log.append(TradeLogEntry(self.now or datetime.now(timezone.utc), status))
@@ -0,0 +1,337 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from ib_insync import (
+    IB,
+    BarDataList,
+    Event,
+    ExecutionFilter,
+    OrderStatus,
+    ScanDataList,
+    Ticker,
+)
+
+from my_module.connect import connect_ib, disconnect_ib
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class SupervisorConfig:
+    TIMEOUT_SECONDS: float = 10
+    INITIAL_BACKOFF_SECONDS: float = 1
+    # TWS restarts nightly and takes a few minutes to come back
+    MAX_BACKOFF_SECONDS: float = 60
+    # Random share added to every wait, so processes don't retry in lockstep
+    JITTER: float = 0.2
+    # Executions are refetched from this long before the last one seen
+    EXECUTION_OVERLAP_SECONDS: int = 60
+
+
+@dataclass
+class SequencePoint:
+    """What the caches held when the connection dropped."""
+
+    time: datetime
+    exec_ids: set[str]
+    last_fill_time: datetime | None
+    positions: dict[tuple, float]
+
+
+class ConnectionSupervisor:
+    """
+    Keeps an IB connection alive across drops and TWS restarts.
+
+    ib_insync wipes its caches when the socket drops. The supervisor holds on
+    to them, so trades, fills and positions (and the objects components keep
+    references to) survive the reconnect. After reconnecting with the same
+    clientId it only asks for executions since the last one seen, emits the
+    usual events for whatever changed while offline, and re-requests the bar,
+    ticker, scanner and PnL subscriptions into their existing objects.
+    """
+
+    # Wrapper state kept across a drop
+    CACHES = (
+        "trades",
+        "permId2Trade",
+        "fills",
+        "positions",
+        "portfolio",
+        "accountValues",
+        "tickers",
+    )
+    # Live subscriptions, re-requested after a drop
+    SUBSCRIPTIONS = ("reqId2Subscriber", "reqId2Ticker", "reqId2PnL", "reqId2PnlSingle")
+
+    def __init__(self, ib: IB, config: SupervisorConfig = SupervisorConfig()):
+        self.ib = ib
+        self.config = config
+        self.is_running = False
+        self.client_id: int | None = None
+        self.sequence: SequencePoint | None = None
+        self._address: tuple[str, int] | None = None
+        self._caches: dict = {}
+        self._subscriptions: dict = {}
+        # Generic ticks and options of each streaming ticker, replayed on resubscribe
+        self._ticker_requests: dict[Ticker, tuple[str, list]] = {}
+        if isinstance(ib, IB):
+            self._record_market_data()
+        self._reconnect_task: asyncio.Task | None = None
+        self.reconnectedEvent = Event("reconnectedEvent")
+
+    async def start(self) -> bool:
+        """Connect (retrying until it works) and watch the connection."""
+        self.is_running = True
+        await self._with_backoff(self._connect)
+        self.ib.disconnectedEvent += self._on_disconnected
+        return self.ib.isConnected()
+
+    def stop(self) -> None:
+        """Disconnect for good."""
+        self.is_running = False
+        self.ib.disconnectedEvent -= self._on_disconnected
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        disconnect_ib(self.ib)
+
+    async def wait_connected(self) -> None:
+        while not self.ib.isConnected():
+            await asyncio.sleep(1)
+
+    async def _with_backoff(self, connect) -> None:
+        delay = self.config.INITIAL_BACKOFF_SECONDS
+        while self.is_running:
+            try:
+                if await connect():
+                    return
+            except Exception as e:
+                logger.warning(f"Reconnect failed: {e}")
+            wait = delay * (1 + random.random() * self.config.JITTER)
+            logger.info(f"🔁 Retrying the connection in {wait:.1f}s")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, self.config.MAX_BACKOFF_SECONDS)
+
+    async def _connect(self) -> bool:
+        if not await connect_ib(self.ib, self.client_id):
+            return False
+        if isinstance(self.ib, IB):
+            self.client_id = self.ib.client.clientId
+            self._address = (self.ib.client.host, self.ib.client.port)
+            self._capture()
+        return True
+
+    def _record_market_data(self) -> None:
+        """Wrap ``ib.reqMktData`` to remember what each ticker streams."""
+        request = self.ib.reqMktData
+
+        def reqMktData(
+            contract,
+            genericTickList="",
+            snapshot=False,
+            regulatorySnapshot=False,
+            mktDataOptions=[],
+        ):
+            ticker = request(
+                contract, genericTickList, snapshot, regulatorySnapshot, mktDataOptions
+            )
+            if not snapshot and not regulatorySnapshot:
+                # The same Ticker streams every request on its contract
+                ticks, options = self._ticker_requests.get(ticker, ("", []))
+                merged = set(ticks.split(",")) | set(genericTickList.split(","))
+                self._ticker_requests[ticker] = (
+                    ",".join(sorted(filter(None, merged))),
+                    mktDataOptions or options,
+                )
+            return ticker
+
+        self.ib.reqMktData = reqMktData
+
+    def _capture(self) -> None:
+        """Keep references to the wrapper dicts, they outlive its reset."""
+        wrapper = self.ib.wrapper
+        self._caches = {name: getattr(wrapper, name) for name in self.CACHES}
+        self._subscriptions = {
+            name: getattr(wrapper, name) for name in self.SUBSCRIPTIONS
+        }
+
+    def _on_disconnected(self) -> None:
+        if not self.is_running or (
+            self._reconnect_task is not None and not self._reconnect_task.done()
+        ):
+            return
+        logger.warning("⛔ Connection lost, reconnecting...")
+        if isinstance(self.ib, IB) and self._caches:
+            self._restore()
+            wrapper = self.ib.wrapper
+            fills = list(wrapper.fills.values())
+            self.sequence = SequencePoint(
+                time=datetime.now(timezone.utc),
+                exec_ids=set(wrapper.fills),
+                last_fill_time=max((fill.time for fill in fills), default=None),
+                positions={
+                    (account, con_id): position.position
+                    for account, positions in wrapper.positions.items()
+                    for con_id, position in positions.items()
+                },
+            )
+            self._reconnect_task = asyncio.ensure_future(
+                self._with_backoff(self._resync)
+            )
+        else:
+            self._reconnect_task = asyncio.ensure_future(
+                self._with_backoff(self._connect)
+            )
+
+    def _restore(self) -> None:
+        """Put back the wrapper state that a reset on disconnect cleared."""
+        for name, cache in self._caches.items():
+            setattr(self.ib.wrapper, name, cache)
+
+    async def _resync(self) -> bool:
+        """Reconnect with the same clientId and catch up from the sequence point."""
+        # A failed earlier attempt reset the wrapper again
+        self._restore()
+        ib, wrapper, point = self.ib, self.ib.wrapper, self.sequence
+        timeout = self.config.TIMEOUT_SECONDS
+        wrapper.clientId = self.client_id
+        await ib.client.connectAsync(*self._address, self.client_id, timeout)
+        try:
+            await self._catch_up(point, timeout)
+        except BaseException:
+            ib.client.disconnect()
+            raise
+
+        ib.connectedEvent.emit()
+        self.reconnectedEvent.emit()
+        return True
+
+    async def _catch_up(self, point: SequencePoint, timeout: float) -> None:
+        ib = self.ib
+        accounts = ib.client.getAccounts()
+        requests = [
+            ib.reqPositionsAsync(),
+            ib.reqOpenOrdersAsync(),
+            ib.reqCompletedOrdersAsync(False),
+        ]
+        if len(accounts) == 1:
+            requests.append(ib.reqAccountUpdatesAsync(accounts[0]))
+        positions, _, completed, *_ = await asyncio.wait_for(
+            asyncio.gather(*requests), timeout
+        )
+
+        # Only executions after the sequence point, with some overlap
+        exec_filter = ExecutionFilter()
+        if point.last_fill_time is not None:
+            since = point.last_fill_time - timedelta(
+                seconds=self.config.EXECUTION_OVERLAP_SECONDS
+            )
+            exec_filter.time = f"{since.astimezone(timezone.utc):%Y%m%d-%H:%M:%S}"
+        fills = await asyncio.wait_for(ib.reqExecutionsAsync(exec_filter), timeout)
+
+        self._apply_completed(completed)
+        self._apply_positions(point, positions)
+        self._apply_fills(point, fills)
+        self._resubscribe()
+
+        logger.info(
+            f"🟢 Reconnected and resynced: {len(fills)} executions since "
+            f"{point.last_fill_time or 'the start of the day'}"
+        )
+
+    def _apply_completed(self, completed: list) -> None:
+        """Orders that finished while offline are not sent as order status."""
+        for done in completed:
+            trade = self.ib.wrapper.permId2Trade.get(done.order.permId)
+            if trade is None or trade is done or trade.isDone():
+                continue
+            status = done.orderStatus.status
+            trade.orderStatus.status = status
+            self.ib.orderStatusEvent.emit(trade)
+            trade.statusEvent.emit(trade)
+            if status == OrderStatus.Filled:
+                trade.filledEvent.emit(trade)
+            elif status == OrderStatus.Cancelled:
+                trade.cancelledEvent.emit(trade)
+
+    def _apply_positions(self, point: SequencePoint, positions: list) -> None:
+        """Drop positions closed while offline; open ones were just resent."""
+        reported = {(p.account, p.contract.conId) for p in positions}
+        for account, con_id in set(point.positions) - reported:
+            position = self.ib.wrapper.positions[account].pop(con_id, None)
+            if position is not None:
+                self.ib.positionEvent.emit(position._replace(position=0.0))
+
+    def _apply_fills(self, point: SequencePoint, fills: list) -> None:
+        """Fills fetched by request are not emitted by ib_insync, do it here."""
+        for fill in fills:
+            if fill.execution.execId in point.exec_ids:
+                continue
+            trade = self.ib.wrapper.permId2Trade.get(fill.execution.permId)
+            if trade is None:
+                continue
+            self.ib.execDetailsEvent.emit(trade, fill)
+            trade.fillEvent.emit(trade, fill)
+            if fill.commissionReport.execId:
+                self.ib.commissionReportEvent.emit(trade, fill, fill.commissionReport)
+                trade.commissionReportEvent.emit(trade, fill, fill.commissionReport)
+
+    def _resubscribe(self) -> None:
+        """Re-request the live subscriptions into the objects already handed out."""
+        ib, wrapper, client = self.ib, self.ib.wrapper, self.ib.client
+        old, self._subscriptions = self._subscriptions, {}
+
+        for subscriber in old["reqId2Subscriber"].values():
+            req_id = client.getReqId()
+            subscriber.reqId = req_id
+            if isinstance(subscriber, BarDataList):
+                # Refilled from scratch, then kept up to date again
+                subscriber.clear()
+                wrapper.startReq(req_id, subscriber.contract, container=subscriber)
+                wrapper.startSubscription(req_id, subscriber, subscriber.contract)
+                client.reqHistoricalData(
+                    req_id,
+                    subscriber.contract,
+                    "",
+                    subscriber.durationStr,
+                    subscriber.barSizeSetting,
+                    subscriber.whatToShow,
+                    subscriber.useRTH,
+                    subscriber.formatDate,
+                    True,
+                    subscriber.chartOptions,
+                )
+            elif isinstance(subscriber, ScanDataList):
+                wrapper.startSubscription(req_id, subscriber)
+                client.reqScannerSubscription(
+                    req_id,
+                    subscriber.subscription,
+                    subscriber.scannerSubscriptionOptions,
+                    subscriber.scannerSubscriptionFilterOptions,
+                )
+            else:
+                logger.warning(f"Not resubscribing {type(subscriber).__name__}")
+
+        tickers: set[Ticker] = set(old["reqId2Ticker"].values())
+        requests = self._ticker_requests
+        self._ticker_requests = {}
+        for ticker in tickers:
+            # The restored ticker cache hands the same Ticker back
+            ticks, options = requests.get(ticker, ("", []))
+            ib.reqMktData(ticker.contract, ticks, False, False, options)
+
+        for pnl in old["reqId2PnL"].values():
+            req_id = client.getReqId()
+            wrapper.pnlKey2ReqId[(pnl.account, pnl.modelCode)] = req_id
+            wrapper.reqId2PnL[req_id] = pnl
+            client.reqPnL(req_id, pnl.account, pnl.modelCode)
+        for pnl in old["reqId2PnlSingle"].values():
+            req_id = client.getReqId()
+            key = (pnl.account, pnl.modelCode, pnl.conId)
+            wrapper.pnlSingleKey2ReqId[key] = req_id
+            wrapper.reqId2PnlSingle[req_id] = pnl
+            client.reqPnLSingle(req_id, *key)
+
+        self._capture()
@@ -0,0 +1,232 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+
+import pandas as pd
+
+from my_module.backtest import BacktestConfig, Backtester
+from my_module.bar_cache import BarCache
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+SWEEP_CACHE_DIR = "assets/db/sweeps"
+
+# BacktestConfig fields that do not change the result
+_EXECUTION_FIELDS = ("CHUNK_ROWS", "WORKERS")
+
+
+def _default_grid() -> dict:
+    return {
+        "BAR_SIZE": ["3 mins"],
+        "RSI_OVERSOLD": [20, 25, 30, 35],
+        "RSI_OVERBOUGHT": [65, 70, 75, 80],
+        "RETRACE_RATIO": [None, 0.85],
+        "ENTRY_RANGE_RATIO": [0.1, 0.2],
+        "STOP_RANGE_RATIO": [0.25, 0.5],
+    }
+
+
+@dataclass
+class SweepConfig:
+    """Search space and evaluation settings of the parameter sweep."""
+
+    # BacktestConfig field -> candidate values
+    GRID: dict = field(default_factory=_default_grid)
+    # Random search: grid points sampled, 0 evaluates the whole grid
+    SAMPLES: int = 0
+    SEED: int = 0
+    # Walk-forward window lengths in trading days, 0 disables walk-forward
+    TRAIN_DAYS: int = 0
+    TEST_DAYS: int = 20
+    # Summary key the best parameters are picked by
+    METRIC: str = "avg_return"
+    # Parameters with fewer filled signals in a training window are skipped
+    MIN_FILLED: int = 20
+    WORKERS: int = os.cpu_count() or 1
+    CACHE_DIR: str = SWEEP_CACHE_DIR
+
+
+class ParameterSweep:
+    """
+    Grid or random search over the reversal parameters on cached bars.
+
+    Every parameter set is one ``Backtester`` run; runs are spread over a
+    process pool and their summaries are stored under ``CACHE_DIR`` keyed by
+    a hash of the parameters, symbols and date range, so a rerun only
+    evaluates what is new. With ``TRAIN_DAYS`` set, the days are split into
+    rolling train/test windows: the best parameters of each training window
+    are scored on the test window that follows it.
+    """
+
+    def __init__(
+        self,
+        config: SweepConfig = SweepConfig(),
+        base: BacktestConfig = BacktestConfig(),
+        cache=None,
+    ):
+        self.config = config
+        self.base = base
+        self.cache = cache or BarCache()
+
+    def candidates(self) -> list[dict]:
+        names = list(self.config.GRID)
+        grid = [
+            dict(zip(names, values))
+            for values in itertools.product(*self.config.GRID.values())
+        ]
+        if self.config.SAMPLES and self.config.SAMPLES < len(grid):
+            grid = random.Random(self.config.SEED).sample(grid, self.config.SAMPLES)
+        return grid
+
+    def trading_days(self, symbols, start=None, end=None) -> list[str]:
+        days = set()
+        for symbol in symbols:
+            days.update(self.cache.days(symbol, self.base.BAR_SIZE))
+        return sorted(
+            day
+            for day in days
+            if (not start or day >= start) and (not end or day <= end)
+        )
+
+    def _cached_days(self, symbols, bar_size, start, end) -> dict:
+        """Cached days in range per symbol, with their mtimes."""
+        cached = {}
+        for symbol in sorted(symbols):
+            cached[symbol] = [
+                (day, self.cache.modified(symbol, bar_size, day))
+                for day in self.cache.days(symbol, bar_size)
+                if (not start or day >= start) and (not end or day <= end)
+            ]
+        return cached
+
+    def _key(self, config: BacktestConfig, symbols, start, end, cached) -> str:
+        params = asdict(config)
+        for name in _EXECUTION_FIELDS:
+            params.pop(name)
+        payload = {
+            "params": params,
+            "symbols": sorted(symbols),
+            "start": start,
+            "end": end,
+            "cache": os.path.abspath(self.cache.root),
+            # A refreshed or backfilled day changes the key
+            "days": cached,
+        }
+        encoded = json.dumps(payload, sort_keys=True).encode()
+        return hashlib.sha1(encoded).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.config.CACHE_DIR, f"{key}.json")
+
+    def evaluate(self, candidates, symbols, start, end) -> pd.DataFrame:
+        """Backtest summary of every candidate between two days (YYYYMMDD)."""
+        configs = [replace(self.base, WORKERS=1, **params) for params in candidates]
+        cached = {
+            bar_size: self._cached_days(symbols, bar_size, start, end)
+            for bar_size in {config.BAR_SIZE for config in configs}
+        }
+        keys = [
+            self._key(config, symbols, start, end, cached[config.BAR_SIZE])
+            for config in configs
+        ]
+        summaries = {}
+        for key in keys:
+            if os.path.exists(self._cache_path(key)):
+                with open(self._cache_path(key)) as f:
+                    summaries[key] = json.load(f)["summary"]
+
+        missing = [
+            (key, config) for key, config in zip(keys, configs) if key not in summaries
+        ]
+        logger.info(
+            f"Sweep {start}-{end}: {len(candidates)} parameter sets, "
+            f"{len(candidates) - len(missing)} cached"
+        )
+
+        tasks = [
+            (config, self.cache.root, symbols, start, end) for _, config in missing
+        ]
+        workers = min(self.config.WORKERS, len(tasks))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_evaluate, tasks))
+        else:
+            results = [_evaluate(task) for task in tasks]
+
+        os.makedirs(self.config.CACHE_DIR, exist_ok=True)
+        for (key, config), summary in zip(missing, results):
+            summaries[key] = summary
+            tmp_path = self._cache_path(key) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"params": asdict(config), "summary": summary}, f)
+            os.replace(tmp_path, self._cache_path(key))
+
+        return pd.DataFrame(
+            [{**params, **summaries[key]} for params, key in zip(candidates, keys)]
+        )
+
+    def best(self, results: pd.DataFrame) -> pd.Series | None:
+        eligible = results[results["filled"] >= self.config.MIN_FILLED]
+        eligible = eligible.dropna(subset=[self.config.METRIC])
+        if eligible.empty:
+            return None
+        return eligible.loc[eligible[self.config.METRIC].idxmax()]
+
+    def walk_forward(self, symbols, start=None, end=None) -> pd.DataFrame:
+        """One row per fold: the parameters chosen in training and their test score."""
+        train_days, test_days = self.config.TRAIN_DAYS, self.config.TEST_DAYS
+        days = self.trading_days(symbols, start, end)
+        candidates = self.candidates()
+        names = list(self.config.GRID)
+        folds = []
+
+        for i in range(0, len(days) - train_days - test_days + 1, test_days):
+            train = days[i : i + train_days]
+            test = days[i + train_days : i + train_days + test_days]
+            chosen = self.best(self.evaluate(candidates, symbols, train[0], train[-1]))
+            if chosen is None:
+                logger.warning(f"No eligible parameters for {train[0]}-{train[-1]}")
+                continue
+
+            params = candidates[chosen.name]
+            tested = self.evaluate([params], symbols, test[0], test[-1]).iloc[0]
+            folds.append(
+                {
+                    "train_start": train[0],
+                    "train_end": train[-1],
+                    "test_start": test[0],
+                    "test_end": test[-1],
+                    **params,
+                    f"train_{self.config.METRIC}": chosen[self.config.METRIC],
+                    **{f"test_{k}": tested[k] for k in tested.index if k not in names},
+                }
+            )
+
+        return pd.DataFrame(folds)
+
+    def run(self, symbols, start=None, end=None) -> pd.DataFrame:
+        """Walk-forward folds with ``TRAIN_DAYS`` set, else the ranked search."""
+        if self.config.TRAIN_DAYS:
+            return self.walk_forward(symbols, start, end)
+
+        days = self.trading_days(symbols, start, end)
+        if not days:
+            return pd.DataFrame()
+        results = self.evaluate(self.candidates(), symbols, days[0], days[-1])
+        return results.sort_values(
+            self.config.METRIC, ascending=False, ignore_index=True
+        )
+
+
+def _evaluate(args) -> dict:
+    """Process pool entry point: backtest summary of one parameter set."""
+    config, cache_root, symbols, start, end = args
+    signals, symbol_days = Backtester(config, BarCache(cache_root)).run_signals(
+        symbols, start, end
+    )
+    return Backtester.summarize(signals, symbol_days)
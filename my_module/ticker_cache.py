@@ -0,0 +1,109 @@
+import asyncio
+import copy
+import time
+from dataclasses import dataclass
+from weakref import WeakKeyDictionary
+
+from ib_insync import Contract, Ticker, util
+
+from my_module.gateway_protocol import contract_key
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class TickerCacheConfig:
+    # Subscriptions nobody read for this long are cancelled, freeing the line
+    TTL_SECONDS: float = 300
+    # Longest wait for the first price of a new subscription
+    TIMEOUT_SECONDS: float = 5
+
+
+class _Entry:
+    """One streaming subscription and the callers waiting for its first price."""
+
+    def __init__(self, ticker: Ticker):
+        self.ticker = ticker
+        self.ready = asyncio.Event()
+        self.expiry: asyncio.TimerHandle | None = None
+
+
+class TickerCache:
+    """
+    Live tickers shared by everyone asking for a contract's price.
+
+    The first request for a contract opens one streaming subscription and
+    returns as soon as it has a last or close price; later requests get the
+    same, continuously updated ticker right away. A subscription is cancelled
+    once it has not been read for ``TTL_SECONDS``.
+    """
+
+    _caches: WeakKeyDictionary = WeakKeyDictionary()
+
+    def __init__(self, ib, config: TickerCacheConfig = TickerCacheConfig()):
+        self.ib = ib
+        self.config = config
+        self._entries: dict[str, _Entry] = {}
+
+    @classmethod
+    def of(cls, ib) -> "TickerCache":
+        """The ticker cache of an IB connection, created on first use."""
+        if ib not in cls._caches:
+            cls._caches[ib] = cls(ib)
+        return cls._caches[ib]
+
+    @staticmethod
+    def price(ticker: Ticker) -> float | None:
+        """Last price, or the previous close before the first trade."""
+        for price in (ticker.last, ticker.close):
+            if not util.isNan(price) and price > 0:
+                return price
+        return None
+
+    async def get(self, contract: Contract) -> Ticker:
+        """The live ticker of a contract, once it has a price (or timed out)."""
+        key = contract_key(contract)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = self._subscribe(contract)
+        self._touch(key, entry)
+
+        if not entry.ready.is_set():
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(entry.ready.wait()), self.config.TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"No price for {contract.symbol} yet")
+        return entry.ticker
+
+    def _subscribe(self, contract: Contract) -> _Entry:
+        # Subscriptions are tracked per contract object, so a private copy
+        # keeps the cache's cancel off streams others opened on the same one
+        entry = _Entry(self.ib.reqMktData(copy.copy(contract), "", False, False))
+
+        def on_update(ticker: Ticker):
+            if not entry.ready.is_set() and TickerCache.price(ticker) is not None:
+                entry.ready.set()
+
+        entry.ticker.updateEvent += on_update
+        return entry
+
+    def _touch(self, key: str, entry: _Entry) -> None:
+        if entry.expiry is not None:
+            entry.expiry.cancel()
+        entry.expiry = asyncio.get_running_loop().call_later(
+            self.config.TTL_SECONDS, self._expire, key
+        )
+
+    def _expire(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.ib.cancelMktData(entry.ticker.contract)
+
+    def clear(self) -> None:
+        """Cancel every subscription."""
+        for key, entry in list(self._entries.items()):
+            entry.expiry.cancel()
+            self._expire(key)
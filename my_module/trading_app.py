@@ -10,15 +10,16 @@ import my_module.trade_input as trade_input
 from my_module.algo.reversal_algo import ReversalAlgo
 from my_module.algo.scaling_in_algo import ScalingInAlgo
 from my_module.close_all_positions import close_all_positions
-from my_module.connect import connect_ib, disconnect_ib
+from my_module.connect import create_ib
 from my_module.data import Data
 from my_module.instance import Instance
 from my_module.logger import Logger
 from my_module.plot import generate_html
+from my_module.supervisor import ConnectionSupervisor
 from my_module.timer import close_trades_timer, timer
 from my_module.util import get_exit_time
 from my_module.utils.arg_parser import args
-from scanner import Scanner
+from scanner import Scanner, StreamingScanner
 
 nest_asyncio.apply()
 
@@ -31,6 +32,7 @@ class MenuOption(Enum):
     SCANNER = auto()  # Run scanner
     SCALE_IN_ALGO = auto()  # place orders / monitor stop
     REVERSAL_ALGO = auto()  # detect trend reversal
+    STREAMING_SCANNER = auto()  # Keep the scanner subscribed from 9:30 to 11:00
     EXIT = auto()
 
 
@@ -53,11 +55,13 @@ class TradingApp:
         "3": MenuChoice(MenuOption.SCANNER, "Run scanner"),
         "4": MenuChoice(MenuOption.SCALE_IN_ALGO, "Run Scale-in algo"),
         "5": MenuChoice(MenuOption.REVERSAL_ALGO, "Run Reversal algo"),
-        "6": MenuChoice(MenuOption.EXIT, "Exit"),
+        "6": MenuChoice(MenuOption.STREAMING_SCANNER, "Run streaming scanner"),
+        "7": MenuChoice(MenuOption.EXIT, "Exit"),
     }
 
     def __init__(self):
-        self.ib = IB()
+        self.ib = create_ib()
+        self.supervisor = ConnectionSupervisor(self.ib)
         self.data: Data | None = None
 
     async def display_menu(self) -> MenuOption | None:
@@ -83,6 +87,7 @@ class TradingApp:
                 self.data = Data(self.ib)
 
             trades = self.data.get_session_trades()
+            self.data.record_realized_pnl()
             generate_html(trades)
             # TODO: save data in postgres SQL
             Logger.separator("📈 Successfully generated report.")
@@ -114,11 +119,18 @@ class TradingApp:
     async def run_scanner(self) -> None:
         try:
             scanner = Scanner()
-            data = await scanner.get_top_gainers(self.ib)
+            data = await scanner.get_candidates(self.ib)
             logger.info(data)
         except Exception as e:
             logger.error(f"Error in running scanner: {str(e)}")
 
+    async def run_streaming_scanner(self) -> None:
+        try:
+            scanner = StreamingScanner(self.ib)
+            await scanner.run()
+        except Exception as e:
+            logger.error(f"Error in running streaming scanner: {str(e)}")
+
     async def handle_menu_choice(self, choice: MenuOption) -> bool:
         handlers: Dict[MenuOption, Callable[[], Coroutine[Any, Any, Any] | bool]] = {
             MenuOption.CLOSE_TRADES: self.close_trades,
@@ -126,6 +138,7 @@ class TradingApp:
             MenuOption.SCANNER: self.run_scanner,
             MenuOption.SCALE_IN_ALGO: self.run_scale_in_algo,
             MenuOption.REVERSAL_ALGO: self.run_reversal_algo,
+            MenuOption.STREAMING_SCANNER: self.run_streaming_scanner,
             MenuOption.EXIT: lambda: False,
         }
 
@@ -139,7 +152,7 @@ class TradingApp:
 
     async def startup(self) -> bool:
         try:
-            if not await connect_ib(self.ib):
+            if not await self.supervisor.start():
                 return False
             return True
         except Exception as e:
@@ -147,7 +160,7 @@ class TradingApp:
 
     async def shutdown(self) -> bool:
         try:
-            disconnect_ib(self.ib)
+            self.supervisor.stop()
         except Exception as e:
             logger.error("Shutdown error: {str(e)}")
 
@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from my_module.bar_cache import MARKET_TIMEZONE, BarCache, backfill
+from my_module.connect import connect_ib, create_ib, disconnect_ib
+from my_module.contract_cache import ContractCache
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+VOLUME_CURVE_DIR = "assets/db/volume_curves"
+SESSION_OPEN_MINUTE = 9 * 60 + 30
+SESSION_MINUTES = 390
+
+
+def minute_of_session(times) -> np.ndarray:
+    """Minutes since 9:30 ET of epoch-second timestamps, clipped to the session."""
+    local = pd.to_datetime(np.asarray(times), unit="s", utc=True).tz_convert(
+        MARKET_TIMEZONE
+    )
+    minutes = local.hour * 60 + local.minute - SESSION_OPEN_MINUTE
+    return np.clip(np.asarray(minutes), 0, SESSION_MINUTES - 1)
+
+
+class VolumeCurveIndex:
+    """
+    Average cumulative volume by minute of the session, per symbol.
+
+    ``curve[m]`` is the volume usually traded from the open through minute
+    ``m``, averaged over the last ``days`` cached sessions of 1 minute bars.
+    Curves for a trading day are built once and stored together in one
+    ``.npz`` file, so relative volume at any time of day is an array lookup.
+    """
+
+    BAR_SIZE = "1 min"
+
+    def __init__(
+        self, days: int = 20, cache: BarCache | None = None, root=VOLUME_CURVE_DIR
+    ):
+        self.days = days
+        self.cache = cache or BarCache()
+        self.root = root
+        self._day = None
+        self._curves: dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def today() -> date:
+        return datetime.now(MARKET_TIMEZONE).date()
+
+    def path(self, day: date) -> str:
+        return os.path.join(self.root, f"{day:%Y%m%d}_{self.days}d.npz")
+
+    def curve(self, symbol: str, day: date) -> np.ndarray | None:
+        """Curve from the cached sessions before ``day``."""
+        days = [
+            d for d in self.cache.days(symbol, self.BAR_SIZE) if d < f"{day:%Y%m%d}"
+        ][-self.days :]
+        if not days:
+            return None
+
+        volume = np.zeros((len(days), SESSION_MINUTES))
+        for row, d in enumerate(days):
+            records = self.cache.load_day(symbol, self.BAR_SIZE, d, mmap=False)
+            np.add.at(
+                volume[row], minute_of_session(records["time"]), records["volume"]
+            )
+        return np.cumsum(volume, axis=1).mean(axis=0)
+
+    def build(self, symbols: list[str], day: date | None = None) -> dict:
+        day = day or VolumeCurveIndex.today()
+        curves = dict(self.load(day))
+        for symbol in symbols:
+            curve = self.curve(symbol, day)
+            if curve is None:
+                logger.warning(f"No cached {self.BAR_SIZE} bars for {symbol}")
+                continue
+            curves[symbol] = curve
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.path(day)}.tmp.npz"
+        np.savez(tmp_path, **curves)
+        os.replace(tmp_path, self.path(day))
+        self._day, self._curves = day, curves
+        logger.info(f"Volume curves {day}: {len(curves)} symbols")
+        return curves
+
+    def load(self, day: date | None = None) -> dict[str, np.ndarray]:
+        day = day or VolumeCurveIndex.today()
+        if day != self._day:
+            self._day = day
+            self._curves = {}
+            if os.path.exists(self.path(day)):
+                with np.load(self.path(day)) as data:
+                    self._curves = {symbol: data[symbol] for symbol in data.files}
+        return self._curves
+
+    def expected_volume(self, symbol: str, now: datetime | None = None) -> float | None:
+        """Usual cumulative volume at ``now``, interpolated within the minute."""
+        now = (now or datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+        curve = self.load(now.date()).get(symbol)
+        if curve is None:
+            return None
+        elapsed = (now.hour * 60 + now.minute - SESSION_OPEN_MINUTE) + now.second / 60
+        if elapsed <= 0:
+            return None
+        minute = min(int(elapsed), SESSION_MINUTES - 1)
+        before = curve[minute - 1] if minute > 0 else 0.0
+        fraction = min(elapsed - minute, 1.0)
+        return float(before + (curve[minute] - before) * fraction)
+
+    def relative_volume(
+        self, symbol: str, cumulative_volume: float, now: datetime | None = None
+    ) -> float | None:
+        """Today's volume so far over the usual volume by this time of day."""
+        expected = self.expected_volume(symbol, now)
+        if not expected:
+            return None
+        return cumulative_volume / expected
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Build today's volume curves")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    parser.add_argument("--days", type=int, default=20)
+    parser.add_argument(
+        "--backfill", action="store_true", help="Fetch missing 1 min bars first"
+    )
+    args = parser.parse_args()
+    symbols = [symbol.upper() for symbol in args.symbols]
+
+    if args.backfill:
+        ib = create_ib()
+        try:
+            await connect_ib(ib)
+            for contract in await ContractCache.shared().stocks(ib, symbols):
+                await backfill(ib, contract, VolumeCurveIndex.BAR_SIZE, args.days)
+        finally:
+            disconnect_ib(ib)
+
+    VolumeCurveIndex(args.days).build(symbols)
+
+
+if __name__ == "__main__":
+    """Build the curves pre-market, e.g. python -m my_module.volume_curve --symbols TSLA"""
+
+    asyncio.run(main())
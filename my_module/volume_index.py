@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+import os
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from ib_insync import IB, Contract
+
+from my_module.connect import connect_ib, create_ib, disconnect_ib
+from my_module.contract_cache import ContractCache
+from my_module.history_scheduler import HistoricalDataScheduler, Priority
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+VOLUME_INDEX_DIR = "assets/db/volume_index"
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+
+class AverageVolumeIndex:
+    """
+    Trailing average daily volume per symbol, one file per trading day.
+
+    The index for a day holds the average of the ``periods`` completed
+    sessions before it, so it is built once (ideally pre-market) and every
+    scan of that day looks symbols up in a dict. Symbols missing from the
+    index are fetched once and added.
+    """
+
+    def __init__(self, periods: int = 5, root: str = VOLUME_INDEX_DIR):
+        self.periods = periods
+        self.root = root
+        self._day = None
+        self._volumes: dict[str, float] = {}
+
+    @staticmethod
+    def today() -> date:
+        return datetime.now(MARKET_TIMEZONE).date()
+
+    def path(self, day: date) -> str:
+        return os.path.join(self.root, f"{day:%Y%m%d}_{self.periods}d.json")
+
+    def load(self, day: date | None = None) -> dict[str, float]:
+        """Volumes of ``day`` (today by default), read from disk once per day."""
+        day = day or AverageVolumeIndex.today()
+        if day != self._day:
+            self._day = day
+            self._volumes = {}
+            if os.path.exists(self.path(day)):
+                with open(self.path(day)) as f:
+                    self._volumes = json.load(f)
+        return self._volumes
+
+    def get(self, symbol: str) -> float | None:
+        return self.load().get(symbol)
+
+    def previous_symbols(self) -> list[str]:
+        """Symbols of the latest index built before today."""
+        if not os.path.isdir(self.root):
+            return []
+        today = f"{AverageVolumeIndex.today():%Y%m%d}"
+        suffix = f"_{self.periods}d.json"
+        files = sorted(
+            name
+            for name in os.listdir(self.root)
+            if name.endswith(suffix) and name < today
+        )
+        if not files:
+            return []
+        with open(os.path.join(self.root, files[-1])) as f:
+            return sorted(json.load(f))
+
+    async def _fetch(self, ib: IB, contract: Contract, day: date):
+        bars = await HistoricalDataScheduler.of(ib).request(
+            contract,
+            endDateTime="",
+            durationStr=f"{self.periods + 1} D",
+            barSizeSetting="1 day",
+            whatToShow="TRADES",
+            useRTH=True,
+            formatDate=1,
+            priority=Priority.SCAN,
+        )
+        # Today's bar is still in progress when building intraday
+        volumes = [bar.volume for bar in bars if bar.date < day][-self.periods :]
+        return sum(volumes) / len(volumes) if volumes else None
+
+    async def build(self, ib: IB, contracts: list[Contract]) -> dict[str, float]:
+        """Fetch the contracts missing from today's index and persist it."""
+        day = AverageVolumeIndex.today()
+        volumes = self.load(day)
+        missing = [c for c in contracts if c.symbol not in volumes]
+        if not missing:
+            return volumes
+
+        averages = await asyncio.gather(
+            *(self._fetch(ib, contract, day) for contract in missing),
+            return_exceptions=True,
+        )
+        for contract, average in zip(missing, averages):
+            if isinstance(average, Exception) or average is None:
+                logger.warning(f"No daily volume for {contract.symbol}: {average}")
+                continue
+            volumes[contract.symbol] = average
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.path(day)}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(volumes, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path(day))
+        logger.info(f"Average volume index {day}: {len(volumes)} symbols")
+        return volumes
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Build today's average volume index")
+    parser.add_argument(
+        "--symbols", nargs="*", help="Defaults to the symbols of the last index"
+    )
+    parser.add_argument("--periods", type=int, default=5)
+    args = parser.parse_args()
+
+    index = AverageVolumeIndex(args.periods)
+    symbols = [s.upper() for s in args.symbols or index.previous_symbols()]
+    if not symbols:
+        logger.info("No symbols to index.")
+        return
+
+    ib = create_ib()
+    try:
+        await connect_ib(ib)
+        await index.build(ib, await ContractCache.shared().stocks(ib, symbols))
+    finally:
+        disconnect_ib(ib)
+
+
+if __name__ == "__main__":
+    """Build the index pre-market, e.g. python -m my_module.volume_index"""
+
+    asyncio.run(main())
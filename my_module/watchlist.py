@@ -0,0 +1,136 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from ib_insync import Contract, Event
+
+from my_module.contract_cache import ContractCache
+from my_module.logger import Logger
+
+logger = Logger.get_logger()
+
+
+@dataclass
+class WatchlistConfig:
+    # Market data lines of the account (100 unless boosted)
+    MAX_LINES: int = 100
+    # Lines left free for positions, manual quotes and other tools
+    RESERVED_LINES: int = 10
+    # Lines one watched symbol uses
+    LINES_PER_SYMBOL: int = 1
+    # Symbols never evicted, e.g. the configured contracts
+    PINNED: tuple = ()
+    # How often the scanner is polled for new symbols
+    SCAN_INTERVAL_SECONDS: int = 60
+
+
+class WatchlistManager:
+    """
+    Watched symbols bounded by the market data line budget.
+
+    Symbols are kept in least-recently-signalled order: ``touch`` moves a
+    symbol to the back whenever it produces a signal, and when a new symbol
+    needs room the one at the front is evicted and its subscription released
+    through ``unsubscribe``. Pinned symbols and symbols with an open position
+    are never evicted.
+    """
+
+    def __init__(
+        self,
+        ib,
+        config: WatchlistConfig = WatchlistConfig(),
+        subscribe: Callable[[Contract], Awaitable] | None = None,
+        unsubscribe: Callable[[Contract], None] | None = None,
+    ):
+        self.ib = ib
+        self.config = config
+        self.subscribe = subscribe
+        self.unsubscribe = unsubscribe
+        self._contracts: OrderedDict[str, Contract] = OrderedDict()
+        self.addedEvent = Event("addedEvent")
+        self.evictedEvent = Event("evictedEvent")
+
+    @property
+    def capacity(self) -> int:
+        lines = self.config.MAX_LINES - self.config.RESERVED_LINES
+        return max(lines // self.config.LINES_PER_SYMBOL, 0)
+
+    @property
+    def contracts(self) -> list[Contract]:
+        return list(self._contracts.values())
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.upper() in self._contracts
+
+    def __len__(self) -> int:
+        return len(self._contracts)
+
+    def touch(self, symbol: str) -> None:
+        """Mark a symbol as just signalled."""
+        if symbol.upper() in self._contracts:
+            self._contracts.move_to_end(symbol.upper())
+
+    def _evictable(self) -> str | None:
+        """Least recently signalled symbol that may be dropped."""
+        held = {pos.contract.symbol.upper() for pos in self.ib.positions()}
+        pinned = {symbol.upper() for symbol in self.config.PINNED}
+        for symbol in self._contracts:
+            if symbol not in held and symbol not in pinned:
+                return symbol
+        return None
+
+    async def add(self, contract: Contract) -> bool:
+        """Watch a contract, evicting if needed; False when there is no room."""
+        symbol = contract.symbol.upper()
+        if symbol in self._contracts:
+            self.touch(symbol)
+            return True
+
+        while len(self._contracts) >= self.capacity:
+            evicted = self._evictable()
+            if evicted is None:
+                logger.warning(f"No market data line free for {symbol}")
+                return False
+            self.remove(evicted)
+
+        if self.subscribe is not None:
+            await self.subscribe(contract)
+        self._contracts[symbol] = contract
+        self.addedEvent.emit(contract)
+        logger.info(f"👀 Watching {symbol} ({len(self)}/{self.capacity})")
+        return True
+
+    async def add_symbols(self, symbols) -> None:
+        symbols = [symbol for symbol in symbols if symbol.upper() not in self]
+        for contract in await ContractCache.shared().stocks(self.ib, symbols):
+            await self.add(contract)
+
+    def remove(self, symbol: str) -> None:
+        contract = self._contracts.pop(symbol.upper(), None)
+        if contract is None:
+            return
+        try:
+            if self.unsubscribe is not None:
+                self.unsubscribe(contract)
+        finally:
+            self.evictedEvent.emit(contract)
+            logger.info(f"🗑️ Stopped watching {contract.symbol}")
+
+    def clear(self) -> None:
+        """Release every subscription."""
+        for symbol in list(self._contracts):
+            self.remove(symbol)
+
+    async def follow_scanner(self, scan: Callable[[], Awaitable]) -> None:
+        """Add the symbols of every ``scan()`` result (a DataFrame) until cancelled."""
+        while True:
+            try:
+                candidates = await scan()
+                if not candidates.empty:
+                    # Only as many as fit, best last so they are the most recently used
+                    symbols = list(candidates["symbol"])[: self.capacity]
+                    await self.add_symbols(reversed(symbols))
+            except Exception as e:
+                logger.error(f"Error in feeding watchlist from scanner: {str(e)}")
+            await asyncio.sleep(self.config.SCAN_INTERVAL_SECONDS)
@@ -1,78 +1,329 @@
+import asyncio
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
+
 import pandas as pd
 from ib_insync import *
 
+from my_module.contract_cache import ContractCache
+from my_module.history_scheduler import HistoricalDataScheduler, Priority
+from my_module.logger import Logger
+from my_module.volume_curve import VolumeCurveIndex
+from my_module.volume_index import AverageVolumeIndex
+
+logger = Logger.get_logger()
+
 
 class Scanner:
+    SNAPSHOT_TIMEOUT_SECONDS = 5
+    # Trailing 5-day average volume, built once per day
+    volume_index = AverageVolumeIndex(periods=5)
+    # Usual volume by time of day, used instead when built for the symbol
+    volume_curves = VolumeCurveIndex()
+    # Scan codes merged by get_candidates and the weight of each in the score
+    SCAN_WEIGHTS = {
+        "TOP_PERC_GAIN": 1.0,
+        "TOP_PERC_LOSE": 1.0,
+        "HOT_BY_VOLUME": 0.5,
+        "MOST_ACTIVE": 0.5,
+    }
+    # Scans whose distance is the percent change
+    PERCENT_CHANGE_SCANS = ("TOP_PERC_GAIN", "TOP_PERC_LOSE")
 
     @staticmethod
-    async def get_top_gainers(ib):
-        # Find top gainers with volume > 1M
+    def subscription(scan_code: str, rows: int = 10) -> ScannerSubscription:
+        # Stocks between $1 and $50 with volume > 1M
         scanner = ScannerSubscription(
             instrument="STK",
             locationCode="STK.US.MAJOR",
-            scanCode="TOP_PERC_GAIN",
-            numberOfRows=10,
+            scanCode=scan_code,
+            numberOfRows=rows,
         )
 
         scanner.abovePrice = 1
         scanner.belowPrice = 50
         scanner.aboveVolume = 1000000
+        return scanner
+
+    @staticmethod
+    def top_gainers_subscription() -> ScannerSubscription:
+        return Scanner.subscription("TOP_PERC_GAIN", 10)
+
+    @staticmethod
+    def top_k(scans: dict[str, list[ScanData]], k: int) -> list[tuple]:
+        """
+        Merge several scans into the ``k`` best (score, scan data, scan codes).
+
+        A symbol scores ``weight * (1 - rank / rows)`` in every scan it shows up
+        in, summed over scans, so symbols that lead several lists rank first.
+        """
+        merged: dict[int, list] = {}  # conId -> [score, scan data, scan codes]
+        for scan_code, scan_data in scans.items():
+            weight = Scanner.SCAN_WEIGHTS.get(scan_code, 1.0)
+            rows = max(len(scan_data), 1)
+            for data in scan_data:
+                con_id = data.contractDetails.contract.conId
+                entry = merged.setdefault(con_id, [0.0, data, []])
+                entry[0] += weight * (1 - data.rank / rows)
+                entry[2].append(scan_code)
+                if scan_code in Scanner.PERCENT_CHANGE_SCANS:
+                    entry[1] = data  # keep the percent change as distance
+
+        heap = []  # min-heap of the k best, the weakest on top
+        for con_id, (score, data, scan_codes) in merged.items():
+            item = (score, con_id, data, scan_codes)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+
+        ranked = sorted(heap, key=lambda item: item[:2], reverse=True)
+        return [(score, data, codes) for score, _, data, codes in ranked]
+
+    @staticmethod
+    async def get_candidates(ib, top_k: int = 10, rows: int = 50) -> pd.DataFrame:
+        """Gainers, losers and volume leaders merged; only the top K are enriched."""
+        scan_codes = list(Scanner.SCAN_WEIGHTS)
+        results = await asyncio.gather(
+            *(
+                ib.reqScannerDataAsync(Scanner.subscription(code, rows))
+                for code in scan_codes
+            ),
+            return_exceptions=True,
+        )
+        scans = {}
+        for code, result in zip(scan_codes, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Scan {code} failed: {result}")
+                continue
+            scans[code] = result
 
-        scan_data = ib.reqScannerData(scanner)
+        best = Scanner.top_k(scans, top_k)
+        rows_by_symbol = {
+            row["symbol"]: row
+            for row in await Scanner.filter_by_volume(ib, [data for _, data, _ in best])
+        }
 
-        results = []
+        candidates = []
+        for score, data, codes in best:
+            row = rows_by_symbol.get(data.contractDetails.contract.symbol)
+            if row is not None:
+                candidates.append(
+                    {**row, "score": score, "scan_codes": ",".join(codes)}
+                )
+        return pd.DataFrame(candidates)
+
+    @staticmethod
+    async def get_top_gainers(ib):
+        scan_data = await ib.reqScannerDataAsync(Scanner.top_gainers_subscription())
+        results = await Scanner.filter_by_volume(ib, scan_data)
+        df = pd.DataFrame(results)
+        return df
+
+    @staticmethod
+    async def filter_by_volume(ib, scan_data) -> list[dict]:
+        """Rows of the scan results trading at least twice their average volume."""
+        contracts = [data.contractDetails.contract for data in scan_data]
+        if not contracts:
+            return []
+
+        await ContractCache.shared().qualify(ib, *contracts)
+        volumes, average_volumes = await asyncio.gather(
+            Scanner._snapshot_volumes(ib, contracts),
+            Scanner.volume_index.build(ib, contracts),
+        )
 
         # Compare today's volume with the average volume of the past 5 days
-        for data in scan_data:
-            # If stock already in results, skip.
-            contract = data.contractDetails.contract
-            symbol = contract.symbol
-            pct_change = data.distance
-            print(f"Processing {symbol} with {pct_change}% change")
-            ticker = ib.reqMktData(contract, "", False, False)
-            ib.sleep(1)
-            current_volume = ticker.volume if ticker.volume != -1 else 0
-            today_bars = ib.reqHistoricalData(
-                contract,
-                endDateTime="",
-                durationStr="1 D",
-                barSizeSetting="1 day",
-                whatToShow="TRADES",
-                useRTH=True,
-                formatDate=1,
+        rows = await asyncio.gather(
+            *(
+                Scanner._process(
+                    ib,
+                    data,
+                    volume,
+                    average_volumes.get(data.contractDetails.contract.symbol, 0),
+                )
+                for data, volume in zip(scan_data, volumes)
             )
+        )
+        return [row for row in rows if row is not None]
 
-            today_avg_volume = util.df(today_bars)["volume"].mean() if today_bars else 0
-            print(today_avg_volume)
-
-            past_bars = ib.reqHistoricalData(
-                contract,
-                endDateTime="20250306 05:00:00",
-                durationStr="5 D",
-                barSizeSetting="1 day",
-                whatToShow="TRADES",
-                useRTH=True,
-                formatDate=1,
+    @staticmethod
+    async def _snapshot_volumes(ib, contracts) -> list[float]:
+        """Current volume of every contract from one batch of snapshots."""
+        try:
+            tickers = await asyncio.wait_for(
+                ib.reqTickersAsync(*contracts), Scanner.SNAPSHOT_TIMEOUT_SECONDS
             )
+        except asyncio.TimeoutError:
+            logger.warning("Market data snapshots timed out")
+            return [0] * len(contracts)
+        volumes = {ticker.contract.conId: ticker.volume for ticker in tickers}
+        return [
+            volume if volume == volume and volume != -1 else 0
+            for volume in (volumes.get(c.conId, 0) for c in contracts)
+        ]
 
-            avg_volume = util.df(past_bars)["volume"].mean() if past_bars else 0
-            print(avg_volume)
-
-            volume_multiplier = today_avg_volume / avg_volume if avg_volume > 0 else 0
-            if volume_multiplier > 2:
-                # TODO: add indicators to check if stock is trending
-                results.append(
-                    {
-                        "symbol": symbol,
-                        "pct_change": pct_change,
-                        "avg_volume": avg_volume,
-                        "volume_multiplier": volume_multiplier,
-                    }
+    @staticmethod
+    async def _daily_bars(ib, contract, end_date_time, duration):
+        return await HistoricalDataScheduler.of(ib).request(
+            contract,
+            endDateTime=end_date_time,
+            durationStr=duration,
+            barSizeSetting="1 day",
+            whatToShow="TRADES",
+            useRTH=True,
+            formatDate=1,
+            priority=Priority.SCAN,
+        )
+
+    @staticmethod
+    async def _process(ib, data, current_volume, avg_volume):
+        contract = data.contractDetails.contract
+        symbol = contract.symbol
+        pct_change = data.distance
+        logger.debug(f"Processing {symbol} with {pct_change}% change")
+
+        if not current_volume:
+            # No live volume (e.g. no market data subscription): use the daily bar
+            today_bars = await Scanner._daily_bars(ib, contract, "", "1 D")
+            current_volume = today_bars[-1].volume if today_bars else 0
+        logger.info(f"{symbol}: {current_volume} today | {avg_volume} avg")
+
+        relative_volume = (
+            Scanner.volume_curves.relative_volume(symbol, current_volume)
+            if current_volume
+            else None
+        )
+        if relative_volume is not None:
+            volume_multiplier = relative_volume
+        else:
+            volume_multiplier = current_volume / avg_volume if avg_volume > 0 else 0
+        if volume_multiplier > 2:
+            # TODO: add indicators to check if stock is trending
+            return {
+                "symbol": symbol,
+                "pct_change": pct_change,
+                "avg_volume": avg_volume,
+                "volume_multiplier": volume_multiplier,
+            }
+        return None
+
+
+@dataclass
+class ScanDiff:
+    """Changes between two consecutive result sets of a scanner subscription."""
+
+    entered: list[ScanData] = field(default_factory=list)
+    exited: list[ScanData] = field(default_factory=list)
+    # (scan data, previous rank) of symbols that stayed but moved
+    moved: list[tuple[ScanData, int]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.entered or self.exited or self.moved)
+
+    @staticmethod
+    def between(previous: dict[int, ScanData], current: dict[int, ScanData]):
+        """Diff two result sets keyed by conId."""
+        return ScanDiff(
+            entered=[
+                data for con_id, data in current.items() if con_id not in previous
+            ],
+            exited=[data for con_id, data in previous.items() if con_id not in current],
+            moved=[
+                (data, previous[con_id].rank)
+                for con_id, data in current.items()
+                if con_id in previous and previous[con_id].rank != data.rank
+            ],
+        )
+
+
+class StreamingScanner:
+    """
+    Keeps the top gainers scan subscribed between ``START`` and ``END``.
+
+    Every result set pushed by TWS is diffed against the previous one and
+    only the symbols that newly appear go through the volume filter, so an
+    update costs work proportional to what changed. Candidates that passed
+    the filter are kept in ``candidates`` until they drop off the scan.
+    ``changeEvent`` is emitted with the diff and the candidates after every
+    processed update.
+    """
+
+    START = time(9, 30)
+    END = time(11, 0)
+    TIMEZONE = ZoneInfo("America/New_York")
+
+    def __init__(self, ib, subscription: ScannerSubscription | None = None):
+        self.ib = ib
+        self.subscription = subscription or Scanner.top_gainers_subscription()
+        self.results: dict[int, ScanData] = {}
+        self.candidates: dict[int, dict] = {}
+        self.changeEvent = Event("changeEvent")
+        self._updates = asyncio.Queue()
+
+    def _on_scan_data(self, scan_data) -> None:
+        # The list is refilled in place by ib_insync, keep a snapshot
+        self._updates.put_nowait(
+            {data.contractDetails.contract.conId: data for data in scan_data}
+        )
+
+    def _seconds_until(self, moment: time) -> float:
+        now = datetime.now(StreamingScanner.TIMEZONE)
+        target = datetime.combine(now.date(), moment, StreamingScanner.TIMEZONE)
+        return (target - now).total_seconds()
+
+    async def process(self, current: dict[int, ScanData]) -> ScanDiff:
+        """Apply one result set: filter the new symbols, drop the exited ones."""
+        diff = ScanDiff.between(self.results, current)
+        self.results = current
+
+        for data in diff.exited:
+            symbol = data.contractDetails.contract.symbol
+            self.candidates.pop(data.contractDetails.contract.conId, None)
+            logger.info(f"⬇️ {symbol} left the scan (was #{data.rank + 1})")
+        for data, previous_rank in diff.moved:
+            symbol = data.contractDetails.contract.symbol
+            logger.info(f"↕️ {symbol} #{previous_rank + 1} -> #{data.rank + 1}")
+
+        if diff.entered:
+            rows = await Scanner.filter_by_volume(self.ib, diff.entered)
+            by_symbol = {row["symbol"]: row for row in rows}
+            for data in diff.entered:
+                contract = data.contractDetails.contract
+                logger.info(
+                    f"⬆️ {contract.symbol} entered the scan at #{data.rank + 1}"
                 )
+                if contract.symbol in by_symbol:
+                    self.candidates[contract.conId] = by_symbol[contract.symbol]
+                    logger.info(f"🔥 Candidate: {by_symbol[contract.symbol]}")
 
-                # Execute bracket order for the stock
+        if diff:
+            self.changeEvent.emit(diff, self.candidates)
+        return diff
 
-            # Repeat once every minute from 9:30 to 11:00
+    async def run(self) -> None:
+        wait = self._seconds_until(StreamingScanner.START)
+        if wait > 0:
+            logger.info(f"Streaming scanner starts at {StreamingScanner.START}")
+            await asyncio.sleep(wait)
 
-        df = pd.DataFrame(results)
-        return df
+        scan_data = self.ib.reqScannerSubscription(self.subscription)
+        scan_data.updateEvent += self._on_scan_data
+        try:
+            while (remaining := self._seconds_until(StreamingScanner.END)) > 0:
+                try:
+                    current = await asyncio.wait_for(self._updates.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                # Only the latest result set matters if several queued up
+                while not self._updates.empty():
+                    current = self._updates.get_nowait()
+                await self.process(current)
+        finally:
+            scan_data.updateEvent -= self._on_scan_data
+            self.ib.cancelScannerSubscription(scan_data)
+            logger.info(
+                f"Streaming scanner stopped with {len(self.candidates)} candidates"
+            )
@@ -1,34 +1,48 @@
-import random
-
 import matplotlib.pyplot as plt
 
+from my_module.monte_carlo import MonteCarlo, MonteCarloConfig
+
 # Parameters
-initial_reward = 10
-min_reward = 5
-max_reward = 50
-attempts = 100000
-
-# Simulation
-reward = initial_reward
-total_reward = 0
-total_rewards = []
-
-for _ in range(attempts):
-    # Simulate a win/loss (52% chance of win, 48% chance of loss)
-    if random.random() < 0.5:  # Win (52% chance)
-        total_reward += reward * 3
-        # reward = max(max_reward, reward + 5)
-    else:  # Loss (48% chance)
-        total_reward -= reward * 3
-        # reward = min(min_reward, reward - 5)
-
-    total_rewards.append(total_reward)
-
-# Plot the graph
-plt.figure(figsize=(10, 6))
-plt.plot(total_rewards, label="Total Reward")
-plt.xlabel("Attempts")
-plt.ylabel("Total Reward")
-plt.title("Total Reward vs Attempts")
-plt.legend()
-plt.show()
+config = MonteCarloConfig(
+    PATHS=1_000_000,
+    TRADES=1_000,
+    WIN_RATE=0.5,
+    WIN_R=3,
+    LOSS_R=3,
+    INITIAL_RISK=10,
+    MIN_RISK=5,
+    MAX_RISK=50,
+    RISK_STEP=5,  # 0 for fixed sizing
+    INITIAL_EQUITY=1_000,
+)
+
+
+def main():
+    result = MonteCarlo(config).run()
+
+    # Plot the percentile bands and the drawdown distribution
+    fig, (ax_equity, ax_drawdown) = plt.subplots(1, 2, figsize=(14, 6))
+    bands = result.bands
+    ax_equity.fill_between(
+        bands.index, bands["p5"], bands["p95"], alpha=0.2, label="5-95%"
+    )
+    ax_equity.fill_between(
+        bands.index, bands["p25"], bands["p75"], alpha=0.4, label="25-75%"
+    )
+    ax_equity.plot(bands.index, bands["p50"], label="Median")
+    ax_equity.set_xlabel("Trades")
+    ax_equity.set_ylabel("Equity")
+    ax_equity.set_title(f"Equity over {config.PATHS:,} paths")
+    ax_equity.legend()
+
+    ax_drawdown.hist(result.max_drawdown, bins=100)
+    ax_drawdown.set_xlabel("Max drawdown")
+    ax_drawdown.set_ylabel("Paths")
+    ax_drawdown.set_title(f"Risk of ruin: {result.summary['risk_of_ruin']:.2%}")
+
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+
+from my_module.backtest import BacktestConfig
+from my_module.logger import Logger
+from my_module.sweep import ParameterSweep, SweepConfig
+
+logger = Logger.get_logger()
+
+parser = argparse.ArgumentParser(description="Sweep the reversal parameters")
+parser.add_argument("--symbols", nargs="+", required=True, help="Stock symbols")
+parser.add_argument("--start", type=str, help="First day (YYYYMMDD)")
+parser.add_argument("--end", type=str, help="Last day (YYYYMMDD)")
+parser.add_argument("--bar-size", type=str, default=BacktestConfig.BAR_SIZE)
+parser.add_argument(
+    "--samples", type=int, default=0, help="Random grid points, 0 for the full grid"
+)
+parser.add_argument(
+    "--train-days", type=int, default=0, help="Walk-forward training window"
+)
+parser.add_argument(
+    "--test-days",
+    type=int,
+    default=SweepConfig.TEST_DAYS,
+    help="Walk-forward test window",
+)
+
+
+def main():
+    args = parser.parse_args()
+    symbols = [symbol.upper() for symbol in args.symbols]
+
+    config = SweepConfig(
+        SAMPLES=args.samples, TRAIN_DAYS=args.train_days, TEST_DAYS=args.test_days
+    )
+    config.GRID["BAR_SIZE"] = [args.bar_size]
+    sweep = ParameterSweep(config, BacktestConfig(BAR_SIZE=args.bar_size))
+    results = sweep.run(symbols, args.start, args.end)
+
+    if results.empty:
+        logger.info("No results, is the bar cache empty?")
+        return
+
+    os.makedirs("dist", exist_ok=True)
+    name = "walk_forward.csv" if args.train_days else "sweep_results.csv"
+    output_file = os.path.join("dist", name)
+    results.to_csv(output_file, index=False)
+    logger.info(f"{len(results)} rows saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()